@@ -0,0 +1,310 @@
+import argparse
+import itertools
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import fitz
+
+import metrics
+from pdf_extract import MAX_CHARS, MAX_PAGES, PdfSource
+from upload_store import Upload, close_uploads
+
+logger = logging.getLogger(__name__)
+
+# ===================== ADMISSION CONFIGURATION =====================
+# Largest request body accepted, in MB (0 = no limit); larger requests get a 413 before they are read.
+MAX_REQUEST_BYTES = int(float(os.environ.get("ADMISSION_MAX_REQUEST_MB", 100)) * 1024 * 1024)
+# Resumes accepted in one /compare-multiple request (0 = no limit); larger batches belong in /analysis-jobs.
+MAX_BATCH_FILES = int(os.environ.get("ADMISSION_MAX_FILES", 200))
+# Pages accepted in one resume (0 = no limit).
+MAX_PDF_PAGES = int(os.environ.get("ADMISSION_MAX_PAGES", 50))
+# Estimated characters of text being extracted and analyzed at once, over every server
+# process sharing DEFAULT_BUDGET_PATH (0 = no limit). About 150 two-page resumes per core.
+DEFAULT_BUDGET = int(os.environ.get("ADMISSION_BUDGET_CHARS", 1000000 * (os.cpu_count() or 1)))
+# Share of the budget batches may fill, so single /compare requests still get in during a burst.
+BATCH_SHARE = float(os.environ.get("ADMISSION_BATCH_SHARE", 0.75))
+# Seconds clients are told to wait (Retry-After) when the budget is spent.
+RETRY_AFTER = int(os.environ.get("ADMISSION_RETRY_AFTER", 5))
+# Reservations of every server process; set ADMISSION_BUDGET_PATH to an empty string for a per-process budget.
+DEFAULT_BUDGET_PATH = os.environ.get("ADMISSION_BUDGET_PATH", os.path.join("instance", "work_budget.sqlite3"))
+# Text per page assumed when costing a resume, before any of it is extracted.
+CHARS_PER_PAGE = 3000
+# Reservations older than this are dropped even if their process id is still in use (pid reuse).
+STALE_SECONDS = 3600
+
+
+class Rejected(Exception):
+    """A request or file turned away by admission control, with the HTTP status to answer with."""
+
+    def __init__(self, message: str, status: int, reason: str, retry_after: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+# ===================== COST ESTIMATES =====================
+def count_pages(source: PdfSource) -> int:
+    """
+    Page count of a PDF, from its page tree (no page is rendered).
+
+    :param source: File path or PDF bytes.
+    :return: Number of pages; 1 if the file cannot be opened here (the extractors get their own try).
+    """
+    try:
+        doc = fitz.open(stream=source, filetype="pdf") if isinstance(source, bytes) else fitz.open(source)
+        with doc:
+            return max(doc.page_count, 1)
+    except Exception:
+        return 1
+
+
+def estimate_cost(pages: int) -> int:
+    """
+    Estimated work of analyzing one resume, in characters of text.
+
+    Extraction time grows with the pages read and analysis time with the text
+    length; both are capped by the extraction limits of pdf_extract.
+
+    :param pages: Page count of the PDF.
+    :return: Estimated characters.
+    """
+    if MAX_PAGES:
+        pages = min(pages, MAX_PAGES)
+    chars = pages * CHARS_PER_PAGE
+    return min(chars, MAX_CHARS) if MAX_CHARS else chars
+
+
+def check_batch_size(count: int) -> None:
+    """
+    Turn away a batch with more resumes than MAX_BATCH_FILES.
+
+    :param count: Files in the request.
+    :raises Rejected: With status 413.
+    """
+    if MAX_BATCH_FILES and count > MAX_BATCH_FILES:
+        metrics.REJECTIONS.inc("batch_files")
+        raise Rejected(f"At most {MAX_BATCH_FILES} resumes per request; submit larger batches to /analysis-jobs",
+                       413, "batch_files")
+
+
+def screen_upload(upload: Upload) -> int:
+    """
+    Check an upload against MAX_PDF_PAGES and estimate its cost.
+
+    :param upload: The uploaded resume.
+    :return: estimate_cost of the resume.
+    :raises Rejected: With status 413 if it has too many pages.
+    """
+    pages = count_pages(upload.source)
+    if MAX_PDF_PAGES and pages > MAX_PDF_PAGES:
+        metrics.REJECTIONS.inc("pages")
+        raise Rejected(f"{upload.filename} has {pages} pages; at most {MAX_PDF_PAGES} are accepted", 413, "pages")
+    return estimate_cost(pages)
+
+
+def screen_uploads(uploads: Sequence[Upload]) -> Tuple[List[Upload], List[Dict[str, str]], int]:
+    """
+    screen_upload for every resume of a batch.
+
+    :param uploads: Uploads read from the request.
+    :return: The accepted uploads, error entries for the others (which are
+             closed), and the total cost of the accepted ones.
+    """
+    accepted = []
+    failed = []
+    cost = 0
+    for upload in uploads:
+        try:
+            cost += screen_upload(upload)
+        except Rejected as e:
+            failed.append({"filename": upload.filename, "error": str(e)})
+            close_uploads([upload])
+            continue
+        accepted.append(upload)
+    return accepted, failed, cost
+
+
+# ===================== WORK BUDGET =====================
+class Reservation:
+    """Budget held by one request; release it (or leave its with block) when the work is done."""
+
+    def __init__(self, budget: "WorkBudget", reservation_id: Optional[int]):
+        self.budget = budget
+        self.reservation_id = reservation_id
+
+    def release(self) -> None:
+        if self.reservation_id is not None:
+            self.budget.release(self.reservation_id)
+            self.reservation_id = None
+
+    def __enter__(self) -> "Reservation":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.release()
+
+
+class WorkBudget:
+    """
+    Estimated work in flight, with a limit on what new requests may add.
+
+    A request reserves the estimated cost of its resumes before any of them is
+    extracted and releases it when it is done. A request that would take the
+    total past the budget is turned away at once with Retry-After: batches
+    with 429 once they would pass BATCH_SHARE of the budget, single resumes
+    with 503 only once the whole budget is spent. A request costing more than
+    the budget on its own is only admitted when nothing else is in flight.
+
+    With a SQLite path the budget is shared by every process using the file
+    (gunicorn workers, the async server); reservations of processes that died
+    are dropped on the next reservation. If the database fails, requests are
+    admitted (and the error logged) rather than refused.
+    """
+
+    def __init__(self, path: Optional[str] = DEFAULT_BUDGET_PATH, budget: int = DEFAULT_BUDGET,
+                 batch_share: float = BATCH_SHARE, retry_after: int = RETRY_AFTER):
+        """
+        :param path: SQLite file, or None/empty for a budget of this process only.
+        :param budget: Limit in estimated characters (0 = no limit).
+        :param batch_share: Share of the budget batches may fill.
+        :param retry_after: Seconds sent in Retry-After with a refusal.
+        """
+        self.path = path or None
+        self.budget = budget
+        self.batch_share = batch_share
+        self.retry_after = retry_after
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # In-memory reservations: id -> cost.
+        self._reservations: Dict[int, int] = {}
+        self._ids = itertools.count(1)
+
+    # ---------- connection handling ----------
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        """One connection per thread and process (connections must not cross a fork)."""
+        if not self.path:
+            return None
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Reservations only matter while the servers run; they need not survive a crash.
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS reservations ("
+            " id INTEGER PRIMARY KEY, pid INTEGER NOT NULL, cost INTEGER NOT NULL, created REAL NOT NULL)"
+        )
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    # ---------- public API ----------
+    def in_flight(self) -> int:
+        """Estimated characters currently reserved."""
+        conn = self._connection()
+        if conn is None:
+            with self._lock:
+                return sum(self._reservations.values())
+        return conn.execute("SELECT COALESCE(SUM(cost), 0) FROM reservations").fetchone()[0]
+
+    def reserve(self, cost: int, batch: bool = False) -> Reservation:
+        """
+        Reserve budget for a request.
+
+        :param cost: Estimated characters (see estimate_cost).
+        :param batch: True for a recruiter batch, which may only fill BATCH_SHARE of the budget.
+        :return: The reservation.
+        :raises Rejected: With status 429 (batch) or 503 and Retry-After when the budget is spent.
+        """
+        if not self.budget:
+            return Reservation(self, None)
+        conn = self._connection()
+        if conn is None:
+            with self._lock:
+                self._admit(cost, batch, sum(self._reservations.values()))
+                reservation_id = next(self._ids)
+                self._reservations[reservation_id] = cost
+            return Reservation(self, reservation_id)
+
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._drop_dead(conn)
+                self._admit(cost, batch, conn.execute("SELECT COALESCE(SUM(cost), 0) FROM reservations").fetchone()[0])
+                reservation_id = conn.execute(
+                    "INSERT INTO reservations (pid, cost, created) VALUES (?, ?, ?)",
+                    (os.getpid(), cost, time.time())).lastrowid
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            logger.warning("Work budget unavailable, admitting request: %s", e)
+            return Reservation(self, None)
+        return Reservation(self, reservation_id)
+
+    def release(self, reservation_id: int) -> None:
+        """Give back a reservation. Failures are logged, never raised."""
+        conn = self._connection()
+        if conn is None:
+            with self._lock:
+                self._reservations.pop(reservation_id, None)
+            return
+        try:
+            conn.execute("DELETE FROM reservations WHERE id = ?", (reservation_id,))
+        except sqlite3.Error as e:
+            logger.warning("Could not release work budget reservation %s: %s", reservation_id, e)
+
+    def clear(self) -> None:
+        """Drop every reservation (e.g. after all servers were stopped)."""
+        conn = self._connection()
+        if conn is None:
+            with self._lock:
+                self._reservations.clear()
+            return
+        conn.execute("DELETE FROM reservations")
+
+    # ---------- internals ----------
+    def _admit(self, cost: int, batch: bool, in_flight: int) -> None:
+        limit = self.budget * self.batch_share if batch else self.budget
+        if in_flight and in_flight + cost > limit:
+            reason = "batch_budget" if batch else "budget"
+            metrics.REJECTIONS.inc(reason)
+            raise Rejected("Server is busy; retry later", 429 if batch else 503, reason, self.retry_after)
+
+    @staticmethod
+    def _drop_dead(conn: sqlite3.Connection) -> None:
+        """Remove reservations of processes that exited without releasing them."""
+        conn.execute("DELETE FROM reservations WHERE created < ?", (time.time() - STALE_SECONDS,))
+        for (pid,) in conn.execute("SELECT DISTINCT pid FROM reservations").fetchall():
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                conn.execute("DELETE FROM reservations WHERE pid = ?", (pid,))
+            except OSError:
+                pass
+
+
+# ===================== DEFAULT BUDGET =====================
+WORK_BUDGET = WorkBudget()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or reset the shared work budget.")
+    parser.add_argument("command", choices=["stats", "clear"])
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        print(f"{WORK_BUDGET.in_flight()} of {WORK_BUDGET.budget} estimated characters in flight")
+    else:
+        WORK_BUDGET.clear()
+        print("Cleared all reservations")
@@ -0,0 +1,289 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import metrics
+from data_base import SKILLS_DB
+from nlp_engine import MODEL_NAME
+from pdf_extract import EXTRACTION_VERSION, MAX_CHARS, MAX_PAGES
+from resume_analysis import ANALYSIS_VERSION
+
+logger = logging.getLogger(__name__)
+
+# ===================== CACHE CONFIGURATION =====================
+# On-disk store; set ANALYSIS_CACHE_PATH to an empty string to keep the cache in memory only.
+DEFAULT_CACHE_PATH = os.environ.get("ANALYSIS_CACHE_PATH", os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "cache", "analysis_cache.sqlite3"))
+# Entries held in the in-process LRU front.
+DEFAULT_MEMORY_ITEMS = int(os.environ.get("ANALYSIS_CACHE_MEMORY_ITEMS", 512))
+# Total size of stored values on disk before least-recently-used entries are evicted.
+DEFAULT_MAX_BYTES = int(os.environ.get("ANALYSIS_CACHE_MAX_MB", 256)) * 1024 * 1024
+# Entries older than this are evicted regardless of use.
+DEFAULT_MAX_AGE = float(os.environ.get("ANALYSIS_CACHE_MAX_AGE_DAYS", 30)) * 24 * 3600
+# Run an eviction sweep every N writes.
+SWEEP_EVERY = 200
+
+
+def file_digest(data: bytes) -> str:
+    """
+    Content address of an uploaded file.
+
+    :param data: Raw file bytes.
+    :return: Hex SHA-256 digest.
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def fingerprint(*parts: Any) -> str:
+    """
+    Short, stable fingerprint of JSON-serializable values, used as a cache version.
+
+    :param parts: Values the cached data depends on (code versions, SKILLS_DB, ...).
+    :return: Hex digest prefix.
+    """
+    payload = json.dumps(parts, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+# ===================== TWO-LEVEL CACHE =====================
+class AnalysisCache:
+    """
+    Content-addressed cache with an in-memory LRU in front of a SQLite store.
+
+    Entries are grouped by kind ("text", "analysis"). Each kind has a version
+    string; entries written under another version are treated as misses and
+    purged by the next sweep. Values must be JSON-serializable and are returned
+    as fresh objects, so callers may mutate them freely.
+    """
+
+    def __init__(self, versions: Dict[str, str], path: Optional[str] = DEFAULT_CACHE_PATH,
+                 memory_items: int = DEFAULT_MEMORY_ITEMS, max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_age: float = DEFAULT_MAX_AGE):
+        self.versions = dict(versions)
+        self.path = path or None
+        self.memory_items = memory_items
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[Tuple[str, str, str], str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes = 0
+
+    # ---------- connection handling ----------
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        """One connection per thread and process (connections must not cross a fork)."""
+        if not self.path:
+            return None
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " kind TEXT NOT NULL, digest TEXT NOT NULL, version TEXT NOT NULL,"
+            " value TEXT NOT NULL, size INTEGER NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL,"
+            " PRIMARY KEY (kind, digest))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        conn.commit()
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    # ---------- public API ----------
+    def get(self, kind: str, digest: str) -> Optional[Any]:
+        """
+        Look up a cached value.
+
+        :param kind: Entry kind, e.g. "text" or "analysis".
+        :param digest: Content digest from file_digest.
+        :return: The cached value, or None on a miss.
+        """
+        key = (kind, digest, self.versions[kind])
+        with self._lock:
+            payload = self._memory.get(key)
+            if payload is not None:
+                self._memory.move_to_end(key)
+
+        if payload is None:
+            payload = self._disk_get(kind, digest)
+            if payload is not None:
+                self._remember(key, payload)
+
+        with self._lock:
+            if payload is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        metrics.CACHE_REQUESTS.inc(kind, "miss" if payload is None else "hit")
+        return None if payload is None else json.loads(payload)
+
+    def put(self, kind: str, digest: str, value: Any) -> None:
+        """
+        Store a value in both cache levels.
+
+        :param kind: Entry kind, e.g. "text" or "analysis".
+        :param digest: Content digest from file_digest.
+        :param value: JSON-serializable value.
+        """
+        payload = json.dumps(value)
+        self._remember((kind, digest, self.versions[kind]), payload)
+        self._disk_put(kind, digest, payload)
+
+    def clear(self) -> None:
+        """Drop every entry from both levels."""
+        with self._lock:
+            self._memory.clear()
+        conn = self._connection()
+        if conn is not None:
+            with conn:
+                conn.execute("DELETE FROM entries")
+
+    def iter_entries(self, kind: str) -> Iterator[Tuple[str, Any]]:
+        """
+        Every stored value of one kind under the current version.
+
+        :param kind: Entry kind, e.g. "analysis".
+        :return: Iterator of (digest, value), oldest first.
+        """
+        conn = self._connection()
+        if conn is None:
+            version = self.versions[kind]
+            with self._lock:
+                entries = [(key[1], payload) for key, payload in self._memory.items()
+                           if key[0] == kind and key[2] == version]
+        else:
+            entries = conn.execute(
+                "SELECT digest, value FROM entries WHERE kind = ? AND version = ? ORDER BY created",
+                (kind, self.versions[kind])
+            ).fetchall()
+        for digest, payload in entries:
+            yield digest, json.loads(payload)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for this process."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "memory_entries": len(self._memory),
+            }
+
+    def sweep(self) -> None:
+        """Evict stale-version, expired and least-recently-used entries from disk."""
+        conn = self._connection()
+        if conn is None:
+            return
+        try:
+            with conn:
+                for kind, version in self.versions.items():
+                    conn.execute("DELETE FROM entries WHERE kind = ? AND version != ?", (kind, version))
+                if self.max_age:
+                    conn.execute("DELETE FROM entries WHERE created < ?", (time.time() - self.max_age,))
+                if self.max_bytes:
+                    total = 0
+                    evict = []
+                    for kind, digest, size in conn.execute(
+                            "SELECT kind, digest, size FROM entries ORDER BY accessed DESC"):
+                        total += size
+                        if total > self.max_bytes:
+                            evict.append((kind, digest))
+                    conn.executemany("DELETE FROM entries WHERE kind = ? AND digest = ?", evict)
+        except sqlite3.Error as e:
+            logger.warning("Analysis cache sweep failed: %s", e)
+
+    # ---------- internals ----------
+    def _remember(self, key: Tuple[str, str, str], payload: str) -> None:
+        if not self.memory_items:
+            return
+        with self._lock:
+            self._memory[key] = payload
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def _disk_get(self, kind: str, digest: str) -> Optional[str]:
+        try:
+            conn = self._connection()
+            if conn is None:
+                return None
+            row = conn.execute(
+                "SELECT value, created FROM entries WHERE kind = ? AND digest = ? AND version = ?",
+                (kind, digest, self.versions[kind])
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if self.max_age and row[1] < now - self.max_age:
+                return None
+            with conn:
+                conn.execute("UPDATE entries SET accessed = ? WHERE kind = ? AND digest = ?", (now, kind, digest))
+            return row[0]
+        except sqlite3.Error as e:
+            # A cache failure must never fail the analysis; treat it as a miss.
+            logger.warning("Analysis cache read failed: %s", e)
+            return None
+
+    def _disk_put(self, kind: str, digest: str, payload: str) -> None:
+        try:
+            conn = self._connection()
+            if conn is None:
+                return
+            now = time.time()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (kind, digest, version, value, size, created, accessed)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (kind, digest, self.versions[kind], payload, len(payload), now, now)
+                )
+        except sqlite3.Error as e:
+            logger.warning("Analysis cache write failed: %s", e)
+            return
+
+        with self._lock:
+            self._writes += 1
+            due = self._writes % SWEEP_EVERY == 0
+        if due:
+            self.sweep()
+
+
+# ===================== DEFAULT CACHE =====================
+def default_versions() -> Dict[str, str]:
+    """
+    Cache versions for extracted text, resume analyses and analysis artifacts.
+
+    Analyses depend on SKILLS_DB as well as the analysis code, so editing the
+    skills taxonomy invalidates them; extracted text survives such edits, and
+    so do the artifacts (tokens, matched variations, sections) that
+    rescoring.py rebuilds analyses from. "taxonomy" entries hold the SKILLS_DB
+    snapshots those artifacts were matched against.
+
+    Text is truncated to PDF_MAX_PAGES / PDF_MAX_CHARS, so changing either
+    limit invalidates everything derived from it.
+    """
+    extraction = (EXTRACTION_VERSION, MAX_PAGES, MAX_CHARS)
+    return {
+        "text": fingerprint(*extraction),
+        "analysis": fingerprint(ANALYSIS_VERSION, SKILLS_DB, *extraction),
+        "artifacts": fingerprint(*extraction, ANALYSIS_VERSION, MODEL_NAME),
+        "taxonomy": "1",
+    }
+
+
+CACHE = AnalysisCache(default_versions())
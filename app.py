@@ -1,77 +1,118 @@
-from flask import Flask, request, jsonify, render_template, redirect
+from flask import Flask, request, jsonify, render_template, Response, stream_with_context, g
 import os
-import fitz
-import uuid
-from werkzeug.utils import secure_filename
-from pdfminer.high_level import extract_text as pdfminer_extract
-from resume_analysis import analyze_resume, extract_job_skills, compare_skills, analyze_match
-from job import parse_job_description
-from PyPDF2 import PdfReader
-import re
+import itertools
+import json
+import logging
+import time
+import metrics
+from log_config import configure_logging, describe_text
+from resume_analysis import extract_sections
+from job import compile_job_profile
+from pdf_extract import iter_pdf_pages
+from batch import analyze_source, iter_batch, rank_results, final_match_value, DEFAULT_WORKERS, DEFAULT_RESUME_TIMEOUT
+from task_queue import TaskQueue, QueueFull, start_background_worker, FINISHED_STATES
+from candidate_index import CANDIDATE_INDEX, DEFAULT_TOP_K, index_resume
+from dedup import group_duplicates
+from storage import RESULT_STORE, DEFAULT_LIMIT, STORE_BATCH_SIZE, store_results
+from upload_store import close_uploads, read_upload, read_uploads, retain_upload
+from admission import MAX_REQUEST_BYTES, WORK_BUDGET, Rejected, check_batch_size, screen_upload, screen_uploads
+from werkzeug.exceptions import RequestEntityTooLarge
 
 app = Flask(__name__)
+configure_logging()
+logger = logging.getLogger(__name__)
 
 # Configuration
 UPLOAD_FOLDER = "uploads"
 ALLOWED_EXTENSIONS = {"pdf"}
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
+app.config["BATCH_WORKERS"] = DEFAULT_WORKERS
+app.config["BATCH_RESUME_TIMEOUT"] = DEFAULT_RESUME_TIMEOUT
+# Bodies over the limit are refused with a 413 from their Content-Length, before they are read.
+app.config["MAX_CONTENT_LENGTH"] = MAX_REQUEST_BYTES or None
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Queue for large batches, drained by `python task_queue.py` running next to the web
+# server. TASK_QUEUE_WORKER=thread drains it from a background thread of one web
+# process instead (for single-process setups without a separate worker).
+TASK_QUEUE = TaskQueue()
+app.config["TASK_QUEUE_WORKER"] = os.environ.get("TASK_QUEUE_WORKER", "external")
+_queue_worker_pid = None
+
+# ===================== METRICS =====================
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    # ?trace=1 adds the time spent in each analysis stage to a JSON response.
+    if request.args.get("trace") == "1":
+        metrics.start_trace()
+
+
+@app.after_request
+def record_request_metrics(response):
+    trace = metrics.stop_trace()
+    # Streamed responses are timed up to their first byte.
+    elapsed = time.perf_counter() - g.request_started
+    if trace is not None and response.is_json and not response.is_streamed:
+        data = response.get_json()
+        if isinstance(data, dict):
+            data["trace"] = {"total_ms": round(elapsed * 1000, 3), "stages": trace}
+            response.set_data(json.dumps(data))
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    metrics.REQUEST_SECONDS.observe(elapsed, endpoint, str(response.status_code))
+    metrics.dump()
+    return response
+
+
+@app.teardown_request
+def stop_request_trace(exc):
+    # after_request is skipped when a view raises; never leak a trace into the next request.
+    metrics.stop_trace()
+
+
+# ===================== ADMISSION CONTROL =====================
+@app.errorhandler(Rejected)
+def rejected_request(error):
+    response = jsonify({"error": str(error)})
+    if error.retry_after:
+        response.headers["Retry-After"] = str(error.retry_after)
+    return response, error.status
+
+
+@app.errorhandler(RequestEntityTooLarge)
+def request_too_large(error):
+    metrics.REJECTIONS.inc("request_size")
+    return jsonify({"error": f"Request larger than {MAX_REQUEST_BYTES / (1024 * 1024):g} MB"}), 413
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    """Prometheus scrape endpoint."""
+    if not metrics.ENABLED:
+        return jsonify({"error": "Metrics are disabled"}), 404
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
 def read_pdf(file):
     try:
-        reader = PdfReader(file)
-        text = ""
-        for page in reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
-        if not text:
+        # Same streaming extractor chain as parse_pdf, page and size limits included.
+        source = file.read() if hasattr(file, "read") else file
+        text = "".join(iter_pdf_pages(source))
+        if not text.strip():
             raise ValueError("No extractable text found in the PDF")
-        print("Extracted Text:")  # Debugging: print extracted text
-        print(text[:500])  # Print only the first 500 characters for review
+        logger.debug("Extracted text: %s", describe_text(text))
         return text
     except Exception as e:
-        print(f"Error reading PDF: {e}")
+        logger.warning("Error reading PDF: %s", e)
         return ""
 
 
 def extract_experience(text):
-    # Define keywords and possible section headers for experience
-    experience_keywords = [
-        r"\b(experience|work history|employment|professional experience)\b",  # Regex for keywords
-        r"\b(work experience|career summary)\b",  # Additional variations
-    ]
-
-    # Split text into lines
-    lines = text.split("\n")
-    print("Lines after splitting text:")
-    print(lines[:10])  # Print the first 10 lines for review
-
-    experience_section = []
-
-    capture = False
-    for line in lines:
-        line_lower = line.lower().strip()
-
-        # Debugging: check the line
-        print(f"Checking line: {line_lower}")
-
-        # Check for any experience-related keywords or section headers
-        if any(re.search(keyword, line_lower) for keyword in experience_keywords):
-            capture = True
-            continue  # Skip the keyword/section header itself
-
-        # Stop capturing if we reach other sections like education, skills, etc.
-        if capture and any(line_lower.startswith(section) for section in ["education", "skills", "projects"]):
-            break
-
-        if capture:
-            experience_section.append(line)
-
-    print("Extracted experience section:")
-    print("\n".join(experience_section))  # Print the experience section
-
-    return "\n".join(experience_section).strip()
+    # The experience section as found by the shared section segmenter.
+    experience = "\n".join(extract_sections(text).get("Experience", [])).strip()
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Extracted experience section: %s", describe_text(experience))
+    return experience
 
 def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -113,30 +154,35 @@ def compare_resume_job():
         return jsonify({"error": "Empty job description"}), 400
 
     # Process the resume file.
-    resume_analysis = process_resume(resume_file)
+    digest, resume_analysis = process_resume(resume_file)
     if "error" in resume_analysis:
         return jsonify(resume_analysis), 500
 
     # Parse the job description to extract required skills, experience, and education.
-    job_data = parse_job_description(job_text)
+    # Compiled profiles are cached by text hash, so a repeated posting is parsed once.
+    job = compile_job_profile(job_text)
+    job_data = job.to_dict()
 
     # ✅ Ensure `required_skills` exists and is a list.
     if "required_skills" not in job_data or not isinstance(job_data["required_skills"], list):
         job_data["required_skills"] = []  # Prevents undefined errors
 
     # Compare skills (for a basic overview).
-    skill_comparison = compare_skills(resume_analysis["skills"], job_data["required_skills"])
+    skill_comparison = job.compare_skills(resume_analysis["skills"])
 
     # Get the composite match result using the new matching logic.
-    match_result = analyze_match(resume_analysis, job_data)
+    match_result = job.match(resume_analysis)
 
     response_data = {
         "message": "Comparison successful",
         "skill_comparison": skill_comparison,
         "match_result": match_result,
         "analysis": resume_analysis,
-        "job_data": job_data
+        "job_data": job_data,
+        "job_digest": job.digest
     }
+    store_results(job, [{"filename": resume_file.filename, "digest": digest, "skill_comparison": skill_comparison,
+                         "match_result": match_result, "analysis": resume_analysis}])
 
       # Debugging Output
 
@@ -152,83 +198,303 @@ def compare_multiple_resumes():
         return jsonify({"error": "No resume files uploaded"}), 400
     if not job_text.strip():
         return jsonify({"error": "Empty job description"}), 400
+    check_batch_size(len(resumes))
 
-    job_data = parse_job_description(job_text)
-    results = []
-    for resume in resumes:
-        try:
-            resume_analysis = process_resume(resume)
-
-            if "error" in resume_analysis:
-                results.append({
-                    "filename": resume.filename,
-                    "error": resume_analysis["error"]
-                })
-                continue
-
-            skill_comparison = compare_skills(resume_analysis["skills"], job_data.get("required_skills", []))
-            match_result = analyze_match(resume_analysis, job_data)
-            results.append({
-                "filename": resume.filename,
-                "skill_comparison": skill_comparison,
-                "match_result": match_result,
-                "analysis": resume_analysis
-            })
-        except Exception as e:
-            results.append({
-                "filename": resume.filename,
-                "error": f"Failed to process resume: {str(e)}"
-            })
-
-    # Sort the results in descending order based on the 'final_match' value after stripping the '%' symbol.
-    results = sorted(
-        results,
-        key=lambda r: float(r.get("match_result", {}).get("final_match", "0").replace('%', '').strip()),
-        reverse=True
-    )
+    job = compile_job_profile(job_text)
+    uploads, results = read_uploads(resumes)
+    uploads, rejected, cost = screen_uploads(uploads)
+    results.extend(rejected)
+
+    try:
+        # Refused with 429 and Retry-After when the server already has its fill of batches.
+        with WORK_BUDGET.reserve(cost, batch=True):
+            results.extend(iter_batch(
+                [(upload.filename, upload.source) for upload in uploads], job,
+                workers=app.config["BATCH_WORKERS"],
+                timeout=app.config["BATCH_RESUME_TIMEOUT"]
+            ))
+    finally:
+        close_uploads(uploads)
+
+    # Sort the results in descending order based on the 'final_match' value.
+    results = rank_results(results)
+    store_results(job, results)
 
     return jsonify({
         "message": "Comparison completed",
         "results": results,
-        "job_data": job_data
+        "job_data": job.to_dict(),
+        "job_digest": job.digest,
+        # Uploads that are the same resume, or near-duplicates of each other.
+        "duplicate_groups": group_duplicates(results)
     }), 200
 
 
-def process_resume(file):
+# Streaming variant: one NDJSON line per scored resume, then a ranked summary.
+@app.route("/compare-multiple/stream", methods=["POST"])
+def compare_multiple_resumes_stream():
+    resumes = request.files.getlist("resumes")
+    job_text = request.form.get("job_description", "")
+
+    if not resumes or all(r.filename == '' for r in resumes):
+        return jsonify({"error": "No resume files uploaded"}), 400
+    if not job_text.strip():
+        return jsonify({"error": "Empty job description"}), 400
+    check_batch_size(len(resumes))
+
+    job = compile_job_profile(job_text)
+    uploads, failed = read_uploads(resumes)
+    uploads, rejected, cost = screen_uploads(uploads)
+    failed.extend(rejected)
+    try:
+        reservation = WORK_BUDGET.reserve(cost, batch=True)
+    except Rejected:
+        close_uploads(uploads)
+        raise
+    files = [(upload.filename, upload.source) for upload in uploads]
+    workers = app.config["BATCH_WORKERS"]
+    timeout = app.config["BATCH_RESUME_TIMEOUT"]
+
+    def generate():
+        # The work happens while the stream is read, so the budget is held until it ends.
+        try:
+            yield from generate_events()
+        finally:
+            reservation.release()
+            close_uploads(uploads)
+
+    def generate_events():
+        yield ndjson({"event": "job", "job_data": job.to_dict(), "job_digest": job.digest,
+                      "total": len(files) + len(failed)})
+
+        # Only the ranking keys are kept, so memory stays flat however large the batch is;
+        # results are stored in bounded batches.
+        ranking = []
+        unsaved = []
+        for result_id, result in enumerate(itertools.chain(failed, iter_batch(files, job, workers, timeout))):
+            ranking.append((final_match_value(result), result_id, result["filename"],
+                            result.get("duplicate_of") or result.get("digest")))
+            unsaved.append(result)
+            if len(unsaved) >= STORE_BATCH_SIZE:
+                store_results(job, unsaved)
+                unsaved = []
+            yield ndjson({"event": "result", "id": result_id, "result": result})
+        store_results(job, unsaved)
+
+        duplicate_groups = group_duplicates(
+            {"filename": filename, "digest": key} for _, _, filename, key in ranking)
+        ranking.sort(key=lambda entry: (-entry[0], entry[1]))
+        yield ndjson({
+            "event": "summary",
+            "message": "Comparison completed",
+            "ranking": [
+                {"id": result_id, "filename": filename, "final_match": f"{value:.1f}%"}
+                for value, result_id, filename, _ in ranking
+            ],
+            "duplicate_groups": duplicate_groups
+        })
+
+    # Ask reverse proxies (nginx) not to buffer the stream.
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson",
+                    headers={"X-Accel-Buffering": "no"})
+
+
+# Endpoints for queued batches: submit, poll or subscribe, cancel.
+@app.route("/analysis-jobs", methods=["POST"])
+def submit_analysis_job():
+    resumes = request.files.getlist("resumes")
+    job_text = request.form.get("job_description", "")
+
+    if not resumes or all(r.filename == '' for r in resumes):
+        return jsonify({"error": "No resume files uploaded"}), 400
+    if not job_text.strip():
+        return jsonify({"error": "Empty job description"}), 400
+
+    job = compile_job_profile(job_text)
+    uploads, failed = read_uploads(resumes)
+    # Queued jobs outlive the request, so their resumes go to disk until they are scored.
+    try:
+        files = [(upload.filename, upload.save(app.config["UPLOAD_FOLDER"])) for upload in uploads]
+    finally:
+        close_uploads(uploads)
+    try:
+        job_id = TASK_QUEUE.submit(job, files, failed)
+    except QueueFull as e:
+        for _, filepath in files:
+            os.remove(filepath)
+        response = jsonify({"error": str(e)})
+        response.headers["Retry-After"] = "30"
+        return response, 429
+
+    ensure_queue_worker()
+    return jsonify({
+        "message": "Job queued",
+        "job_id": job_id,
+        "status_url": f"/analysis-jobs/{job_id}"
+    }), 202
+
+
+@app.route("/analysis-jobs/<job_id>", methods=["GET"])
+def analysis_job_status(job_id):
+    ensure_queue_worker()
+    status = TASK_QUEUE.status(job_id)
+    if status is None:
+        return jsonify({"error": "Unknown job id"}), 404
+    return jsonify(status), 200
+
+
+@app.route("/analysis-jobs/<job_id>/events", methods=["GET"])
+def analysis_job_events(job_id):
+    """NDJSON progress events until the job finishes, then its ranked results."""
+    ensure_queue_worker()
+    if TASK_QUEUE.status(job_id, include_results=False) is None:
+        return jsonify({"error": "Unknown job id"}), 404
+
+    def generate():
+        last_progress = None
+        while True:
+            status = TASK_QUEUE.status(job_id, include_results=False)
+            if status["status"] in FINISHED_STATES:
+                yield ndjson({"event": "summary", **TASK_QUEUE.status(job_id)})
+                return
+            if status["progress"] != last_progress:
+                last_progress = status["progress"]
+                yield ndjson({"event": "progress", "status": status["status"], "progress": last_progress})
+            time.sleep(1)
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson",
+                    headers={"X-Accel-Buffering": "no"})
+
+
+@app.route("/analysis-jobs/<job_id>/cancel", methods=["POST"])
+def cancel_analysis_job(job_id):
+    status = TASK_QUEUE.cancel(job_id)
+    if status is None:
+        return jsonify({"error": "Unknown job id"}), 404
+    return jsonify({"job_id": job_id, "status": status}), 200
+
+
+# Endpoints for the candidate index: best already-analyzed resumes for a job.
+@app.route("/candidates/search", methods=["POST"])
+def search_candidates():
+    data = request.get_json(silent=True) or request.form
+    job_text = data.get("job_description", "")
+    if not job_text.strip():
+        return jsonify({"error": "Empty job description"}), 400
     try:
-        # Generate a unique filename to prevent overwrites
-        unique_id = uuid.uuid4().hex
-        original_name = secure_filename(file.filename)
-        filename = f"{unique_id}_{original_name}"
-        filepath = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-        file.save(filepath)
-        # Rest of the code...
+        k = int(data.get("k", DEFAULT_TOP_K))
+    except (TypeError, ValueError):
+        return jsonify({"error": "k must be an integer"}), 400
+    if k < 1:
+        return jsonify({"error": "k must be at least 1"}), 400
 
-        raw_text = parse_pdf(filepath)
-        if raw_text.startswith("Error:"):
-            return {"error": raw_text}
+    job = compile_job_profile(job_text)
+    return jsonify({
+        "message": "Search completed",
+        "results": CANDIDATE_INDEX.search(job, k),
+        "indexed": len(CANDIDATE_INDEX),
+        "job_data": job.to_dict()
+    }), 200
 
-        return analyze_resume(raw_text)
 
-    except Exception as e:
-        return {"error": f"Processing error: {str(e)}"}
+@app.route("/candidates/<digest>", methods=["DELETE"])
+def remove_candidate(digest):
+    if not CANDIDATE_INDEX.remove(digest):
+        return jsonify({"error": "Unknown resume"}), 404
+    return jsonify({"digest": digest, "status": "removed"}), 200
 
 
-def parse_pdf(filepath):
-    """Extract text from PDF using PyMuPDF, fallback to pdfminer."""
-    text = ""
+# Endpoints for stored results: past matches of a job, resumes by skill and degree,
+# and the stored pool ranked against a new job.
+@app.route("/results/jobs/<job_digest>", methods=["GET"])
+def stored_job_matches(job_digest):
+    job_data = RESULT_STORE.get_job(job_digest)
+    if job_data is None:
+        return jsonify({"error": "Unknown job"}), 404
     try:
-        with fitz.open(filepath) as doc:
-            text = "".join(page.get_text() for page in doc)
-            if text.strip():
-                return text.strip()
-    except Exception:
-        pass
+        limit = int(request.args.get("limit", DEFAULT_LIMIT))
+        min_score = request.args.get("min_score")
+        min_score = float(min_score) if min_score is not None else None
+    except ValueError:
+        return jsonify({"error": "limit and min_score must be numbers"}), 400
+    return jsonify({
+        "job_digest": job_digest,
+        "job_data": job_data,
+        "results": RESULT_STORE.job_matches(job_digest, limit, min_score)
+    }), 200
 
+
+@app.route("/results/resumes", methods=["GET"])
+def stored_resumes():
+    try:
+        limit = int(request.args.get("limit", DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    return jsonify({
+        "results": RESULT_STORE.find_resumes(request.args.getlist("skill"), request.args.get("degree"), limit)
+    }), 200
+
+
+@app.route("/results/rank", methods=["POST"])
+def rank_stored_resumes():
+    data = request.get_json(silent=True) or request.form
+    job_text = data.get("job_description", "")
+    if not job_text.strip():
+        return jsonify({"error": "Empty job description"}), 400
+    try:
+        limit = int(data.get("limit", DEFAULT_LIMIT))
+    except (TypeError, ValueError):
+        return jsonify({"error": "limit must be an integer"}), 400
+
+    job = compile_job_profile(job_text)
+    return jsonify({
+        "message": "Ranking completed",
+        "results": RESULT_STORE.rank_stored(job, limit),
+        "stored": RESULT_STORE.stats()["resumes"],
+        "job_data": job.to_dict(),
+        "job_digest": job.digest
+    }), 200
+
+
+def ensure_queue_worker():
+    """
+    In thread mode, start the server's queue-draining thread in this process if no
+    other web process runs it (threads do not survive a fork, so this is checked per process).
+    """
+    global _queue_worker_pid
+    if (app.config["TASK_QUEUE_WORKER"] == "thread" and _queue_worker_pid != os.getpid()
+            and TASK_QUEUE.acquire_worker_lock()):
+        _queue_worker_pid = os.getpid()
+        start_background_worker(
+            TASK_QUEUE,
+            workers=app.config["BATCH_WORKERS"],
+            timeout=app.config["BATCH_RESUME_TIMEOUT"]
+        )
+
+
+def ndjson(event):
+    """Serialize one streaming event as a newline-terminated JSON line."""
+    return json.dumps(event) + "\n"
+
+
+def process_resume(file):
     try:
-        return pdfminer_extract(filepath).strip()
+        # Analyzed from memory; the original is only kept if a retention period is configured.
+        with read_upload(file) as upload:
+            # Too many pages (413) or no budget left (503) is answered before any extraction.
+            with WORK_BUDGET.reserve(screen_upload(upload)):
+                retain_upload(upload)
+                digest, analysis = analyze_source(upload.source, upload.digest)
+        # Every analyzed upload becomes searchable through /candidates/search.
+        if digest is not None:
+            index_resume(digest, analysis, file.filename)
+        return digest, analysis
+
+    except Rejected:
+        raise
     except Exception as e:
-        return f"Error: Failed to extract text - {str(e)}"
+        metrics.ERRORS.inc("analysis")
+        return None, {"error": f"Processing error: {str(e)}"}
 
 
 if __name__ == "__main__":
@@ -0,0 +1,339 @@
+# Async serving mode: uvicorn asgi:app --host 127.0.0.1 --port 8000
+#
+# Same JSON contracts as /compare and /compare-multiple in app.py and
+# /upload_job_description in job.py, but uploads are received on an event loop
+# and parse_pdf / analyze_resume / parse_job_description run in a bounded pool
+# of worker processes, so a slow client costs an idle coroutine instead of a
+# whole server process. Streaming, queued jobs and the search endpoints are
+# served by the Flask app (gunicorn -c gunicorn.conf.py app:app).
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from quart import Quart, Response, g, jsonify, request
+from werkzeug.exceptions import RequestEntityTooLarge
+
+import metrics
+from admission import (MAX_REQUEST_BYTES, WORK_BUDGET, Rejected, Reservation, check_batch_size, screen_upload,
+                       screen_uploads)
+from batch import DEFAULT_RESUME_TIMEOUT, analyze_source, init_worker, rank_results, score_with_timeout
+from candidate_index import index_resume
+from dedup import group_duplicates
+from job import JobProfile, cache_job_profile, cached_job_profile, job_digest, parse_job_description
+from log_config import configure_logging
+from nlp_engine import preload, share_model, vocab_recycle_due
+from storage import store_results
+from upload_store import close_uploads, read_upload, read_uploads, retain_upload
+from worker_memory import over_watermark
+
+logger = logging.getLogger(__name__)
+
+# ===================== ASYNC SERVER CONFIGURATION =====================
+# Worker processes for PDF extraction and analysis, per server process (defaults to one per core).
+CPU_WORKERS = int(os.environ.get("ASGI_CPU_WORKERS", os.cpu_count() or 1))
+# Seconds a client may take to send its request body before it is dropped.
+BODY_TIMEOUT = float(os.environ.get("ASGI_BODY_TIMEOUT", 120))
+
+app = Quart(__name__)
+configure_logging()
+app.config["MAX_CONTENT_LENGTH"] = MAX_REQUEST_BYTES or None
+app.config["BODY_TIMEOUT"] = BODY_TIMEOUT
+app.config["BATCH_RESUME_TIMEOUT"] = DEFAULT_RESUME_TIMEOUT
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+# Tasks handed to the pool at once; the rest wait on the event loop, not in the pool's queue.
+_cpu_slots: Optional[asyncio.Semaphore] = None
+
+
+# ===================== CPU EXECUTOR =====================
+def _init_cpu_worker() -> None:
+    """init_worker, then mark the model inherited from the server as shared (see nlp_engine.share_model)."""
+    init_worker()
+    share_model()
+
+
+def _call_with_metrics(func: Callable, args: Tuple) -> Tuple[Any, Optional[List], Optional[str]]:
+    """
+    Run func in a worker process; what it records travels back to be merged by
+    the server, with why the worker should be replaced: "vocab" past
+    NLP_VOCAB_RESET_STRINGS, "memory" past WORKER_MAX_MEMORY_MB, else None.
+    """
+    with metrics.capture() as captured:
+        result = func(*args)
+    recycle = "vocab" if vocab_recycle_due() else "memory" if over_watermark() else None
+    return result, captured or None, recycle
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """
+    Return this server process's pool, starting it on first use.
+
+    :return: The pool the CPU-bound work is submitted to.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Load the model before the pool forks so every worker shares it copy-on-write.
+            preload()
+            _executor = ProcessPoolExecutor(CPU_WORKERS, initializer=_init_cpu_worker)
+        return _executor
+
+
+def _discard_executor(executor: ProcessPoolExecutor, broken: bool = True) -> None:
+    """
+    Drop a pool so the next task starts a new one.
+
+    :param executor: The pool to drop.
+    :param broken: True if a worker died (queued tasks are cancelled); False to
+                   retire a healthy pool, which finishes the tasks it was given.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is not executor:
+            return
+        _executor = None
+    executor.shutdown(wait=False, cancel_futures=broken)
+
+
+async def run_cpu(func: Callable, *args: Any) -> Any:
+    """
+    Run a CPU-bound function in the worker pool without blocking the event loop.
+
+    At most CPU_WORKERS tasks are in the pool at a time, so a burst of uploads
+    waits here instead of piling up pickled PDFs in the pool's queue.
+
+    :param func: Module-level (picklable) function.
+    :param args: Its arguments.
+    :return: What func returned.
+    """
+    global _cpu_slots
+    if _cpu_slots is None:
+        _cpu_slots = asyncio.Semaphore(CPU_WORKERS)
+    async with _cpu_slots:
+        executor = get_executor()
+        try:
+            result, captured, recycle = await asyncio.get_running_loop().run_in_executor(
+                executor, _call_with_metrics, func, args)
+        except BrokenProcessPool:
+            _discard_executor(executor)
+            raise
+    metrics.merge(captured)
+    if recycle and _executor is executor:
+        # Fork a fresh pool from this process's preloaded state for the next tasks.
+        metrics.WORKER_RECYCLES.inc(recycle)
+        _discard_executor(executor, broken=False)
+    return result
+
+
+def _compile_job(job_text: str, digest: str) -> JobProfile:
+    return JobProfile.from_job_data(parse_job_description(job_text), digest)
+
+
+async def compile_job(job_text: str) -> JobProfile:
+    """compile_job_profile, with a cache miss parsed in the worker pool."""
+    digest = job_digest(job_text)
+    job = cached_job_profile(digest)
+    if job is None:
+        job = await run_cpu(_compile_job, job_text, digest)
+        cache_job_profile(job)
+    return job
+
+
+@asynccontextmanager
+async def reserve(cost: int, batch: bool = False) -> AsyncIterator[Reservation]:
+    """WORK_BUDGET.reserve, with the budget database queried from a thread instead of the event loop."""
+    reservation = await asyncio.to_thread(WORK_BUDGET.reserve, cost, batch)
+    try:
+        yield reservation
+    finally:
+        await asyncio.to_thread(reservation.release)
+
+
+async def process_resume(file) -> Tuple[Optional[str], Dict[str, Any]]:
+    """app.process_resume, with the analysis in the worker pool."""
+    try:
+        # Hashing and spooling a large upload is blocking file I/O; keep it off the event loop.
+        with await asyncio.to_thread(read_upload, file) as upload:
+            async with reserve(await asyncio.to_thread(screen_upload, upload)):
+                retain_upload(upload)
+                digest, analysis = await run_cpu(analyze_source, upload.source, upload.digest)
+        if digest is not None:
+            await asyncio.to_thread(index_resume, digest, analysis, file.filename)
+        return digest, analysis
+
+    except Rejected:
+        raise
+    except Exception as e:
+        metrics.ERRORS.inc("analysis")
+        return None, {"error": f"Processing error: {str(e)}"}
+
+
+async def score_upload(filename: str, source, job: JobProfile) -> Dict[str, Any]:
+    """One /compare-multiple result entry, scored in the worker pool."""
+    try:
+        return await run_cpu(score_with_timeout, filename, source, job, app.config["BATCH_RESUME_TIMEOUT"])
+    except Exception as e:
+        return {"filename": filename, "error": f"Failed to process resume: {str(e)}"}
+
+
+# ===================== SERVER LIFECYCLE AND METRICS =====================
+@app.before_serving
+async def start_executor():
+    # Fork the pool before the first upload arrives, not while it waits.
+    await asyncio.to_thread(get_executor)
+
+
+@app.after_serving
+async def stop_executor():
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+@app.before_request
+async def start_request_metrics():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+async def record_request_metrics(response):
+    elapsed = time.perf_counter() - g.request_started
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    metrics.REQUEST_SECONDS.observe(elapsed, endpoint, str(response.status_code))
+    metrics.dump()
+    return response
+
+
+# ===================== ADMISSION CONTROL =====================
+@app.errorhandler(Rejected)
+async def rejected_request(error):
+    response = jsonify({"error": str(error)})
+    if error.retry_after:
+        response.headers["Retry-After"] = str(error.retry_after)
+    return response, error.status
+
+
+@app.errorhandler(RequestEntityTooLarge)
+async def request_too_large(error):
+    metrics.REJECTIONS.inc("request_size")
+    return jsonify({"error": f"Request larger than {MAX_REQUEST_BYTES / (1024 * 1024):g} MB"}), 413
+
+
+@app.route("/metrics")
+async def metrics_endpoint():
+    """Prometheus scrape endpoint."""
+    if not metrics.ENABLED:
+        return jsonify({"error": "Metrics are disabled"}), 404
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+# ===================== ROUTES =====================
+@app.route("/compare", methods=["POST"])
+async def compare_resume_job():
+    files = await request.files
+    form = await request.form
+    job_text = form.get("job_description", "")
+
+    if "resume" not in files:
+        return jsonify({"error": "No resume file"}), 400
+    resume_file = files["resume"]
+    if not (resume_file and resume_file.filename):
+        return jsonify({"error": "Empty resume file"}), 400
+    if not job_text.strip():
+        return jsonify({"error": "Empty job description"}), 400
+
+    digest, resume_analysis = await process_resume(resume_file)
+    if "error" in resume_analysis:
+        return jsonify(resume_analysis), 500
+
+    job = await compile_job(job_text)
+    job_data = job.to_dict()
+    if "required_skills" not in job_data or not isinstance(job_data["required_skills"], list):
+        job_data["required_skills"] = []
+
+    # Bitset comparisons: cheap enough for the event loop.
+    skill_comparison = job.compare_skills(resume_analysis["skills"])
+    match_result = job.match(resume_analysis)
+
+    await asyncio.to_thread(store_results, job, [{
+        "filename": resume_file.filename, "digest": digest, "skill_comparison": skill_comparison,
+        "match_result": match_result, "analysis": resume_analysis}])
+    return jsonify({
+        "message": "Comparison successful",
+        "skill_comparison": skill_comparison,
+        "match_result": match_result,
+        "analysis": resume_analysis,
+        "job_data": job_data,
+        "job_digest": job.digest
+    }), 200
+
+
+@app.route("/compare-multiple", methods=["POST"])
+async def compare_multiple_resumes():
+    files = await request.files
+    form = await request.form
+    resumes = files.getlist("resumes")
+    job_text = form.get("job_description", "")
+
+    if not resumes or all(r.filename == '' for r in resumes):
+        return jsonify({"error": "No resume files uploaded"}), 400
+    if not job_text.strip():
+        return jsonify({"error": "Empty job description"}), 400
+    check_batch_size(len(resumes))
+
+    job = await compile_job(job_text)
+    uploads, results = await asyncio.to_thread(read_uploads, resumes)
+    uploads, rejected, cost = await asyncio.to_thread(screen_uploads, uploads)
+    results.extend(rejected)
+    metrics.BATCH_SIZE.observe(len(uploads))
+    try:
+        async with reserve(cost, batch=True):
+            results.extend(await asyncio.gather(
+                *(score_upload(upload.filename, upload.source, job) for upload in uploads)))
+    finally:
+        close_uploads(uploads)
+
+    results = rank_results(results)
+    await asyncio.to_thread(store_results, job, results)
+    return jsonify({
+        "message": "Comparison completed",
+        "results": results,
+        "job_data": job.to_dict(),
+        "job_digest": job.digest,
+        "duplicate_groups": group_duplicates(results)
+    }), 200
+
+
+@app.route("/upload_job_description", methods=["POST"])
+async def upload_job_description():
+    try:
+        if request.is_json:
+            data = await request.get_json()
+        else:
+            data = await request.form
+
+        job_text = data.get("job_description")
+        if not job_text:
+            return jsonify({"error": "No job_description provided"}), 400
+
+        parsed_job = await run_cpu(parse_job_description, job_text)
+        return jsonify({
+            "message": "Job description processed successfully",
+            "job_data": parsed_job
+        }), 200
+
+    except Exception as e:
+        return jsonify({"error": f"Invalid request format: {str(e)}"}), 400
+
+
+if __name__ == "__main__":
+    app.run()
@@ -0,0 +1,386 @@
+import math
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import metrics
+from analysis_cache import CACHE, file_digest
+from dedup import duplicate_key, remember_signature, reuse_near_duplicate
+from job import JobProfile
+from nlp_engine import preload
+from pdf_extract import PdfSource, parse_pdf
+from rescoring import store_artifacts
+from resume_analysis import analysis_from_artifacts, extract_artifacts
+from skill_matcher import SKILL_VOCABULARY
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# ===================== BATCH CONFIGURATION =====================
+# Worker processes used for a batch (defaults to one per core).
+DEFAULT_WORKERS = int(os.environ.get("BATCH_WORKERS", os.cpu_count() or 1))
+# Batch worker processes allowed at once across every process sharing BATCH_SLOTS_PATH
+# (gunicorn workers, queue workers), so concurrent batches do not each start a full pool.
+MAX_POOL_PROCESSES = int(os.environ.get("BATCH_MAX_PROCESSES", os.cpu_count() or 1))
+# Directory of the lock files counting those processes (empty = no server-wide limit).
+SLOTS_PATH = os.environ.get("BATCH_SLOTS_PATH", os.path.join("instance", "batch_slots"))
+# Seconds a single resume may spend in extraction and analysis.
+DEFAULT_RESUME_TIMEOUT = float(os.environ.get("BATCH_RESUME_TIMEOUT", 30))
+# Extra seconds allowed on top of the expected batch duration before the
+# whole pool is torn down (covers workers stuck inside C extensions).
+POOL_GRACE_SECONDS = 10.0
+
+
+class ResumeTimeout(BaseException):
+    """
+    Raised inside a worker when a resume exceeds its time budget.
+
+    Derives from BaseException so the broad ``except Exception`` fallbacks in
+    the extraction code cannot swallow it and start another extractor.
+    """
+
+
+# ===================== SINGLE RESUME SCORING =====================
+def analyze_file(filepath: str) -> Dict[str, Any]:
+    """
+    Extract text from a saved PDF and analyze it.
+
+    Results are cached by a hash of the file bytes, so re-uploading the same
+    document costs a hash and a lookup instead of a full parse.
+
+    :param filepath: Path to the uploaded PDF.
+    :return: analyze_resume output, or a dictionary with an "error" key.
+    """
+    return analyze_source(filepath)[1]
+
+
+def analyze_source(source: PdfSource, digest: Optional[str] = None) -> Tuple[Optional[str], Dict[str, Any]]:
+    """
+    Analyze a PDF given as a path or as bytes already in memory.
+
+    :param source: File path or PDF bytes.
+    :param digest: Content digest, if the caller already computed it.
+    :return: (digest, analysis); the digest is None if the file could not be read.
+    """
+    try:
+        if digest is None:
+            if isinstance(source, bytes):
+                digest = file_digest(source)
+            else:
+                with open(source, "rb") as f:
+                    digest = file_digest(f.read())
+
+        analysis = CACHE.get("analysis", digest)
+        if analysis is not None:
+            return digest, analysis
+
+        raw_text = CACHE.get("text", digest)
+        if raw_text is None:
+            raw_text = parse_pdf(source)
+            if raw_text.startswith("Error:"):
+                return digest, {"error": raw_text}
+            CACHE.put("text", digest, raw_text)
+
+        # A near-duplicate of an analyzed resume (e.g. the same CV re-exported) reuses its analysis.
+        sig, analysis = reuse_near_duplicate(digest, raw_text)
+        if analysis is not None:
+            return digest, analysis
+
+        # Keep the artifacts as well, so a taxonomy or weight change can re-score
+        # this resume without parsing and tokenizing it again (see rescoring.py).
+        with metrics.timer("analyze_resume"):
+            artifacts = extract_artifacts(raw_text)
+            analysis = analysis_from_artifacts(artifacts)
+        CACHE.put("analysis", digest, analysis)
+        store_artifacts(digest, artifacts)
+        remember_signature(digest, sig)
+        return digest, analysis
+
+    except Exception as e:
+        metrics.ERRORS.inc("analysis")
+        return digest, {"error": f"Processing error: {str(e)}"}
+
+
+def score_resume(filename: str, source: PdfSource, job: JobProfile) -> Dict[str, Any]:
+    """
+    Analyze one resume and score it against a compiled job description.
+
+    :param filename: Original upload name, echoed back in the result.
+    :param source: Path to the saved PDF, or its bytes.
+    :param job: Compiled job profile.
+    :return: One /compare-multiple result entry.
+    """
+    try:
+        digest, resume_analysis = analyze_source(source)
+
+        if "error" in resume_analysis:
+            return {
+                "filename": filename,
+                "error": resume_analysis["error"]
+            }
+
+        # Encode the skills once; both comparisons are then bitset operations.
+        resume_mask = SKILL_VOCABULARY.mask(resume_analysis["skills"])
+        skill_comparison = job.compare_mask(resume_mask)
+        match_result = job.match_mask(resume_mask, resume_analysis.get("education", {}).get("degree", ""))
+        result = {
+            "filename": filename,
+            "digest": digest,
+            "skill_comparison": skill_comparison,
+            "match_result": match_result,
+            "analysis": resume_analysis
+        }
+        canonical = duplicate_key(digest)
+        if canonical != digest:
+            result["duplicate_of"] = canonical
+        return result
+    except Exception as e:
+        metrics.ERRORS.inc("scoring")
+        return {
+            "filename": filename,
+            "error": f"Failed to process resume: {str(e)}"
+        }
+
+
+def final_match_value(result: Dict[str, Any]) -> float:
+    """Numeric 'final_match' of a result entry (0 for errors), used for ranking."""
+    return float(result.get("match_result", {}).get("final_match", "0").replace('%', '').strip())
+
+
+def rank_results(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Sort result entries in descending order of 'final_match'."""
+    return sorted(results, key=final_match_value, reverse=True)
+
+
+# ===================== WORKER PROCESS =====================
+# Job profile a batch pool process was started for (see init_worker).
+_pool_job: Optional[JobProfile] = None
+
+
+def init_worker(job: Optional[JobProfile] = None) -> None:
+    """
+    Prepare a pool process: make sure spaCy and the skill index are loaded once
+    (a no-op when they were inherited from the parent through fork) and ignore
+    SIGINT so Ctrl+C is handled by the parent.
+
+    Handlers inherited from a server process are reset as well: a gunicorn
+    worker's SIGTERM handler only flags the worker to stop, so a pool forked
+    from it would survive pool.terminate() and hang the request in join().
+
+    :param job: The batch's job profile, kept for the tasks of this process (None for a shared pool).
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for name in ("SIGTERM", "SIGQUIT", "SIGUSR1", "SIGWINCH", "SIGABRT"):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), signal.SIG_DFL)
+    signal.set_wakeup_fd(-1)
+    preload()
+    global _pool_job
+    _pool_job = job
+
+
+def _raise_timeout(signum, frame):
+    raise ResumeTimeout()
+
+
+@contextmanager
+def resume_time_limit(timeout: Optional[float]) -> Iterator[None]:
+    """
+    Raise ResumeTimeout inside the block once ``timeout`` seconds have passed.
+
+    The limit is a SIGALRM timer, so it only applies in a process's main thread
+    (a pool worker, or a sync server worker); elsewhere the block runs unbounded.
+    The previous SIGALRM handler is put back on exit.
+
+    :param timeout: Time budget in seconds (None or 0 = no limit).
+    """
+    if not (timeout and hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()):
+        yield
+        return
+    previous = signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def score_with_timeout(filename: str, source: PdfSource, job: JobProfile, timeout: Optional[float]) -> Dict[str, Any]:
+    """
+    score_resume with an error entry instead of a result past ``timeout`` seconds (see resume_time_limit).
+
+    :param filename: Original upload name, echoed back in the result.
+    :param source: Path to the saved PDF, or its bytes.
+    :param job: Compiled job profile.
+    :param timeout: Time budget in seconds (None or 0 = no limit).
+    :return: One /compare-multiple result entry.
+    """
+    try:
+        with resume_time_limit(timeout):
+            return score_resume(filename, source, job)
+    except ResumeTimeout:
+        metrics.ERRORS.inc("timeout")
+        return {"filename": filename, "error": f"Timed out after {timeout:g}s"}
+
+
+def _score_task_with_metrics(task: Tuple[str, PdfSource, str, Optional[float]]) -> Dict[str, Any]:
+    """
+    score_with_timeout in a pool process; what it records travels back under "_metrics".
+
+    The task names its job by digest: the profile itself reached the process once, through init_worker.
+    """
+    filename, source, digest, timeout = task
+    if _pool_job is None or _pool_job.digest != digest:
+        raise RuntimeError(f"Pool process was not started for job {digest[:12]}")
+    with metrics.capture() as captured:
+        result = score_with_timeout(filename, source, _pool_job, timeout)
+    if captured:
+        result["_metrics"] = captured
+    return result
+
+
+# ===================== PROCESS SLOTS =====================
+def acquire_slots(wanted: int) -> List[Any]:
+    """
+    Take up to ``wanted`` of the MAX_POOL_PROCESSES server-wide pool slots without waiting.
+
+    Each slot is an exclusive lock on a file under SLOTS_PATH, so slots held by
+    a process that dies are freed with it.
+
+    :param wanted: Worker processes the batch would like.
+    :return: Locked slot files (fewer than wanted, possibly none, when others are busy);
+             ``wanted`` placeholders when there is no server-wide limit.
+    """
+    if not SLOTS_PATH or fcntl is None:
+        return [None] * wanted
+    try:
+        os.makedirs(SLOTS_PATH, exist_ok=True)
+    except OSError:
+        return [None] * wanted
+    slots = []
+    for number in range(MAX_POOL_PROCESSES):
+        if len(slots) >= wanted:
+            break
+        slot = open(os.path.join(SLOTS_PATH, f"slot-{number}.lock"), "a")
+        try:
+            fcntl.flock(slot, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            slot.close()
+            continue
+        slots.append(slot)
+    return slots
+
+
+def release_slots(slots: List[Any]) -> None:
+    """Free slots taken by acquire_slots (explicitly, since forked children share the locks)."""
+    for slot in slots:
+        if slot is not None:
+            fcntl.flock(slot, fcntl.LOCK_UN)
+            slot.close()
+
+
+# ===================== BATCH EXECUTION =====================
+def iter_batch(files: Sequence[Tuple[str, PdfSource]], job: Union[JobProfile, Dict[str, Any]],
+               workers: Optional[int] = None,
+               timeout: Optional[float] = None,
+               context: Optional[Any] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Score resumes in parallel, yielding each result as soon as it is ready.
+
+    Results arrive in completion order, not upload order. A resume that exceeds
+    ``timeout`` yields an error entry instead of stalling the batch.
+
+    The pool gets as many of ``workers`` as there are free server-wide slots
+    (see acquire_slots); with one or none, the resumes are scored in the calling
+    process, where ``timeout`` only applies in the main thread (see score_with_timeout).
+
+    :param files: (original filename, saved filepath or PDF bytes) pairs.
+    :param job: Compiled job profile (or parse_job_description output), shared by every resume.
+    :param workers: Number of worker processes (defaults to DEFAULT_WORKERS).
+    :param timeout: Per-resume time budget in seconds (defaults to DEFAULT_RESUME_TIMEOUT).
+    :param context: multiprocessing context for the pool (defaults to the platform's start method).
+    :return: Iterator of /compare-multiple result entries.
+    """
+    workers = DEFAULT_WORKERS if workers is None else workers
+    timeout = DEFAULT_RESUME_TIMEOUT if timeout is None else timeout
+    workers = max(1, min(workers, len(files)))
+    if not isinstance(job, JobProfile):
+        job = JobProfile.from_job_data(job)
+    metrics.BATCH_SIZE.observe(len(files))
+
+    slots = acquire_slots(workers) if workers > 1 else []
+    workers = len(slots)
+    if workers <= 1:
+        # Not worth a pool, or no room for one: score the resumes here.
+        release_slots(slots)
+        for filename, source in files:
+            yield score_with_timeout(filename, source, job, timeout)
+        return
+    try:
+        yield from _iter_pool(files, job, workers, timeout, context)
+    finally:
+        release_slots(slots)
+
+
+def _iter_pool(files: Sequence[Tuple[str, PdfSource]], job: JobProfile, workers: int,
+               timeout: Optional[float], context: Optional[Any]) -> Iterator[Dict[str, Any]]:
+    """iter_batch's pool of ``workers`` processes, torn down when the iterator finishes or is closed."""
+    done: "queue.Queue[Tuple[int, Dict[str, Any]]]" = queue.Queue()
+    pending = set(range(len(files)))
+    deadline = None
+    if timeout:
+        deadline = time.monotonic() + timeout * math.ceil(len(files) / workers) + POOL_GRACE_SECONDS
+
+    # Load the model before forking so every worker shares it copy-on-write.
+    preload()
+    # The job is pickled once per worker; each task carries only its digest.
+    pool = (context or multiprocessing).Pool(workers, initializer=init_worker, initargs=(job,))
+    try:
+        for index, (filename, source) in enumerate(files):
+            pool.apply_async(
+                _score_task_with_metrics, ((filename, source, job.digest, timeout),),
+                callback=lambda result, i=index: done.put((i, result)),
+                error_callback=lambda exc, i=index, name=filename: done.put(
+                    (i, {"filename": name, "error": f"Failed to process resume: {str(exc)}"})),
+            )
+        pool.close()
+
+        while pending:
+            wait = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                index, result = done.get(timeout=wait)
+            except queue.Empty:
+                # A worker ignored its alarm; give up on whatever is left.
+                for index in sorted(pending):
+                    metrics.ERRORS.inc("timeout")
+                    yield {"filename": files[index][0], "error": f"Timed out after {timeout:g}s"}
+                return
+            pending.discard(index)
+            metrics.merge(result.pop("_metrics", None))
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def score_batch(files: Sequence[Tuple[str, PdfSource]], job: Union[JobProfile, Dict[str, Any]],
+                workers: Optional[int] = None,
+                timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Score resumes in parallel and rank them by 'final_match'.
+
+    :param files: (original filename, saved filepath or PDF bytes) pairs.
+    :param job: Compiled job profile (or parse_job_description output).
+    :param workers: Number of worker processes.
+    :param timeout: Per-resume time budget in seconds.
+    :return: Result entries sorted in descending order of 'final_match'.
+    """
+    return rank_results(list(iter_batch(files, job, workers, timeout)))
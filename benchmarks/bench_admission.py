@@ -0,0 +1,119 @@
+"""
+Overload benchmark for admission control.
+
+Starts the server (gunicorn sync workers by default, or the ASGI mode) twice:
+once with the work budget off and once with --budget. Each time, --recruiters
+clients post batches of --batch-size resumes to /compare-multiple (waiting
+Retry-After and retrying when refused), while one job seeker posts a resume to
+/compare every --interval seconds. Reports /compare latency percentiles and
+status codes, how many batch attempts were refused, and the time to finish
+every batch. With the budget on, /compare latency should stay bounded and
+batches be spread out instead of all running at once.
+
+Usage (from the repository root; needs gunicorn, or quart and uvicorn):
+    python benchmarks/bench_admission.py [--recruiters 6] [--batch-size 100] [--budget 600000]
+"""
+import argparse
+import asyncio
+import collections
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_async import free_port, multipart, slow_request, start_server, wait_ready  # noqa: E402
+from corpus import build_corpus  # noqa: E402
+
+
+async def recruiter(port: int, body: bytes, content_type: str, stats: Dict[str, Any]) -> None:
+    """Post one batch until it is accepted."""
+    while True:
+        status, _, _, headers = await slow_request(port, body, content_type, 0, path="/compare-multiple")
+        stats["batch_status"][status] += 1
+        if status not in (429, 503):
+            return
+        await asyncio.sleep(float(headers.get("retry-after", 1)))
+
+
+async def job_seeker(port: int, requests: List, interval: float, stats: Dict[str, Any]) -> None:
+    """Post single resumes at a steady pace while the batches run."""
+    pending = []
+    for body, content_type in requests:
+        pending.append(asyncio.ensure_future(slow_request(port, body, content_type, 0)))
+        await asyncio.sleep(interval)
+        if stats["batches_done"]:
+            break
+    for status, _, elapsed, _ in await asyncio.gather(*pending):
+        stats["compare_status"][status] += 1
+        if status == 200:
+            stats["compare_latency"].append(elapsed)
+
+
+async def run(server: str, budget: int, args: argparse.Namespace, batches: List, singles: List,
+              warmup) -> Dict[str, Any]:
+    port = free_port()
+    stats = {"batch_status": collections.Counter(), "compare_status": collections.Counter(),
+             "compare_latency": [], "batches_done": False}
+    with tempfile.TemporaryDirectory() as state:
+        env = dict(os.environ, ANALYSIS_CACHE_PATH="", CANDIDATE_INDEX_PATH="", DEDUP_INDEX_PATH="",
+                   RESULT_STORE_PATH=os.path.join(state, "results.sqlite3"),
+                   TASK_QUEUE_PATH=os.path.join(state, "queue.sqlite3"),
+                   METRICS_DIR=os.path.join(state, "metrics"),
+                   ADMISSION_BUDGET_PATH=os.path.join(state, "budget.sqlite3"),
+                   ADMISSION_BUDGET_CHARS=str(budget), ADMISSION_RETRY_AFTER="1",
+                   BATCH_WORKERS=str(args.batch_workers))
+        process = start_server(server, port, args.workers, env)
+        try:
+            await wait_ready(port, *warmup)
+            start = time.perf_counter()
+            seeker = asyncio.ensure_future(job_seeker(port, singles, args.interval, stats))
+            await asyncio.gather(*(recruiter(port, body, content_type, stats) for body, content_type in batches))
+            stats["batches_s"] = time.perf_counter() - start
+            stats["batches_done"] = True
+            await seeker
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--server", choices=["sync", "async"], default="sync")
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn workers, or async CPU processes.")
+    parser.add_argument("--batch-workers", type=int, default=2, help="BATCH_WORKERS of the sync server.")
+    parser.add_argument("--recruiters", type=int, default=6, help="Batches posted at once.")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--interval", type=float, default=0.5, help="Seconds between /compare requests.")
+    parser.add_argument("--budget", type=int, default=600000, help="ADMISSION_BUDGET_CHARS when admission is on.")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    singles_count = 400
+    pdfs, jobs = build_corpus(args.recruiters * args.batch_size + singles_count + 1, 1, seed=args.seed)
+    fields = {"job_description": jobs[0]}
+    warmup = multipart(fields, [("resume", "warmup.pdf", pdfs.pop())])
+    singles = [multipart(fields, [("resume", f"single{number}.pdf", pdfs.pop())]) for number in range(singles_count)]
+    batches = [multipart(fields, [("resumes", f"batch{batch}_{number}.pdf", pdfs.pop())
+                                  for number in range(args.batch_size)])
+               for batch in range(args.recruiters)]
+    print(f"{args.server} server, {args.workers} workers: {args.recruiters} batches of {args.batch_size} resumes, "
+          f"one /compare every {args.interval:g}s")
+
+    for label, budget in (("admission off", 0), (f"budget {args.budget}", args.budget)):
+        stats = asyncio.run(run(args.server, budget, args, batches, singles, warmup))
+        latency = sorted(stats["compare_latency"])
+        print(f"{label}: batches done in {stats['batches_s']:.1f}s, batch responses {dict(stats['batch_status'])}")
+        if latency:
+            print(f"    /compare {dict(stats['compare_status'])}: p50 {statistics.median(latency):.2f}s, "
+                  f"p95 {latency[int(0.95 * (len(latency) - 1))]:.2f}s, max {latency[-1]:.2f}s")
+        else:
+            print(f"    /compare {dict(stats['compare_status'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Slow-client load test: gunicorn sync workers (app.py) against the ASGI mode (asgi.py).
+
+Starts each server on a local port with the same number of CPU processes
+(--workers gunicorn workers, or one uvicorn process with --workers analysis
+processes), then opens --clients connections at once. Every client uploads a
+different resume to /compare, padded to --resume-kb (as embedded fonts and
+images make real ones) and trickled over --upload-seconds, as a client on a
+slow mobile link would. Reports wall time, requests per second and latency
+percentiles for each server, and checks that both returned the same JSON for
+every resume (skill lists compared as sets).
+
+A sync worker is busy for the whole upload once the body outgrows the socket
+buffers, so the sync server receives --workers uploads at a time; the async
+server receives every upload at once and only queues the analyses.
+
+Usage (from the repository root; needs gunicorn, quart and uvicorn):
+    python benchmarks/bench_async.py [--clients 50] [--workers 2] [--upload-seconds 2] [--resume-kb 1024]
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import build_corpus  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHUNKS = 20
+# Client send buffer; the kernel default (autotuned to megabytes) would absorb a whole upload at once.
+SEND_BUFFER = 16 * 1024
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def pad_pdf(pdf: bytes, size: int) -> bytes:
+    """Grow a PDF to about ``size`` bytes with comment lines after %%EOF (extractors ignore them)."""
+    line = b"%" + b"0" * 78 + b"\n"
+    return pdf + line * max(0, (size - len(pdf)) // len(line))
+
+
+def same_response(a: Optional[Dict[str, Any]], b: Optional[Dict[str, Any]]) -> bool:
+    """Equal /compare responses; skill lists come from sets, so their order is per process."""
+    if a is None or b is None:
+        return False
+    a, b = json.loads(json.dumps(a)), json.loads(json.dumps(b))
+    for response in (a, b):
+        response["analysis"]["skills"] = sorted(response["analysis"]["skills"])
+    return a == b
+
+
+def multipart(fields: Dict[str, str], files: Sequence[Tuple[str, str, bytes]]) -> Tuple[bytes, str]:
+    """A form-data request body: text fields plus (field name, filename, PDF bytes) files."""
+    boundary = uuid.uuid4().hex
+    parts = [f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+             for name, value in fields.items()]
+    parts.extend(f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+                 f'Content-Type: application/pdf\r\n\r\n'.encode() + pdf + b"\r\n"
+                 for field, filename, pdf in files)
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+async def slow_request(port: int, body: bytes, content_type: str, upload_seconds: float,
+                       path: str = "/compare") -> Tuple[int, bytes, float, Dict[str, str]]:
+    """POST a request, sending the body in CHUNKS pieces over upload_seconds; returns status, body, time, headers."""
+    start = time.perf_counter()
+    sock = socket.socket()
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SEND_BUFFER)
+    sock.setblocking(False)
+    try:
+        await asyncio.get_running_loop().sock_connect(sock, ("127.0.0.1", port))
+    except BaseException:
+        sock.close()
+        raise
+    reader, writer = await asyncio.open_connection(sock=sock)
+    writer.write((f"POST {path} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nContent-Type: {content_type}\r\n"
+                  f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n").encode())
+    step = -(-len(body) // CHUNKS)
+    for offset in range(0, len(body), step):
+        writer.write(body[offset:offset + step])
+        await writer.drain()
+        await asyncio.sleep(upload_seconds / CHUNKS)
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    headers = dict(line.lower().split(": ", 1) for line in lines[1:] if ": " in line)
+    payload = await reader.readexactly(int(headers.get("content-length", 0)))
+    writer.close()
+    return int(lines[0].split(" ", 2)[1]), payload, time.perf_counter() - start, headers
+
+
+def start_server(mode: str, port: int, workers: int, env: Dict[str, str]) -> subprocess.Popen:
+    if mode == "sync":
+        command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:app"]
+        env = dict(env, GUNICORN_BIND=f"127.0.0.1:{port}", GUNICORN_WORKERS=str(workers))
+    else:
+        command = [sys.executable, "-m", "uvicorn", "asgi:app", "--port", str(port), "--log-level", "warning"]
+        env = dict(env, ASGI_CPU_WORKERS=str(workers))
+    return subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def wait_ready(port: int, body: bytes, content_type: str, timeout: float = 120.0) -> None:
+    """Wait until the server answers a /compare request (which also loads the model)."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            status = (await slow_request(port, body, content_type, 0))[0]
+            if status == 200:
+                return
+        except OSError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"Server on port {port} did not start")
+        await asyncio.sleep(0.5)
+
+
+async def run_load(mode: str, args: argparse.Namespace, requests: List[Tuple[bytes, str]],
+                   warmup: Tuple[bytes, str]) -> Tuple[Dict[str, Any], List[Optional[Any]]]:
+    port = free_port()
+    with tempfile.TemporaryDirectory() as state:
+        # Fresh caches and stores, so both servers do the same work.
+        env = dict(os.environ, ANALYSIS_CACHE_PATH="", CANDIDATE_INDEX_PATH="", DEDUP_INDEX_PATH="",
+                   RESULT_STORE_PATH=os.path.join(state, "results.sqlite3"),
+                   TASK_QUEUE_PATH=os.path.join(state, "queue.sqlite3"),
+                   METRICS_DIR=os.path.join(state, "metrics"),
+                   # Every client is admitted; bench_admission.py measures load shedding.
+                   ADMISSION_BUDGET_CHARS="0", ADMISSION_BUDGET_PATH=os.path.join(state, "budget.sqlite3"))
+        server = start_server(mode, port, args.workers, env)
+        try:
+            await wait_ready(port, *warmup)
+            start = time.perf_counter()
+            responses = await asyncio.gather(
+                *(slow_request(port, body, content_type, args.upload_seconds) for body, content_type in requests),
+                return_exceptions=True)
+            wall = time.perf_counter() - start
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    latencies = sorted(r[2] for r in responses if not isinstance(r, BaseException) and r[0] == 200)
+    payloads = [json.loads(r[1]) if not isinstance(r, BaseException) and r[0] == 200 else None for r in responses]
+    summary = {
+        "mode": mode,
+        "ok": len(latencies),
+        "failed": len(responses) - len(latencies),
+        "wall_s": wall,
+        "rps": len(latencies) / wall,
+        "p50_s": statistics.median(latencies) if latencies else float("nan"),
+        "p95_s": latencies[int(0.95 * (len(latencies) - 1))] if latencies else float("nan"),
+        "max_s": latencies[-1] if latencies else float("nan"),
+    }
+    return summary, payloads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=50, help="Concurrent clients (one resume each).")
+    parser.add_argument("--workers", type=int, default=2, help="CPU processes per server.")
+    parser.add_argument("--upload-seconds", type=float, default=2.0, help="Time each client takes to upload.")
+    parser.add_argument("--resume-kb", type=int, default=1024, help="Size each resume is padded to.")
+    parser.add_argument("--modes", nargs="+", choices=["sync", "async"], default=["sync", "async"])
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    pdfs, jobs = build_corpus(args.clients + 1, 1, seed=args.seed)
+    fields = {"job_description": jobs[0]}
+    pdfs = [pad_pdf(pdf, args.resume_kb * 1024) for pdf in pdfs]
+    warmup = multipart(fields, [("resume", "warmup.pdf", pdfs[-1])])
+    requests = [multipart(fields, [("resume", f"resume{number}.pdf", pdf)]) for number, pdf in enumerate(pdfs[:-1])]
+    print(f"{args.clients} clients, {args.upload_seconds:g}s uploads of {len(requests[0][0]) / 1024:.0f} KB, "
+          f"{args.workers} CPU processes per server")
+
+    results = {}
+    for mode in args.modes:
+        summary, payloads = asyncio.run(run_load(mode, args, requests, warmup))
+        results[mode] = payloads
+        print(f"{mode:>5}: {summary['ok']} ok, {summary['failed']} failed in {summary['wall_s']:.1f}s "
+              f"({summary['rps']:.1f} req/s), latency p50 {summary['p50_s']:.2f}s, "
+              f"p95 {summary['p95_s']:.2f}s, max {summary['max_s']:.2f}s")
+
+    if len(results) == 2:
+        differing = sum(not same_response(a, b) for a, b in zip(results["sync"], results["async"]))
+        print(f"responses that differ between the two servers: {differing}")
+
+
+if __name__ == "__main__":
+    main()
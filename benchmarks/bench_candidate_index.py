@@ -0,0 +1,91 @@
+"""
+Top-K retrieval benchmark for the candidate index.
+
+Indexes a synthetic pool of analyzed resumes (skills drawn from SKILLS_DB with
+a skewed popularity, random degrees) and compares, per job, scoring every
+resume with JobProfile.match against CandidateIndex.top_k. Reports how many
+resumes top_k had to look at and checks that both rankings agree.
+
+Usage (from the repository root):
+    python benchmarks/bench_candidate_index.py [--resumes 50000] [--jobs 50] [-k 20]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_base import SKILLS_DB  # noqa: E402
+from job import JobProfile  # noqa: E402
+from resume_analysis import DEGREE_HIERARCHY  # noqa: E402
+from candidate_index import CandidateIndex  # noqa: E402
+
+
+def synthetic_resume(rng, skills, weights):
+    picked = set(rng.choices(skills, weights=weights, k=rng.randint(3, 30)))
+    return {"skills": sorted(picked), "education": {"degree": rng.choice(DEGREE_HIERARCHY + [""])}}
+
+
+def synthetic_job(rng, skills, weights):
+    required = sorted(set(rng.choices(skills, weights=weights, k=rng.randint(4, 12))))
+    degree = rng.choice(["Bachelor", "Master", None])
+    return JobProfile.from_job_data({"required_skills": required, "education": degree, "years_experience": None})
+
+
+def brute_force(job, resumes, k):
+    scores = []
+    for doc_id, resume in enumerate(resumes, start=1):
+        final = float(job.match(resume)["final_match"].rstrip("%"))
+        scores.append((-final, doc_id))
+    scores.sort()
+    return [doc_id for _, doc_id in scores[:k]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resumes", type=int, default=50000)
+    parser.add_argument("--jobs", type=int, default=50)
+    parser.add_argument("-k", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    skills = list(SKILLS_DB)
+    # Zipf-like popularity: a few skills appear on most resumes, most are rare.
+    weights = [1.0 / (rank + 1) for rank in range(len(skills))]
+    rng.shuffle(weights)
+    resumes = [synthetic_resume(rng, skills, weights) for _ in range(args.resumes)]
+    jobs = [synthetic_job(rng, skills, weights) for _ in range(args.jobs)]
+
+    index = CandidateIndex(path=None)
+    start = time.perf_counter()
+    index.add_many([(f"resume-{i}", resume, None) for i, resume in enumerate(resumes)])
+    print(f"indexed {len(resumes)} resumes in {time.perf_counter() - start:.2f}s")
+
+    brute_time = index_time = 0.0
+    scored = mismatches = 0
+    for job in jobs:
+        start = time.perf_counter()
+        expected = brute_force(job, resumes, args.k)
+        brute_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        ranking = index.top_k(job, args.k)
+        index_time += time.perf_counter() - start
+        scored += index.scored
+
+        # Compare rounded scores: the brute force ranks on the displayed (1 decimal) value.
+        got = [round(score, 1) for _, score in ranking]
+        want = [float(job.match(resumes[doc_id - 1])["final_match"].rstrip("%")) for doc_id in expected]
+        mismatches += got != want
+
+    print(f"{'method':<12}{'ms/job':>10}{'resumes looked at':>20}")
+    print(f"{'brute force':<12}{brute_time / len(jobs) * 1000:>10.1f}{len(resumes):>20}")
+    print(f"{'top_k':<12}{index_time / len(jobs) * 1000:>10.1f}{scored / len(jobs):>20.0f}")
+    print(f"ranking mismatches: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Near-duplicate detection benchmark.
+
+Extracts a synthetic corpus of resume PDFs, stores their MinHash signatures in
+an in-memory NearDuplicateIndex, then looks up an edited copy of each resume
+(one bullet rewritten, one removed, one added). Reports the signature and
+lookup cost per PDF page, how many copies were found, false matches between
+unrelated resumes, and how the incremental analysis of a found copy compares
+with analyzing it from scratch (time, and whether both give the same analysis).
+
+Usage (from the repository root):
+    python benchmarks/bench_dedup.py [--resumes 500] [--length 4]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import fitz
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import SKILL_VARIATIONS, build_corpus  # noqa: E402
+from dedup import NearDuplicateIndex, signature  # noqa: E402
+from pdf_extract import parse_pdf  # noqa: E402
+from resume_analysis import analysis_from_artifacts, analyze_resume, diff_artifacts, extract_artifacts  # noqa: E402
+
+
+def edit(rng: random.Random, text: str) -> str:
+    """A copy of a resume with one line rewritten, one removed and one added."""
+    lines = text.split("\n")
+    lines[rng.randrange(3, len(lines))] = f"Migrated {rng.choice(SKILL_VARIATIONS)} workloads to the cloud"
+    del lines[rng.randrange(3, len(lines))]
+    lines.insert(rng.randrange(3, len(lines)), f"Mentored two engineers in {rng.choice(SKILL_VARIATIONS)}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resumes", type=int, default=500)
+    parser.add_argument("--length", type=int, default=4, help="Work experience entries per resume.")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    pdfs, _ = build_corpus(args.resumes, 0, length=args.length, seed=args.seed)
+    pages = 0
+    for pdf in pdfs:
+        with fitz.open(stream=pdf, filetype="pdf") as doc:
+            pages += doc.page_count
+    texts = [parse_pdf(pdf) for pdf in pdfs]
+    print(f"{len(texts)} resumes, {pages / len(texts):.1f} pages each")
+
+    index = NearDuplicateIndex(path=None)
+    start = time.perf_counter()
+    signatures = [signature(text) for text in texts]
+    signature_time = time.perf_counter() - start
+    false_matches = 0
+    start = time.perf_counter()
+    for number, sig in enumerate(signatures):
+        false_matches += index.find(sig) is not None
+        index.add(str(number), sig)
+    lookup_time = time.perf_counter() - start
+    print(f"signature: {signature_time / pages * 1000:.3f} ms/page, "
+          f"lookup + add: {lookup_time / len(texts) * 1000:.3f} ms/resume, "
+          f"false matches: {false_matches}")
+
+    rng = random.Random(args.seed)
+    found = mismatches = 0
+    full_time = diff_time = 0.0
+    for number, text in enumerate(texts):
+        edited = edit(rng, text)
+        match = index.find(signature(edited))
+        if match is None or match.digest != str(number):
+            continue
+        found += 1
+        artifacts = extract_artifacts(text)
+
+        start = time.perf_counter()
+        expected = analyze_resume(edited)
+        full_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        analysis = analysis_from_artifacts(diff_artifacts(text, artifacts, edited))
+        diff_time += time.perf_counter() - start
+
+        mismatches += sorted(analysis.pop("skills")) != sorted(expected.pop("skills")) or analysis != expected
+    print(f"edited copies found: {found}/{len(texts)}")
+    if found:
+        print(f"analysis of a found copy: {full_time / found * 1000:.2f} ms from scratch, "
+              f"{diff_time / found * 1000:.2f} ms incremental, {mismatches} differing analyses")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Soak test: memory of one long-running analysis process.
+
+Runs analyze_resume on --analyses synthetic resumes in a fresh process. Every
+resume carries its own name, email, profile URL, phone number, employer and
+reference, the strings that make spaCy's vocabulary grow in a server worker.
+The process's private memory and vocabulary size are sampled every --sample
+analyses. The run is done twice: with the vocabulary never reset (NLP_VOCAB_RESET_STRINGS=0) and
+with resets every --reset-strings strings. Reports memory growth after the
+first sample and the range over the second half; with resets on, memory
+should stay within the same band instead of climbing.
+
+With --forked, the runs are forked from a parent that preloaded the model, as
+gunicorn workers are: one reloads the model in place, the other keeps the
+shared model (nlp_engine.share_model) and stops where its server would
+recycle it. Memory is then what the worker holds on top of the parent.
+
+Usage (from the repository root):
+    python benchmarks/bench_memory.py [--analyses 100000] [--sample 5000] [--reset-strings 100000] [--forked]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import generate_resume  # noqa: E402
+
+SYLLABLES = ["ka", "lo", "mi", "ren", "sa", "tor", "vi", "zu", "an", "bel", "dor", "ek", "fi", "gan", "hu", "ix"]
+DOMAINS = ["example.com", "mail.example.org", "inbox.example.net"]
+# Resume bodies are reused; only the identifying header changes.
+BODIES = 200
+
+
+def make_name(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).title()
+
+
+def unique_resume(rng: random.Random, bodies: List[str], number: int) -> str:
+    """A resume body with a header and references no other resume of the run has."""
+    first, last = make_name(rng), make_name(rng)
+    header = (f"{first} {last}\n"
+              f"{first.lower()}.{last.lower()}{number}@{rng.choice(DOMAINS)} | +1 555 {number:07d}\n"
+              f"https://www.linkedin.com/in/{first.lower()}-{last.lower()}-{number:x}\n"
+              f"Currently at {make_name(rng)} {rng.choice(['Labs', 'Systems', 'Group'])}\n")
+    referee = make_name(rng)
+    references = f"Reference: {referee} {make_name(rng)}, {referee.lower()}{number}@{rng.choice(DOMAINS)}\n"
+    body = bodies[number % len(bodies)]
+    return header + body.split("\n", 2)[2] + references
+
+
+def soak(analyses: int, sample: int, reset_strings: int, seed: int, shared: bool = False) -> List[Dict[str, Any]]:
+    """
+    Run in a fresh process: analyze resumes and sample memory as it goes.
+
+    With ``shared``, the inherited model is kept and the run ends once the
+    worker would be recycled for its vocabulary.
+    """
+    import metrics
+    import nlp_engine
+    from resume_analysis import analyze_resume
+    from worker_memory import private_memory_bytes
+
+    nlp_engine.VOCAB_RESET_STRINGS = reset_strings
+    if shared:
+        nlp_engine.share_model()
+    rng = random.Random(seed)
+    bodies = [generate_resume(rng) for _ in range(BODIES)]
+    samples = []
+    start = time.perf_counter()
+    for number in range(1, analyses + 1):
+        analyze_resume(unique_resume(rng, bodies, number))
+        recycle = shared and nlp_engine.vocab_recycle_due()
+        if number % sample == 0 or number == analyses or recycle:
+            samples.append({
+                "analyses": number,
+                "memory_mb": private_memory_bytes() / 2 ** 20,
+                "vocab_strings": len(nlp_engine.get_nlp().vocab.strings),
+                "resets": int(sum(metrics.VOCAB_RESETS.snapshot().values())),
+                "seconds": time.perf_counter() - start,
+            })
+        if recycle:
+            break
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--analyses", type=int, default=100000)
+    parser.add_argument("--sample", type=int, default=5000, help="Analyses between memory samples.")
+    parser.add_argument("--reset-strings", type=int, default=100000,
+                        help="NLP_VOCAB_RESET_STRINGS of the run with resets on.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--forked", action="store_true",
+                        help="Fork the runs from a parent that preloaded the model, like gunicorn workers.")
+    args = parser.parse_args()
+
+    print(f"{args.analyses} analyses of resumes with unique names, emails, URLs and phone numbers")
+    if args.forked:
+        from nlp_engine import preload
+        preload()
+        context = get_context("fork")
+        runs = ((f"reload in place every {args.reset_strings} strings", args.reset_strings, False),
+                (f"shared model, recycled after {args.reset_strings} strings", args.reset_strings, True))
+    else:
+        context = get_context("spawn")
+        runs = (("vocab reset off", 0, False), (f"reset every {args.reset_strings} strings", args.reset_strings, False))
+    for label, reset_strings, shared in runs:
+        # A fresh process per run, so the second does not start with the first one's vocabulary.
+        with ProcessPoolExecutor(1, mp_context=context) as executor:
+            samples = executor.submit(soak, args.analyses, args.sample, reset_strings, args.seed, shared).result()
+        print(f"{label}:")
+        for row in samples:
+            print(f"  {row['analyses']:>8} analyses  {row['memory_mb']:7.1f} MB  "
+                  f"{row['vocab_strings']:>8} strings  {row['resets']:>3} resets  {row['seconds']:7.0f}s")
+        first, last = samples[0], samples[-1]
+        second_half = [row["memory_mb"] for row in samples if row["analyses"] >= last["analyses"] / 2]
+        print(f"  growth after {first['analyses']} analyses: {last['memory_mb'] - first['memory_mb']:+.1f} MB, "
+              f"second half between {min(second_half):.1f} and {max(second_half):.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
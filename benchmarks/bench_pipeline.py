@@ -0,0 +1,218 @@
+"""
+End-to-end benchmark and golden-output check for the analysis pipeline.
+
+Generates a reproducible synthetic corpus (see corpus.py), then times every
+stage on it: PDF text extraction, extract_sections, extract_skills,
+analyze_resume, parse_job_description and analyze_match. Reports per-stage
+p50/p95/p99 latency, end-to-end throughput and latency per resume (extract,
+analyze, match against every job) and peak RSS.
+
+With --golden the analyses and match results are compared with a golden file
+written earlier by --write-golden, so a speedup can be checked not to change
+any score. Golden files depend on the installed spaCy model; generate them
+locally before the change under test.
+
+Usage (from the repository root):
+    python benchmarks/bench_pipeline.py --write-golden
+    python benchmarks/bench_pipeline.py --golden --json benchmarks/results/after.json
+    python benchmarks/bench_pipeline.py --resumes 500 --length 8 --skill-density 0.6 --jobs 5
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import build_corpus  # noqa: E402
+from job import parse_job_description  # noqa: E402
+from nlp_engine import get_nlp  # noqa: E402
+from pdf_extract import parse_pdf  # noqa: E402
+from resume_analysis import analyze_match, analyze_resume, extract_sections, extract_skills  # noqa: E402
+
+DEFAULT_GOLDEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", "golden.json")
+STAGES = ["parse_pdf", "extract_sections", "extract_skills", "analyze_resume",
+          "parse_job_description", "analyze_match"]
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """Nearest-rank percentile of a sample list."""
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Latency summary in milliseconds."""
+    return {
+        "count": len(samples),
+        "total_s": round(sum(samples), 6),
+        "mean_ms": round(sum(samples) / len(samples) * 1000, 4),
+        "p50_ms": round(percentile(samples, 50) * 1000, 4),
+        "p95_ms": round(percentile(samples, 95) * 1000, 4),
+        "p99_ms": round(percentile(samples, 99) * 1000, 4),
+    }
+
+
+def timed(samples: List[float], func: Callable, *args: Any) -> Any:
+    started = time.perf_counter()
+    result = func(*args)
+    samples.append(time.perf_counter() - started)
+    return result
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def normalize_analysis(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    # Skills come out of a set; their order is not part of the result.
+    return dict(analysis, skills=sorted(analysis["skills"]))
+
+
+def run_stages(pdfs: List[bytes], jobs: List[str]) -> Dict[str, List[float]]:
+    """Time every stage on its own input, one call per resume or job."""
+    samples: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+    job_data = [timed(samples["parse_job_description"], parse_job_description, text) for text in jobs]
+    for pdf in pdfs:
+        text = timed(samples["parse_pdf"], parse_pdf, pdf)
+        timed(samples["extract_sections"], extract_sections, text)
+        timed(samples["extract_skills"], extract_skills, text.lower())
+        analysis = timed(samples["analyze_resume"], analyze_resume, text)
+        for job in job_data:
+            timed(samples["analyze_match"], analyze_match, analysis, job)
+    return samples
+
+
+def run_end_to_end(pdfs: List[bytes], jobs: List[str]) -> Dict[str, Any]:
+    """Score every resume against every job the way a batch request does."""
+    latencies: List[float] = []
+    results = []
+    started = time.perf_counter()
+    job_data = [parse_job_description(text) for text in jobs]
+    for pdf in pdfs:
+        resume_started = time.perf_counter()
+        analysis = analyze_resume(parse_pdf(pdf))
+        matches = [analyze_match(analysis, job) for job in job_data]
+        latencies.append(time.perf_counter() - resume_started)
+        results.append({"analysis": normalize_analysis(analysis), "matches": matches})
+    elapsed = time.perf_counter() - started
+    return {
+        "elapsed_s": elapsed,
+        "latencies": latencies,
+        "golden": {"jobs": job_data, "resumes": results},
+    }
+
+
+def compare_golden(expected: Dict[str, Any], actual: Dict[str, Any], limit: int = 10) -> List[str]:
+    """Describe every difference between two golden outputs (at most `limit`)."""
+    differences = []
+
+    def diff(label: str, old: Dict[str, Any], new: Dict[str, Any]) -> None:
+        for key in sorted(set(old) | set(new)):
+            if old.get(key) != new.get(key):
+                differences.append(f"{label} {key}: expected {old.get(key)!r}, got {new.get(key)!r}")
+
+    for number, (old, new) in enumerate(zip(expected["jobs"], actual["jobs"])):
+        diff(f"job {number}", old, new)
+    for number, (old, new) in enumerate(zip(expected["resumes"], actual["resumes"])):
+        diff(f"resume {number}", old["analysis"], new["analysis"])
+        for job_number, (old_match, new_match) in enumerate(zip(old["matches"], new["matches"])):
+            diff(f"resume {number} x job {job_number}", old_match, new_match)
+    if len(expected["resumes"]) != len(actual["resumes"]):
+        differences.append(f"{len(expected['resumes'])} resumes expected, got {len(actual['resumes'])}")
+    return differences[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resumes", type=int, default=200, help="Resumes in the corpus (batch size).")
+    parser.add_argument("--jobs", type=int, default=3, help="Job descriptions every resume is matched against.")
+    parser.add_argument("--length", type=int, default=4, help="Work experience entries per resume.")
+    parser.add_argument("--skill-density", type=float, default=0.3,
+                        help="Share of experience bullets that mention skills (0-1).")
+    parser.add_argument("--seed", type=int, default=42, help="Corpus seed.")
+    parser.add_argument("--json", metavar="PATH", help="Write the report as JSON to PATH ('-' for stdout).")
+    parser.add_argument("--golden", nargs="?", const=DEFAULT_GOLDEN, metavar="PATH",
+                        help="Compare outputs with a golden file; exits with status 1 on any difference.")
+    parser.add_argument("--write-golden", nargs="?", const=DEFAULT_GOLDEN, metavar="PATH",
+                        help="Write the outputs of this run as the golden file.")
+    args = parser.parse_args()
+
+    config = {"resumes": args.resumes, "jobs": args.jobs, "length": args.length,
+              "skill_density": args.skill_density, "seed": args.seed}
+    started = time.perf_counter()
+    pdfs, jobs = build_corpus(args.resumes, args.jobs, args.length, args.skill_density, args.seed)
+    print(f"corpus: {len(pdfs)} resumes, {len(jobs)} jobs in {time.perf_counter() - started:.1f}s")
+
+    # Warm up so model loading and first-call allocations are excluded.
+    started = time.perf_counter()
+    nlp = get_nlp()
+    analyze_match(analyze_resume(parse_pdf(pdfs[0])), parse_job_description(jobs[0]))
+    warmup = time.perf_counter() - started
+
+    samples = run_stages(pdfs, jobs)
+    end_to_end = run_end_to_end(pdfs, jobs)
+
+    report = {
+        "config": config,
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "model": f"{nlp.meta.get('name')}-{nlp.meta.get('version')}",
+        },
+        "warmup_s": round(warmup, 4),
+        "stages": {stage: summarize(values) for stage, values in samples.items()},
+        "throughput_resumes_per_s": round(len(pdfs) / end_to_end["elapsed_s"], 2),
+        "latency": summarize(end_to_end["latencies"]),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+    print(f"{'stage':>22} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'total s':>9}")
+    for stage, summary in list(report["stages"].items()) + [("end-to-end", report["latency"])]:
+        print(f"{stage:>22} {summary['p50_ms']:>9.3f} {summary['p95_ms']:>9.3f} "
+              f"{summary['p99_ms']:>9.3f} {summary['total_s']:>9.3f}")
+    print(f"throughput: {report['throughput_resumes_per_s']} resumes/s, peak RSS: {report['peak_rss_mb']} MB")
+
+    golden = {"config": config, "model": report["environment"]["model"], **end_to_end["golden"]}
+    status = 0
+    if args.golden:
+        with open(args.golden, encoding="utf-8") as f:
+            expected = json.load(f)
+        if expected["config"] != config:
+            parser.error(f"{args.golden} was written for {expected['config']}; rerun with the same corpus options")
+        if expected["model"] != golden["model"]:
+            print(f"warning: golden file was written with {expected['model']}, running {golden['model']}")
+        # Round-trip through JSON so tuples and lists compare alike.
+        differences = compare_golden(expected, json.loads(json.dumps(golden)))
+        report["golden"] = {"path": args.golden, "matches": not differences, "differences": differences}
+        if differences:
+            print("golden check FAILED:")
+            for difference in differences:
+                print(f"  {difference}")
+            status = 1
+        else:
+            print(f"golden check passed ({len(pdfs)} resumes x {len(jobs)} jobs)")
+    if args.write_golden:
+        os.makedirs(os.path.dirname(os.path.abspath(args.write_golden)), exist_ok=True)
+        with open(args.write_golden, "w", encoding="utf-8") as f:
+            json.dump(golden, f, indent=1, sort_keys=True)
+        print(f"golden outputs written to {args.write_golden}")
+
+    if args.json == "-":
+        print(json.dumps(report, indent=2))
+    elif args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
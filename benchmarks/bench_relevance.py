@@ -0,0 +1,63 @@
+"""
+TF-IDF relevance benchmark.
+
+Draws synthetic resumes and jobs from SKILLS_DB and measures the relevance
+component on its own: loading token_dist.json, building a job vector, scoring
+resumes one at a time against a compiled job (the JobProfile.match path), and
+scoring whole batches with one sparse matrix-vector product per job (the
+bulk_scoring path). Checks that both paths give the same values.
+
+Usage (from the repository root):
+    python benchmarks/bench_relevance.py [--resumes 20000] [--jobs 20]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_base import SKILLS_DB  # noqa: E402
+from relevance import RelevanceModel, get_relevance_model, relevance_matrix, relevance_score  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resumes", type=int, default=20000)
+    parser.add_argument("--jobs", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    model = RelevanceModel.load()
+    print(f"loaded {len(model.hashes)} token weights in {(time.perf_counter() - start) * 1000:.1f} ms "
+          f"({(model.hashes.nbytes + model.idf.nbytes) / 1024:.0f} KB)")
+
+    rng = random.Random(args.seed)
+    skills = list(SKILLS_DB)
+    resumes = [rng.sample(skills, rng.randint(3, 20)) for _ in range(args.resumes)]
+    jobs = [rng.sample(skills, rng.randint(3, 10)) for _ in range(args.jobs)]
+    model = get_relevance_model()
+
+    start = time.perf_counter()
+    job_vectors = [model.vector(job) for job in jobs]
+    print(f"job vector: {(time.perf_counter() - start) / len(jobs) * 1e6:.1f} us")
+
+    start = time.perf_counter()
+    single = np.array([[relevance_score(resume, vector) for vector in job_vectors] for resume in resumes])
+    elapsed = time.perf_counter() - start
+    print(f"one at a time: {elapsed / single.size * 1e6:.1f} us per resume and job")
+
+    start = time.perf_counter()
+    batch = relevance_matrix(resumes, job_vectors)
+    elapsed = time.perf_counter() - start
+    print(f"batch: {elapsed * 1000:.1f} ms for {len(resumes)} x {len(jobs)} "
+          f"({elapsed / batch.size * 1e6:.2f} us per resume and job)")
+    print(f"max difference between the two paths: {np.abs(single - batch).max():.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Scaling benchmark for the compiled skill index.
+
+Grows the skills taxonomy with synthetic variations and times the old
+per-variation substring scan of extract_job_skills against a single pass of
+SkillIndex over the tokenized text.
+
+Usage (from the repository root):
+    python benchmarks/bench_skill_index.py [--sizes 1000 5000 10000 20000]
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_base import SKILLS_DB  # noqa: E402
+from nlp_engine import make_doc  # noqa: E402
+from skill_matcher import build_skill_index  # noqa: E402
+
+JOB_TEXT = (
+    "We are hiring a Senior Software Engineer with 5+ years of experience in Python, "
+    "AWS, Docker and Kubernetes. Experience with machine learning, SQL and React is a plus. "
+    "You will design cloud services, mentor engineers, review code and work with product managers. "
+    "Bachelor's degree in Computer Science required. Strong communication skills in English."
+) * 4
+
+
+def grow_taxonomy(size, seed=13):
+    """SKILLS_DB plus synthetic one- to three-word variations up to `size` variations."""
+    rng = random.Random(seed)
+    taxonomy = {skill: list(variations) for skill, variations in SKILLS_DB.items()}
+    count = sum(len(v) for v in taxonomy.values())
+    while count < size:
+        words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9)))
+                 for _ in range(rng.randint(1, 3))]
+        taxonomy[f"Synthetic {count}"] = [" ".join(words)]
+        count += 1
+    return taxonomy
+
+
+def substring_scan(taxonomy, job_text):
+    """The previous extract_job_skills multi-word loop."""
+    found = set()
+    for skill, variations in taxonomy.items():
+        for variation in variations:
+            if variation.lower() in job_text.lower():
+                found.add(skill)
+    return found
+
+
+def best_of(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 1000, 5000, 10000, 20000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"job text: {len(JOB_TEXT)} chars")
+    print(f"{'variations':>10} {'build (s)':>10} {'scan (ms)':>10} {'index (ms)':>11} {'speedup':>8}")
+    for size in args.sizes:
+        taxonomy = grow_taxonomy(size)
+        start = time.perf_counter()
+        index = build_skill_index(taxonomy)
+        build = time.perf_counter() - start
+
+        scan = best_of(lambda: substring_scan(taxonomy, JOB_TEXT), args.repeat)
+        # Include tokenization, as extract_job_skills pays for it too.
+        indexed = best_of(lambda: index.find(make_doc(JOB_TEXT.lower())), args.repeat)
+        print(f"{index.size:>10} {build:>10.2f} {scan * 1000:>10.2f} {indexed * 1000:>11.2f} {scan / indexed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
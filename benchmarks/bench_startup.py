@@ -0,0 +1,58 @@
+"""
+Worker cold-start benchmark.
+
+Each measurement runs in a fresh interpreter, the way a new gunicorn worker
+would start: time and peak RSS to import the app, to serve "/", and to finish
+the first resume analysis. Run it on two checkouts to compare them.
+
+Usage (from the repository root):
+    python benchmarks/bench_startup.py [--runs 3]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import json, resource, sys, time
+start = time.perf_counter()
+def rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+timings = {}
+import app
+timings["import_app"] = (time.perf_counter() - start, rss_mb())
+client = app.app.test_client()
+assert client.get("/").status_code == 200
+timings["first_home_page"] = (time.perf_counter() - start, rss_mb())
+from resume_analysis import analyze_resume
+analyze_resume("EDUCATION\nBSc Computer Science\n\nSKILLS\nPython, SQL, Docker\n")
+timings["first_analysis"] = (time.perf_counter() - start, rss_mb())
+print(json.dumps(timings))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters per measurement.")
+    args = parser.parse_args()
+
+    samples = []
+    for _ in range(args.runs):
+        output = subprocess.run([sys.executable, "-c", CHILD], cwd=ROOT, check=True,
+                                capture_output=True, text=True).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"{'milestone':<18} {'seconds (median)':>17} {'peak RSS MB':>12}")
+    for milestone in samples[0]:
+        seconds = statistics.median(s[milestone][0] for s in samples)
+        rss = statistics.median(s[milestone][1] for s in samples)
+        print(f"{milestone:<18} {seconds:>17.3f} {rss:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
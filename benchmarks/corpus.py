@@ -0,0 +1,140 @@
+"""
+Synthetic resume and job-description corpus for the benchmarks.
+
+Every document is generated from a seed, so two runs (or two checkouts) see
+exactly the same input, and no real candidate data is involved. Resumes use
+the section headers extract_sections recognizes and draw their skills from
+SKILLS_DB, so every stage of the pipeline has real work to do.
+"""
+import os
+import random
+import sys
+from typing import List, Tuple
+
+import fitz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_base import SKILLS_DB  # noqa: E402
+
+FIRST_NAMES = ["Alex", "Sam", "Jordan", "Taylor", "Morgan", "Casey", "Riley", "Jamie", "Avery", "Quinn"]
+LAST_NAMES = ["Smith", "Okafor", "Nguyen", "Garcia", "Kowalski", "Haddad", "Tanaka", "Silva", "Brown", "Ivanova"]
+COMPANIES = ["Northwind", "Contoso", "Globex", "Initech", "Umbrella Labs", "Stark Analytics", "Acme Cloud"]
+TITLES = ["Software Engineer", "Data Analyst", "Product Manager", "DevOps Engineer", "Data Scientist",
+          "Frontend Developer", "Business Analyst", "QA Engineer"]
+SCHOOLS = ["University of Toronto", "McGill University", "State University", "Institute of Technology"]
+DEGREES = ["Bachelor of Science in Computer Science", "Master of Science in Data Science",
+           "BSc Software Engineering", "MBA", "PhD in Statistics", "Diploma in Web Development",
+           "Associate Degree in Information Technology"]
+MONTHS = ["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"]
+VERBS = ["Developed", "Designed", "Maintained", "Led", "Improved", "Automated", "Migrated", "Built", "Analyzed"]
+FILLER = ["the reporting platform", "internal dashboards", "customer onboarding flows", "a billing service",
+          "data pipelines", "release processes", "the mobile app", "search relevance", "monitoring alerts",
+          "stakeholder workshops", "quarterly planning", "an inventory system"]
+
+# Every spelling the skill index knows, so resumes exercise aliases as well as canonical names.
+SKILL_VARIATIONS = sorted({variation for variations in SKILLS_DB.values() for variation in variations})
+
+
+def pick_skills(rng: random.Random, count: int) -> List[str]:
+    return rng.sample(SKILL_VARIATIONS, min(count, len(SKILL_VARIATIONS)))
+
+
+def generate_resume(rng: random.Random, length: int = 4, skill_density: float = 0.3) -> str:
+    """
+    One synthetic resume.
+
+    :param rng: Seeded random generator.
+    :param length: Number of work experience entries (each with several bullets).
+    :param skill_density: Probability that a bullet mentions a skill; also scales the Skills section.
+    :return: Resume text.
+    """
+    lines = [f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", "candidate@example.com | 555-0100", ""]
+
+    lines += ["SUMMARY", f"{rng.choice(TITLES)} with experience in {rng.choice(FILLER)}.", ""]
+
+    lines.append("EDUCATION")
+    for _ in range(rng.randint(1, 2)):
+        lines.append(f"{rng.choice(DEGREES)}")
+        lines.append(f"{rng.choice(SCHOOLS)} {rng.randint(2005, 2020)}-{rng.randint(2009, 2024)}")
+    lines.append("")
+
+    lines.append("TECHNICAL SKILLS")
+    lines.append(", ".join(pick_skills(rng, max(1, int(40 * skill_density)))))
+    lines.append("")
+
+    lines.append("WORK EXPERIENCE")
+    year = 2024
+    for _ in range(length):
+        start = year - rng.randint(1, 3)
+        lines.append(f"{rng.choice(MONTHS)} {start} - {rng.choice(MONTHS)} {year} | "
+                     f"{rng.choice(COMPANIES)} | {rng.choice(TITLES)}")
+        for _ in range(rng.randint(3, 6)):
+            bullet = f"• {rng.choice(VERBS)} {rng.choice(FILLER)}"
+            if rng.random() < skill_density:
+                bullet += f" using {' and '.join(pick_skills(rng, rng.randint(1, 3)))}"
+            lines.append(bullet + ".")
+        year = start
+    lines.append("")
+
+    lines.append("PROJECTS")
+    for _ in range(max(1, length // 2)):
+        lines.append(f"{rng.choice(VERBS)} a side project on {rng.choice(FILLER)} ({rng.randint(2015, 2024)})")
+        lines.append(f"- Stack: {', '.join(pick_skills(rng, 2))}")
+    return "\n".join(lines) + "\n"
+
+
+def generate_job(rng: random.Random, skill_density: float = 0.3) -> str:
+    """
+    One synthetic job description.
+
+    :param rng: Seeded random generator.
+    :param skill_density: Scales the number of required skills.
+    :return: Job description text.
+    """
+    skills = pick_skills(rng, max(2, int(20 * skill_density)))
+    degree = rng.choice(["Bachelor's degree", "Master's degree", "PhD", "BSc", "degree"])
+    return (
+        f"We are hiring a {rng.choice(TITLES)} to work on {rng.choice(FILLER)}. "
+        f"You have {rng.randint(1, 10)}+ years of experience with {', '.join(skills[:-1])} and {skills[-1]}. "
+        f"{degree} in Computer Science or a related field required. "
+        f"You will collaborate on {rng.choice(FILLER)} and {rng.choice(FILLER)}."
+    )
+
+
+def render_pdf(text: str, lines_per_page: int = 50) -> bytes:
+    """
+    Lay text out on as many Letter pages as it needs.
+
+    :param text: Document text.
+    :param lines_per_page: Lines per page.
+    :return: PDF bytes.
+    """
+    doc = fitz.open()
+    lines = text.split("\n")
+    for first in range(0, len(lines), lines_per_page):
+        page = doc.new_page(width=612, height=792)
+        for row, line in enumerate(lines[first:first + lines_per_page]):
+            if line:
+                page.insert_text((50, 50 + row * 14), line, fontsize=10)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def build_corpus(resumes: int, jobs: int, length: int = 4, skill_density: float = 0.3,
+                 seed: int = 42) -> Tuple[List[bytes], List[str]]:
+    """
+    A reproducible corpus of resume PDFs and job descriptions.
+
+    :param resumes: Number of resumes (the batch size).
+    :param jobs: Number of job descriptions.
+    :param length: Work experience entries per resume.
+    :param skill_density: See generate_resume.
+    :param seed: Random seed.
+    :return: (resume PDFs as bytes, job description texts).
+    """
+    rng = random.Random(seed)
+    pdfs = [render_pdf(generate_resume(rng, length, skill_density)) for _ in range(resumes)]
+    job_texts = [generate_job(rng, skill_density) for _ in range(jobs)]
+    return pdfs, job_texts
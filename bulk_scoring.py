@@ -0,0 +1,160 @@
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from job import JobProfile
+from relevance import relevance_matrix
+from resume_analysis import DEGREE_LEVELS, SKILL_BOOST, COMPOSITE_THRESHOLD, RELEVANCE_WEIGHT
+from skill_matcher import SkillVocabulary
+
+# Degree level used for degrees outside DEGREE_HIERARCHY (never meets a requirement).
+UNKNOWN_LEVEL = -1
+
+
+# ===================== ENCODING =====================
+def encode_resumes(resumes: Sequence[Dict[str, Any]], vocabulary: SkillVocabulary):
+    """
+    Encode analyzed resumes as a skill-indicator matrix and a degree-level vector.
+
+    :param resumes: analyze_resume outputs.
+    :param vocabulary: Skill vocabulary shared with the jobs.
+    :return: (N x S uint8 indicator matrix, N-vector of degree levels).
+    """
+    rows = [vocabulary.encode(resume.get("skills", [])) for resume in resumes]
+    levels = np.array([
+        DEGREE_LEVELS.get(resume.get("education", {}).get("degree", ""), UNKNOWN_LEVEL)
+        for resume in resumes
+    ], dtype=np.int16)
+    return _indicator_matrix(rows, len(vocabulary)), levels
+
+
+def encode_jobs(jobs: Sequence[JobProfile], vocabulary: SkillVocabulary):
+    """
+    Encode compiled jobs as a skill-indicator matrix plus education requirements.
+
+    :param jobs: Compiled job profiles.
+    :param vocabulary: Skill vocabulary shared with the resumes.
+    :return: (M x S uint8 indicator matrix, M-vector of required levels,
+              M-vector flagging jobs that state a degree requirement).
+    """
+    rows = [vocabulary.encode(job.skills) for job in jobs]
+    levels = np.array([
+        UNKNOWN_LEVEL if job.degree_level is None else job.degree_level for job in jobs
+    ], dtype=np.int16)
+    required = np.array([bool(job.degree) for job in jobs], dtype=bool)
+    return _indicator_matrix(rows, len(vocabulary)), levels, required
+
+
+def _indicator_matrix(rows: List[List[int]], width: int) -> np.ndarray:
+    matrix = np.zeros((len(rows), width), dtype=np.uint8)
+    for i, ids in enumerate(rows):
+        matrix[i, ids] = 1
+    return matrix
+
+
+# ===================== BULK SCORING =====================
+class BulkScores:
+    """
+    Scores for every (resume, job) pair, as N x M float64 arrays.
+
+    The arithmetic mirrors analyze_match operation for operation, so
+    ``result(i, j)`` equals ``analyze_match(resumes[i], jobs[j])``. Like the
+    "skill_match" field, ``skill_match`` holds the boosted skill score.
+    """
+
+    def __init__(self, resumes: Sequence[Dict[str, Any]], jobs: Sequence[JobProfile],
+                 vocabulary: SkillVocabulary, resume_matrix: np.ndarray, job_matrix: np.ndarray,
+                 skill_match: np.ndarray, education: np.ndarray, composite: np.ndarray,
+                 final_match: np.ndarray, required: np.ndarray, relevance: Optional[np.ndarray] = None):
+        self.resumes = resumes
+        self.jobs = jobs
+        self.vocabulary = vocabulary
+        self.resume_matrix = resume_matrix
+        self.job_matrix = job_matrix
+        self.skill_match = skill_match
+        self.education = education
+        self.composite = composite
+        self.final_match = final_match
+        self.required = required
+        # TF-IDF relevance (0-1), when RELEVANCE_WEIGHT is set.
+        self.relevance = relevance
+
+    def top_resumes(self, j: int, k: int) -> List[int]:
+        """Indices of the k best resumes for job j, best first (ties keep resume order)."""
+        order = np.argsort(-self.final_match[:, j], kind="stable")
+        return order[:k].tolist()
+
+    def result(self, i: int, j: int) -> Dict[str, Any]:
+        """The analyze_match dictionary for resume i against job j."""
+        names = self.vocabulary.names
+        missing = np.flatnonzero(self.job_matrix[j] & (1 - self.resume_matrix[i]))
+        if not self.required[j]:
+            education_match = "Met (No requirement)"
+        else:
+            education_match = "Met" if self.education[i, j] == 100 else "Not met"
+        result = {
+            "skill_match": f"{self.skill_match[i, j]:.1f}%",
+            "education_match": education_match,
+            "composite_score": f"{self.composite[i, j]:.1f}%",
+            "final_match": f"{self.final_match[i, j]:.1f}%",
+            "missing_skills": sorted(names[s] for s in missing),
+            "resume_summary": {"total_skills": int(self.resume_matrix[i].sum())}
+        }
+        if self.relevance is not None:
+            result["relevance"] = f"{self.relevance[i, j] * 100:.1f}%"
+        return result
+
+    def results(self) -> List[List[Dict[str, Any]]]:
+        """analyze_match dictionaries for the whole grid, indexed [resume][job]."""
+        return [[self.result(i, j) for j in range(len(self.jobs))] for i in range(len(self.resumes))]
+
+
+def bulk_score(resumes: Sequence[Dict[str, Any]],
+               jobs: Sequence[Union[JobProfile, Dict[str, Any]]],
+               vocabulary: Optional[SkillVocabulary] = None) -> BulkScores:
+    """
+    Score N resumes against M jobs with matrix operations instead of a double loop.
+
+    :param resumes: analyze_resume outputs.
+    :param jobs: Compiled job profiles or parse_job_description outputs.
+    :param vocabulary: Skill vocabulary to encode with (a fresh SKILLS_DB one by default).
+    :return: BulkScores for the full N x M grid.
+    """
+    jobs = [job if isinstance(job, JobProfile) else JobProfile.from_job_data(job) for job in jobs]
+    vocabulary = SkillVocabulary() if vocabulary is None else vocabulary
+    resume_matrix, resume_levels = encode_resumes(resumes, vocabulary)
+    job_matrix, job_levels, required = encode_jobs(jobs, vocabulary)
+    # Unknown skills seen while encoding the jobs widened the vocabulary.
+    resume_matrix = _pad(resume_matrix, len(vocabulary))
+    job_matrix = _pad(job_matrix, len(vocabulary))
+
+    # Skill match: |resume & job| / |job| * 100, or 100 when the job lists no skills.
+    matched = resume_matrix.astype(np.float64) @ job_matrix.T.astype(np.float64)
+    job_counts = job_matrix.sum(axis=1).astype(np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        skill_match = np.where(job_counts > 0, matched / job_counts * 100, 100.0)
+    boosted = np.minimum(skill_match * SKILL_BOOST, 100)
+
+    # Education gate: met when there is no requirement, or the resume's degree
+    # is known and at least as high (lower index) as the required known degree.
+    meets = ((resume_levels[:, None] != UNKNOWN_LEVEL) & (job_levels[None, :] != UNKNOWN_LEVEL)
+             & (resume_levels[:, None] <= job_levels[None, :]))
+    education = np.where(~required[None, :] | meets, 100.0, 0.0)
+
+    composite = (0.8 * boosted) + (0.2 * education)
+    relevance = None
+    if RELEVANCE_WEIGHT:
+        # One sparse matrix-vector product per job over the TF-IDF vectors of all resumes.
+        relevance = relevance_matrix([resume.get("skills", []) for resume in resumes],
+                                     [job.relevance_vector for job in jobs])
+        composite = (1 - RELEVANCE_WEIGHT) * composite + RELEVANCE_WEIGHT * relevance * 100
+    final_match = np.where(composite >= COMPOSITE_THRESHOLD, 100.0, (composite / COMPOSITE_THRESHOLD) * 100)
+
+    return BulkScores(resumes, jobs, vocabulary, resume_matrix, job_matrix,
+                      boosted, education, composite, final_match, required, relevance)
+
+
+def _pad(matrix: np.ndarray, width: int) -> np.ndarray:
+    if matrix.shape[1] == width:
+        return matrix
+    return np.pad(matrix, ((0, 0), (0, width - matrix.shape[1])))
@@ -0,0 +1,583 @@
+import argparse
+import heapq
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from analysis_cache import CACHE, AnalysisCache
+from job import JobProfile, compile_job_profile
+from relevance import relevance_matrix
+from resume_analysis import DEGREE_LEVELS, RELEVANCE_WEIGHT, SKILL_BOOST, combine_scores
+from skill_matcher import SKILL_VOCABULARY, popcount
+
+logger = logging.getLogger(__name__)
+
+# ===================== INDEX CONFIGURATION =====================
+# SQLite file holding the index; set CANDIDATE_INDEX_PATH to an empty string to keep it in memory only.
+DEFAULT_INDEX_PATH = os.environ.get("CANDIDATE_INDEX_PATH", os.path.join("instance", "candidate_index.sqlite3"))
+# Number of candidates returned when the caller does not ask for a specific count.
+DEFAULT_TOP_K = 20
+
+
+# ===================== POSTING LIST ENCODING =====================
+def encode_postings(doc_ids: Iterable[int]) -> bytes:
+    """
+    Compress an ascending list of document ids as varint-encoded gaps.
+
+    :param doc_ids: Strictly increasing positive ids.
+    :return: The encoded posting list.
+    """
+    out = bytearray()
+    previous = 0
+    for doc_id in doc_ids:
+        gap = doc_id - previous
+        previous = doc_id
+        while gap >= 0x80:
+            out.append((gap & 0x7F) | 0x80)
+            gap >>= 7
+        out.append(gap)
+    return bytes(out)
+
+
+def decode_postings(data: bytes) -> array:
+    """
+    Expand a posting list written by encode_postings.
+
+    :param data: Encoded posting list.
+    :return: The document ids, ascending.
+    """
+    doc_ids = array("q")
+    previous = value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            previous += value
+            doc_ids.append(previous)
+            value = shift = 0
+    return doc_ids
+
+
+def _insert_sorted(doc_ids: array, doc_id: int) -> None:
+    if not doc_ids or doc_ids[-1] < doc_id:
+        doc_ids.append(doc_id)
+    else:
+        doc_ids.insert(bisect_left(doc_ids, doc_id), doc_id)
+
+
+def _remove_sorted(doc_ids: array, doc_id: int) -> None:
+    position = bisect_left(doc_ids, doc_id)
+    if position < len(doc_ids) and doc_ids[position] == doc_id:
+        del doc_ids[position]
+
+
+# ===================== CANDIDATE INDEX =====================
+class CandidateIndex:
+    """
+    Inverted index from lowercase skill to the analyzed resumes that list it.
+
+    Each resume is stored once, keyed by the content digest of its file, with
+    its skills and highest degree. Posting lists are kept in SQLite as
+    varint-encoded id gaps and updated in place as resumes are added or
+    removed; every process keeps a decoded copy in memory and reloads it when
+    another process changes the index.
+
+    top_k() ranks resumes by the analyze_match final score without scoring
+    every resume: it walks the posting lists of the job's skills in document
+    order and, MaxScore style, stops reading lists (and skips documents) whose
+    best possible score cannot enter the current top K.
+    """
+
+    def __init__(self, path: Optional[str] = DEFAULT_INDEX_PATH, analysis_version: Optional[str] = None):
+        """
+        :param path: SQLite file, or None/empty for an in-memory index.
+        :param analysis_version: Version of the analyses being indexed; a stored
+            index built from another version is discarded (defaults to the analysis cache's).
+        """
+        self.path = path or None
+        self.analysis_version = analysis_version or CACHE.versions["analysis"]
+        # Documents fully or partially scored by the last top_k() call.
+        self.scored = 0
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._revision: Optional[int] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        # doc_id -> (digest, filename, degree, skills as a SKILL_VOCABULARY bitset)
+        self._docs: Dict[int, Tuple[str, Optional[str], str, int]] = {}
+        self._by_digest: Dict[str, int] = {}
+        self._ids = array("q")
+        self._postings: Dict[str, array] = {}
+        self._degrees: Dict[int, array] = {}
+        self._next_id = 1
+
+    # ---------- connection handling ----------
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        """One connection per thread and process (connections must not cross a fork)."""
+        if not self.path:
+            return None
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # isolation_level=None: transactions are opened explicitly with BEGIN IMMEDIATE.
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " doc_id INTEGER PRIMARY KEY AUTOINCREMENT, digest TEXT NOT NULL UNIQUE,"
+            " filename TEXT, degree TEXT NOT NULL, skills TEXT NOT NULL, added REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS postings ("
+            " term TEXT PRIMARY KEY, docs BLOB NOT NULL, last_doc INTEGER NOT NULL, count INTEGER NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);"
+        )
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _refresh(self) -> Optional[sqlite3.Connection]:
+        """Bring the in-memory copy up to date with the database (call with the lock held)."""
+        conn = self._connection()
+        if conn is None:
+            return None
+        meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+        if meta.get("analysis_version") != self.analysis_version:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if meta.get("analysis_version") is not None:
+                    logger.info("Analysis version changed; clearing candidate index %s", self.path)
+                conn.execute("DELETE FROM documents")
+                conn.execute("DELETE FROM postings")
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('analysis_version', ?)",
+                             (self.analysis_version,))
+                revision = self._bump_revision(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        else:
+            revision = int(meta.get("revision", 0))
+        if revision != self._revision:
+            self._load(conn)
+        return conn
+
+    def _load(self, conn: sqlite3.Connection) -> None:
+        self._reset()
+        # One read transaction, so documents, postings and revision come from the same snapshot.
+        conn.execute("BEGIN")
+        try:
+            revision = conn.execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()
+            for doc_id, digest, filename, degree, skills in conn.execute(
+                    "SELECT doc_id, digest, filename, degree, skills FROM documents ORDER BY doc_id"):
+                self._remember(doc_id, digest, filename, degree, tuple(json.loads(skills)), postings=False)
+            for term, docs in conn.execute("SELECT term, docs FROM postings"):
+                self._postings[term] = decode_postings(docs)
+        finally:
+            conn.execute("COMMIT")
+        self._revision = int(revision[0]) if revision else 0
+
+    @staticmethod
+    def _bump_revision(conn: sqlite3.Connection) -> int:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()
+        revision = (int(row[0]) if row else 0) + 1
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('revision', ?)", (str(revision),))
+        return revision
+
+    # ---------- public API ----------
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._docs)
+
+    def __contains__(self, digest: str) -> bool:
+        with self._lock:
+            self._refresh()
+            return digest in self._by_digest
+
+    def add(self, digest: str, analysis: Dict[str, Any], filename: Optional[str] = None) -> int:
+        """
+        Index one analyzed resume (a no-op if its digest is already indexed).
+
+        :param digest: Content digest of the resume file (analysis_cache.file_digest).
+        :param analysis: analyze_resume output.
+        :param filename: Original upload name, echoed back in search results.
+        :return: The resume's document id.
+        """
+        return self.add_many([(digest, analysis, filename)])[0]
+
+    def add_many(self, entries: Sequence[Tuple[str, Dict[str, Any], Optional[str]]]) -> List[int]:
+        """
+        Index several analyzed resumes in one transaction.
+
+        :param entries: (digest, analyze_resume output, filename) triples.
+        :return: Document ids, in the order of `entries`.
+        """
+        with self._lock:
+            conn = self._refresh()
+            doc_ids: List[int] = []
+            new_docs = []
+            added: Dict[str, int] = {}
+            if conn is not None:
+                conn.execute("BEGIN IMMEDIATE")
+            try:
+                for digest, analysis, filename in entries:
+                    if conn is None:
+                        doc_id = self._by_digest.get(digest)
+                    else:
+                        # Ask the database: another process may have added or removed it.
+                        row = conn.execute("SELECT doc_id FROM documents WHERE digest = ?", (digest,)).fetchone()
+                        doc_id = row[0] if row else None
+                    if doc_id is None:
+                        doc_id = added.get(digest)
+                    if doc_id is None:
+                        degree = analysis.get("education", {}).get("degree", "") or ""
+                        skills = tuple(sorted({s.lower() for s in analysis.get("skills", [])}))
+                        doc_id = self._store(conn, digest, filename, degree, skills)
+                        new_docs.append((doc_id, digest, filename, degree, skills))
+                        added[digest] = doc_id
+                    doc_ids.append(doc_id)
+                patch = conn is None or self._commit(conn, bool(new_docs))
+            except BaseException:
+                if conn is not None:
+                    conn.execute("ROLLBACK")
+                raise
+            if patch:
+                for doc_id, digest, filename, degree, skills in new_docs:
+                    self._remember(doc_id, digest, filename, degree, skills)
+            return doc_ids
+
+    def remove(self, digest: str) -> bool:
+        """
+        Drop a resume from the index.
+
+        :param digest: Content digest the resume was added under.
+        :return: False if it was not indexed.
+        """
+        with self._lock:
+            conn = self._refresh()
+            doc_id = self._by_digest.get(digest)
+            if doc_id is None:
+                return False
+            skills = SKILL_VOCABULARY.decode(self._docs[doc_id][3])
+            patch = True
+            if conn is not None:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+                    for term in skills:
+                        row = conn.execute("SELECT docs FROM postings WHERE term = ?", (term,)).fetchone()
+                        if row is None:
+                            continue
+                        doc_ids = decode_postings(row[0])
+                        _remove_sorted(doc_ids, doc_id)
+                        if doc_ids:
+                            conn.execute("UPDATE postings SET docs = ?, last_doc = ?, count = ? WHERE term = ?",
+                                         (encode_postings(doc_ids), doc_ids[-1], len(doc_ids), term))
+                        else:
+                            conn.execute("DELETE FROM postings WHERE term = ?", (term,))
+                    patch = self._commit(conn, True)
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+            if patch:
+                self._forget(doc_id)
+            return True
+
+    def sync_from_cache(self, cache: AnalysisCache = CACHE) -> int:
+        """
+        Index every analysis in the analysis cache that is not indexed yet.
+
+        Picks up resumes analyzed outside process_resume (batches, queued jobs).
+
+        :param cache: Cache holding analyze_resume outputs by file digest.
+        :return: Number of resumes added.
+        """
+        with self._lock:
+            self._refresh()
+            known = set(self._by_digest)
+        entries = [(digest, analysis, None) for digest, analysis in cache.iter_entries("analysis")
+                   if digest not in known and "error" not in analysis]
+        self.add_many(entries)
+        return len(entries)
+
+    def top_k(self, job: JobProfile, k: int = DEFAULT_TOP_K) -> List[Tuple[int, float]]:
+        """
+        The k resumes with the highest analyze_match final score for a job.
+
+        Ties are broken by document id (earlier additions first), so the result
+        equals scoring every resume with job.match and taking a stable sort.
+
+        :param job: Compiled job profile.
+        :param k: Number of resumes to return.
+        :return: (document id, unrounded final match) pairs, best first.
+        """
+        with self._lock:
+            self._refresh()
+            return self._top_k(job, k)
+
+    def search(self, job: JobProfile, k: int = DEFAULT_TOP_K) -> List[Dict[str, Any]]:
+        """
+        top_k() as /compare-multiple style result entries.
+
+        :param job: Compiled job profile.
+        :param k: Number of resumes to return.
+        :return: Entries with filename, digest, skill_comparison and match_result, best first.
+        """
+        with self._lock:
+            self._refresh()
+            results = []
+            for doc_id, _ in self._top_k(job, k):
+                digest, filename, degree, skill_mask = self._docs[doc_id]
+                results.append({
+                    "filename": filename,
+                    "digest": digest,
+                    "skill_comparison": job.compare_mask(skill_mask),
+                    "match_result": job.match_mask(skill_mask, degree)
+                })
+            return results
+
+    # ---------- retrieval ----------
+    def _top_k(self, job: JobProfile, k: int) -> List[Tuple[int, float]]:
+        self.scored = 0
+        if k <= 0 or not self._ids:
+            return []
+        if RELEVANCE_WEIGHT:
+            # Relevance can lift resumes that share no required skill, so the posting
+            # lists no longer bound the scores; every resume is scored instead.
+            return self._scan(job, k)
+        job_size = len(job.skills)
+        edu_required = bool(job.degree)
+
+        def final_score(matched: int, edu_met: bool) -> float:
+            # Same arithmetic as match_skill_sets, from the two counts the postings give.
+            skill_match = (matched / job_size * 100) if job_size else 100
+            return combine_scores(skill_match, 100 if edu_met or not edu_required else 0)[2]
+
+        # Terms: one posting list per required skill, plus the resumes that meet the
+        # education requirement. Each is weighted by its composite contribution.
+        terms: List[Tuple[float, array, bool]] = []
+        skill_weight = 0.8 * SKILL_BOOST * 100 / job_size if job_size else 0.0
+        for skill in job.skills:
+            postings = self._postings.get(skill)
+            if postings:
+                terms.append((skill_weight, postings, False))
+        if edu_required and job.degree_level is not None:
+            qualified = sorted(doc_id for level, postings in self._degrees.items()
+                               if level <= job.degree_level for doc_id in postings)
+            if qualified:
+                terms.append((0.2 * 100, array("q", qualified), True))
+
+        base = final_score(0, False)
+        if not terms or final_score(sum(not edu for _, _, edu in terms), any(edu for _, _, edu in terms)) <= base:
+            # Every resume scores the same; the earliest ids win the tie.
+            return [(doc_id, base) for doc_id in self._ids[:k]]
+
+        # Cheapest terms first; among equals, long lists first so they become non-essential sooner.
+        terms.sort(key=lambda term: (term[0], -len(term[1])))
+        lists = [postings for _, postings, _ in terms]
+        is_edu = [edu for _, _, edu in terms]
+        # prefix[i]: (skills, education) contributed by terms[:i], for upper bounds.
+        prefix = [(0, False)]
+        for edu in is_edu:
+            skills, has_edu = prefix[-1]
+            prefix.append((skills + (not edu), has_edu or edu))
+
+        cursors = [0] * len(terms)
+        heap: List[Tuple[float, int]] = []  # (score, -doc_id): the worst entry is on top
+        threshold = -1.0
+        # terms[first:] are essential: a resume matching none of them cannot enter the top k.
+        first = 0
+        while first < len(terms):
+            doc_id = None
+            for t in range(first, len(terms)):
+                if cursors[t] < len(lists[t]) and (doc_id is None or lists[t][cursors[t]] < doc_id):
+                    doc_id = lists[t][cursors[t]]
+            if doc_id is None:
+                break
+
+            matched, edu_met = 0, False
+            for t in range(first, len(terms)):
+                position = cursors[t]
+                if position < len(lists[t]) and lists[t][position] == doc_id:
+                    cursors[t] = position + 1
+                    if is_edu[t]:
+                        edu_met = True
+                    else:
+                        matched += 1
+
+            # Probe the non-essential lists, most valuable first, while the resume can still qualify.
+            pruned = False
+            for t in range(first - 1, -1, -1):
+                skills, has_edu = prefix[t + 1]
+                if final_score(matched + skills, edu_met or has_edu) <= threshold:
+                    pruned = True
+                    break
+                position = bisect_left(lists[t], doc_id, cursors[t])
+                cursors[t] = position
+                if position < len(lists[t]) and lists[t][position] == doc_id:
+                    if is_edu[t]:
+                        edu_met = True
+                    else:
+                        matched += 1
+            self.scored += 1
+            if pruned:
+                continue
+
+            # Later documents have larger ids, so they only enter on a strictly better score.
+            score = final_score(matched, edu_met)
+            if len(heap) < k:
+                heapq.heappush(heap, (score, -doc_id))
+            elif score > threshold:
+                heapq.heapreplace(heap, (score, -doc_id))
+            else:
+                continue
+            if len(heap) == k:
+                threshold = heap[0][0]
+                while first < len(terms) and final_score(*prefix[first + 1]) <= threshold:
+                    first += 1
+
+        ranking = [(-negative_id, score) for score, negative_id in sorted(heap, key=lambda e: (-e[0], -e[1]))]
+        if len(ranking) < k:
+            # Fewer than k resumes match anything: the rest tie at the base score.
+            ranked = {doc_id for doc_id, _ in ranking}
+            for doc_id in self._ids:
+                if len(ranking) == k:
+                    break
+                if doc_id not in ranked:
+                    ranking.append((doc_id, base))
+        return ranking
+
+    def _scan(self, job: JobProfile, k: int) -> List[Tuple[int, float]]:
+        """_top_k by scoring every resume, with the relevance of all of them computed in one sparse product."""
+        doc_ids = list(self._ids)
+        docs = [self._docs[doc_id] for doc_id in doc_ids]
+        relevance = relevance_matrix([SKILL_VOCABULARY.decode(skill_mask) for _, _, _, skill_mask in docs],
+                                     [job.relevance_vector])[:, 0]
+        job_size = len(job.skills)
+        scores = []
+        for (_, _, degree, skill_mask), doc_relevance in zip(docs, relevance):
+            skill_match = (popcount(skill_mask & job.skill_mask) / job_size * 100) if job_size else 100
+            level = DEGREE_LEVELS.get(degree)
+            edu_met = not job.degree or (job.degree_level is not None and level is not None
+                                         and level <= job.degree_level)
+            scores.append(combine_scores(skill_match, 100 if edu_met else 0, float(doc_relevance))[2])
+        self.scored = len(doc_ids)
+        best = heapq.nsmallest(k, range(len(doc_ids)), key=lambda i: (-scores[i], i))
+        return [(doc_ids[i], scores[i]) for i in best]
+
+    # ---------- internals ----------
+    def _store(self, conn: Optional[sqlite3.Connection], digest: str, filename: Optional[str],
+               degree: str, skills: Tuple[str, ...]) -> int:
+        """Write a new document and append it to its posting lists; returns its id."""
+        if conn is None:
+            doc_id = self._next_id
+            self._next_id += 1
+            return doc_id
+        doc_id = conn.execute(
+            "INSERT INTO documents (digest, filename, degree, skills, added) VALUES (?, ?, ?, ?, ?)",
+            (digest, filename, degree, json.dumps(skills), time.time())
+        ).lastrowid
+        for term in skills:
+            row = conn.execute("SELECT last_doc FROM postings WHERE term = ?", (term,)).fetchone()
+            if row is None:
+                conn.execute("INSERT INTO postings (term, docs, last_doc, count) VALUES (?, ?, ?, 1)",
+                             (term, encode_postings([doc_id]), doc_id))
+            else:
+                # Ids only grow, so the new id is appended as one more gap.
+                gap = encode_postings([doc_id - row[0]])
+                conn.execute(
+                    "UPDATE postings SET docs = CAST(docs || ? AS BLOB), last_doc = ?, count = count + 1"
+                    " WHERE term = ?", (gap, doc_id, term)
+                )
+        return doc_id
+
+    def _commit(self, conn: sqlite3.Connection, changed: bool) -> bool:
+        """
+        Commit a write and advance the revision.
+
+        :return: True if the caller should apply the change to the in-memory copy;
+            False if another process wrote meanwhile and the copy was reloaded instead.
+        """
+        if not changed:
+            conn.execute("COMMIT")
+            return False
+        revision = self._bump_revision(conn)
+        conn.execute("COMMIT")
+        if revision == self._revision + 1:
+            self._revision = revision
+            return True
+        self._load(conn)
+        return False
+
+    def _remember(self, doc_id: int, digest: str, filename: Optional[str], degree: str,
+                  skills: Tuple[str, ...], postings: bool = True) -> None:
+        self._docs[doc_id] = (digest, filename, degree, SKILL_VOCABULARY.mask(skills))
+        self._by_digest[digest] = doc_id
+        _insert_sorted(self._ids, doc_id)
+        self._next_id = max(self._next_id, doc_id + 1)
+        level = DEGREE_LEVELS.get(degree)
+        if level is not None:
+            _insert_sorted(self._degrees.setdefault(level, array("q")), doc_id)
+        if postings:
+            for term in skills:
+                _insert_sorted(self._postings.setdefault(term, array("q")), doc_id)
+
+    def _forget(self, doc_id: int) -> None:
+        digest, _, degree, skill_mask = self._docs.pop(doc_id)
+        del self._by_digest[digest]
+        _remove_sorted(self._ids, doc_id)
+        level = DEGREE_LEVELS.get(degree)
+        if level is not None:
+            _remove_sorted(self._degrees[level], doc_id)
+        for term in SKILL_VOCABULARY.decode(skill_mask):
+            postings = self._postings[term]
+            _remove_sorted(postings, doc_id)
+            if not postings:
+                del self._postings[term]
+
+
+# ===================== DEFAULT INDEX =====================
+CANDIDATE_INDEX = CandidateIndex()
+
+
+def index_resume(digest: str, analysis: Dict[str, Any], filename: Optional[str] = None) -> None:
+    """Add an analyzed upload to the default index; failures are logged, never raised."""
+    if "error" in analysis:
+        return
+    try:
+        CANDIDATE_INDEX.add(digest, analysis, filename)
+    except sqlite3.Error as e:
+        logger.warning("Could not index resume %s: %s", digest, e)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain or query the candidate index.")
+    parser.add_argument("--index", default=DEFAULT_INDEX_PATH, help="Index database path.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("sync", help="Index every analysis in the analysis cache.")
+    search_parser = subparsers.add_parser("search", help="Print the best resumes for a job description file.")
+    search_parser.add_argument("job_file", help="Text file with the job description.")
+    search_parser.add_argument("-k", type=int, default=DEFAULT_TOP_K, help="Number of resumes.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    index = CandidateIndex(args.index)
+    if args.command == "sync":
+        added = index.sync_from_cache()
+        print(f"Indexed {added} new resumes ({len(index)} total)")
+    else:
+        with open(args.job_file, encoding="utf-8") as f:
+            job = compile_job_profile(f.read())
+        for result in index.search(job, args.k):
+            print(result["match_result"]["final_match"], result["filename"] or result["digest"])
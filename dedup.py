@@ -0,0 +1,362 @@
+import argparse
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+import metrics
+from analysis_cache import CACHE, fingerprint
+from rescoring import TAXONOMY_FINGERPRINT, store_artifacts
+from resume_analysis import analysis_from_artifacts, diff_artifacts
+
+logger = logging.getLogger(__name__)
+
+# ===================== DEDUP CONFIGURATION =====================
+# Set DEDUP_ENABLED=0 to analyze every new upload even when it is a near-duplicate of a stored one.
+DEDUP_ENABLED = os.environ.get("DEDUP_ENABLED", "1") != "0"
+# Estimated Jaccard similarity of word shingles above which a resume counts as a near-duplicate.
+# Near-duplicates are analyzed from a diff, so a lower value costs time, not accuracy.
+DEDUP_THRESHOLD = float(os.environ.get("DEDUP_THRESHOLD", 0.8))
+# SQLite file holding the signatures; set DEDUP_INDEX_PATH to an empty string to keep them in memory only.
+DEFAULT_DEDUP_PATH = os.environ.get("DEDUP_INDEX_PATH", os.path.join("instance", "dedup_index.sqlite3"))
+# Words per shingle.
+SHINGLE_SIZE = 3
+# MinHash values per signature, split into LSH bands of NUM_PERM // BANDS rows. With 32 bands
+# of 4 rows, pairs at 0.8 similarity share a band with probability > 0.9999 and unrelated
+# resumes (similarity ~0.1) almost never do; candidates are then checked against the threshold.
+NUM_PERM = 128
+BANDS = 32
+# Texts with fewer shingles carry too little evidence to call them duplicates.
+MIN_SHINGLES = 20
+# Candidates compared per lookup; bounds the cost when many stored resumes share a band.
+MAX_CANDIDATES = 256
+# Seed of the hash permutations; changing it (or the sizes above) invalidates stored signatures.
+SEED = 1
+
+_WORD = re.compile(r"\w+")
+_rng = np.random.RandomState(SEED)
+# h(x) = a * x + b mod 2**32 with odd a is a permutation of the 32-bit shingle hashes.
+_A = (_rng.randint(0, 2 ** 31, NUM_PERM, dtype=np.int64) * 2 + 1).astype(np.uint32)
+_B = _rng.randint(0, 2 ** 32, NUM_PERM, dtype=np.int64).astype(np.uint32)
+SIGNATURE_VERSION = fingerprint(SHINGLE_SIZE, NUM_PERM, BANDS, SEED)
+
+
+# ===================== SIGNATURES =====================
+def shingle_hashes(text: str) -> np.ndarray:
+    """
+    32-bit hashes of the overlapping SHINGLE_SIZE-word shingles of a text.
+
+    Words are lowercased and punctuation and layout are ignored, so the same
+    resume extracted with different line breaks or spacing gives the same shingles.
+
+    :param text: Resume text as returned by parse_pdf.
+    :return: One hash per shingle (duplicates included).
+    """
+    words = np.fromiter((zlib.crc32(word.encode("utf-8")) for word in _WORD.findall(text.lower())),
+                        dtype=np.uint32)
+    if len(words) < SHINGLE_SIZE:
+        return np.empty(0, dtype=np.uint32)
+    # Combine the word hashes of each window; the multipliers make the combination order-sensitive.
+    shingles = words[:len(words) - SHINGLE_SIZE + 1].copy()
+    for offset in range(1, SHINGLE_SIZE):
+        shingles *= np.uint32(0x9E3779B1)
+        shingles ^= words[offset:len(words) - SHINGLE_SIZE + 1 + offset]
+    return shingles
+
+
+def signature(text: str) -> Optional[np.ndarray]:
+    """
+    MinHash signature of a text's shingle set.
+
+    The share of positions where two signatures agree estimates the Jaccard
+    similarity of the two shingle sets.
+
+    :param text: Resume text.
+    :return: NUM_PERM uint32 values, or None if the text has fewer than MIN_SHINGLES shingles.
+    """
+    shingles = shingle_hashes(text)
+    if len(shingles) < MIN_SHINGLES:
+        return None
+    # uint32 arithmetic wraps around, which is exactly the mod 2**32 of the permutation.
+    return (shingles[:, None] * _A + _B).min(axis=0)
+
+
+def similarity(first: np.ndarray, second: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the texts behind two signatures."""
+    return float(np.count_nonzero(first == second)) / NUM_PERM
+
+
+def band_keys(sig: np.ndarray) -> List[bytes]:
+    """LSH bucket keys of a signature: the band number followed by the band's values."""
+    rows = NUM_PERM // BANDS
+    return [bytes([band]) + sig[band * rows:(band + 1) * rows].tobytes() for band in range(BANDS)]
+
+
+class NearDuplicate(NamedTuple):
+    """A stored resume similar to the one looked up."""
+    digest: str
+    # First resume of the group the match belongs to.
+    canonical: str
+    similarity: float
+
+
+# ===================== SIGNATURE INDEX =====================
+class NearDuplicateIndex:
+    """
+    MinHash/LSH index of the text of every analyzed resume, keyed by content digest.
+
+    Each signature is stored with its LSH band keys, so finding the
+    near-duplicates of a new resume is one indexed lookup of BANDS keys plus a
+    comparison with the few signatures that share a band. Resumes found to be
+    near-duplicates are stored with the digest of the first resume of their
+    group (its canonical digest), which is what batch results are grouped by.
+    """
+
+    def __init__(self, path: Optional[str] = DEFAULT_DEDUP_PATH, threshold: float = DEDUP_THRESHOLD):
+        """
+        :param path: SQLite file, or None/empty for an in-memory index.
+        :param threshold: Minimum estimated similarity of a near-duplicate.
+        """
+        self.path = path or None
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # In-memory index: digest -> (canonical, signature) and band key -> digests.
+        self._signatures: Dict[str, Tuple[str, np.ndarray]] = {}
+        self._buckets: Dict[bytes, List[str]] = {}
+
+    # ---------- connection handling ----------
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        """One connection per thread and process (connections must not cross a fork)."""
+        if not self.path:
+            return None
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(
+            "CREATE TABLE IF NOT EXISTS signatures ("
+            " digest TEXT PRIMARY KEY, canonical TEXT NOT NULL, signature BLOB NOT NULL, added REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS bands ("
+            " key BLOB NOT NULL, digest TEXT NOT NULL, PRIMARY KEY (key, digest)) WITHOUT ROWID;"
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);"
+        )
+        version = conn.execute("SELECT value FROM meta WHERE key = 'signature_version'").fetchone()
+        if version is None or version[0] != SIGNATURE_VERSION:
+            if version is not None:
+                logger.info("Signature parameters changed; clearing near-duplicate index %s", self.path)
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM signatures")
+            conn.execute("DELETE FROM bands")
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('signature_version', ?)",
+                         (SIGNATURE_VERSION,))
+            conn.execute("COMMIT")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    # ---------- public API ----------
+    def __len__(self) -> int:
+        conn = self._connection()
+        if conn is None:
+            return len(self._signatures)
+        return conn.execute("SELECT COUNT(*) FROM signatures").fetchone()[0]
+
+    def find(self, sig: np.ndarray, exclude: Optional[str] = None) -> Optional[NearDuplicate]:
+        """
+        Most similar stored resume at or above the threshold.
+
+        :param sig: Signature of the resume looked up.
+        :param exclude: Digest to ignore (the resume itself, if it is already stored).
+        :return: The best match, or None.
+        """
+        keys = band_keys(sig)
+        conn = self._connection()
+        if conn is None:
+            with self._lock:
+                digests = dict.fromkeys(d for key in keys for d in self._buckets.get(key, ()))
+                candidates = [(d,) + self._signatures[d] for d in list(digests)[:MAX_CANDIDATES]]
+        else:
+            rows = conn.execute(
+                "SELECT s.digest, s.canonical, s.signature FROM signatures s WHERE s.digest IN"
+                f" (SELECT digest FROM bands WHERE key IN ({','.join('?' * len(keys))})) LIMIT ?",
+                (*keys, MAX_CANDIDATES)).fetchall()
+            candidates = [(d, canonical, np.frombuffer(blob, dtype=np.uint32)) for d, canonical, blob in rows]
+        candidates = [c for c in candidates if c[0] != exclude]
+        if not candidates:
+            return None
+        scores = np.count_nonzero(np.stack([c[2] for c in candidates]) == sig, axis=1) / NUM_PERM
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+        digest, canonical, _ = candidates[best]
+        return NearDuplicate(digest, canonical, float(scores[best]))
+
+    def add(self, digest: str, sig: np.ndarray, canonical: Optional[str] = None) -> None:
+        """
+        Store the signature of an analyzed resume (a no-op if its digest is already stored).
+
+        :param digest: Content digest of the resume file.
+        :param sig: Its signature.
+        :param canonical: Canonical digest of its near-duplicate group (defaults to its own digest).
+        """
+        canonical = canonical or digest
+        keys = band_keys(sig)
+        conn = self._connection()
+        if conn is None:
+            with self._lock:
+                if digest not in self._signatures:
+                    self._signatures[digest] = (canonical, sig)
+                    for key in keys:
+                        self._buckets.setdefault(key, []).append(digest)
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO signatures (digest, canonical, signature, added) VALUES (?, ?, ?, ?)",
+                (digest, canonical, sig.astype(np.uint32).tobytes(), time.time())).rowcount
+            if inserted:
+                conn.executemany("INSERT OR IGNORE INTO bands (key, digest) VALUES (?, ?)",
+                                 [(key, digest) for key in keys])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def canonical(self, digest: str) -> Optional[str]:
+        """
+        Canonical digest of a stored resume's near-duplicate group.
+
+        :param digest: Content digest of the resume file.
+        :return: The canonical digest (the resume's own if it has no earlier duplicate), or None if not stored.
+        """
+        conn = self._connection()
+        if conn is None:
+            entry = self._signatures.get(digest)
+            return entry[0] if entry else None
+        row = conn.execute("SELECT canonical FROM signatures WHERE digest = ?", (digest,)).fetchone()
+        return row[0] if row else None
+
+    def clear(self) -> None:
+        """Remove every stored signature."""
+        conn = self._connection()
+        with self._lock:
+            self._signatures.clear()
+            self._buckets.clear()
+        if conn is not None:
+            conn.execute("DELETE FROM signatures")
+            conn.execute("DELETE FROM bands")
+
+
+# ===================== DEFAULT INDEX =====================
+DEDUP_INDEX = NearDuplicateIndex()
+
+
+def reuse_near_duplicate(digest: str, text: str) -> Tuple[Optional[np.ndarray], Optional[Dict[str, Any]]]:
+    """
+    Analyze a resume incrementally from an analyzed near-duplicate of it, if there is one.
+
+    The near-duplicate's cached text and artifacts are diffed against the new
+    text (see resume_analysis.diff_artifacts), so only the changed lines go
+    through the tokenizer. The analysis and the diffed artifacts are cached under
+    the new digest (so rescoring.py and later near-duplicates can use them), and
+    the resume is recorded in the near-duplicate's group. Failures are logged
+    and treated as "no duplicate", so the resume is analyzed in full.
+
+    :param digest: Content digest of the new resume.
+    :param text: Its extracted text.
+    :return: (signature to pass to remember_signature after a full analysis, analysis or None).
+    """
+    if not DEDUP_ENABLED:
+        return None, None
+    sig = None
+    try:
+        with metrics.timer("near_duplicate"):
+            sig = signature(text)
+            match = DEDUP_INDEX.find(sig, exclude=digest) if sig is not None else None
+            old_text = CACHE.get("text", match.digest) if match else None
+            old_artifacts = CACHE.get("artifacts", match.digest) if old_text is not None else None
+            # Artifacts matched against another taxonomy would bring back stale skills.
+            if old_artifacts is None or old_artifacts.get("taxonomy") != TAXONOMY_FINGERPRINT:
+                metrics.CACHE_REQUESTS.inc("near_duplicate", "miss")
+                return sig, None
+            artifacts = diff_artifacts(old_text, old_artifacts, text)
+            analysis = analysis_from_artifacts(artifacts)
+        metrics.CACHE_REQUESTS.inc("near_duplicate", "hit")
+        logger.debug("Resume %s is a near-duplicate of %s (similarity %.2f); analyzed its changes only",
+                     digest[:12], match.digest[:12], match.similarity)
+        CACHE.put("analysis", digest, analysis)
+        store_artifacts(digest, artifacts)
+        DEDUP_INDEX.add(digest, sig, match.canonical)
+        return None, analysis
+    except Exception as e:
+        logger.warning("Near-duplicate analysis failed; analyzing %s in full: %s", digest[:12], e)
+        return sig, None
+
+
+def remember_signature(digest: str, sig: Optional[np.ndarray]) -> None:
+    """
+    Store the signature of a freely analyzed resume. Failures are logged, not raised.
+
+    :param digest: Content digest of the resume.
+    :param sig: Signature returned by reuse_near_duplicate (None skips it).
+    """
+    if sig is None:
+        return
+    try:
+        # Another near-duplicate may have been stored meanwhile (e.g. by a concurrent batch worker).
+        match = DEDUP_INDEX.find(sig, exclude=digest)
+        DEDUP_INDEX.add(digest, sig, match.canonical if match else None)
+    except (sqlite3.Error, OSError) as e:
+        logger.warning("Could not store near-duplicate signature: %s", e)
+
+
+def duplicate_key(digest: Optional[str]) -> Optional[str]:
+    """Canonical digest of a resume's near-duplicate group (its own digest if unknown). Never raises."""
+    if digest is None or not DEDUP_ENABLED:
+        return digest
+    try:
+        return DEDUP_INDEX.canonical(digest) or digest
+    except (sqlite3.Error, OSError) as e:
+        logger.warning("Near-duplicate lookup failed: %s", e)
+        return digest
+
+
+def group_duplicates(results: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Group batch result entries that are the same resume or near-duplicates of each other.
+
+    :param results: /compare-multiple result entries.
+    :return: One {"digest", "filenames"} entry per group of two or more, in order of first appearance.
+    """
+    groups: Dict[str, List[str]] = {}
+    for result in results:
+        key = result.get("duplicate_of") or result.get("digest")
+        if key:
+            groups.setdefault(key, []).append(result["filename"])
+    return [{"digest": key, "filenames": filenames} for key, filenames in groups.items() if len(filenames) > 1]
+
+
+# ===================== CLI =====================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or reset the near-duplicate resume index.")
+    parser.add_argument("command", choices=["stats", "clear"])
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        print(f"{len(DEDUP_INDEX)} signatures in {DEDUP_INDEX.path or 'memory'} "
+              f"(threshold {DEDUP_INDEX.threshold}, {NUM_PERM} permutations in {BANDS} bands)")
+    else:
+        DEDUP_INDEX.clear()
+        print("Cleared")
@@ -0,0 +1,52 @@
+# Gunicorn settings: gunicorn -c gunicorn.conf.py app:app
+import gc
+import multiprocessing
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "127.0.0.1:8000")
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+# Replace a worker after this many requests (0 = never); the jitter keeps workers from restarting together.
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 0))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 100))
+
+# Import the app in the master so workers are forked from a warm process.
+preload_app = True
+# Also load spaCy and the skill index in the master (set PRELOAD_NLP=0 to defer
+# loading to each worker's first analysis request).
+PRELOAD_NLP = os.environ.get("PRELOAD_NLP", "1") != "0"
+
+
+def on_starting(server):
+    # Per-process metric snapshots from a previous run would be summed with the new ones.
+    from metrics import clear_snapshots
+    clear_snapshots()
+    if PRELOAD_NLP:
+        from nlp_engine import preload
+        preload()
+    # Move everything loaded so far out of the collector's view; otherwise the
+    # first GC pass in each worker touches (and copies) the shared pages.
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # The worker shares the master's model: recycle it once its vocabulary has
+    # grown instead of reloading a private copy of the model in place.
+    if PRELOAD_NLP:
+        from nlp_engine import share_model
+        share_model()
+
+
+def post_request(worker, req, environ, resp):
+    # Past the vocabulary limit or the memory watermark, finish this request and exit;
+    # the master forks a fresh worker from its preloaded state (like max_requests).
+    from nlp_engine import vocab_recycle_due
+    from worker_memory import over_watermark
+    if not worker.alive:
+        return
+    reason = "vocab" if vocab_recycle_due() else "memory" if over_watermark() else None
+    if reason:
+        import metrics
+        metrics.WORKER_RECYCLES.inc(reason)
+        metrics.dump(force=True)
+        worker.alive = False
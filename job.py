@@ -1,15 +1,21 @@
 from flask import Flask, request, jsonify
-import spacy
+import hashlib
+import json
 import re
-from spacy.matcher import PhraseMatcher
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Optional
+import metrics
 from data_base import SKILLS_DB
+from nlp_engine import make_doc
+from relevance import SparseVector, get_relevance_model, relevance_score
+from skill_matcher import SKILL_VOCABULARY, get_skill_index
+from resume_analysis import DEGREE_LEVELS, RELEVANCE_WEIGHT, compare_skill_masks, match_skill_masks
 
 app = Flask(__name__)
 
-# Load the NLP model
-nlp = spacy.load("en_core_web_sm")
-
-# ===================== SKILL MAPPING & MATCHER SETUP =====================
+# ===================== SKILL MAPPING SETUP =====================
 # Build a consistent skill mapping: lower-case alias -> canonical skill
 SKILL_MAPPING = {
     alias.lower(): skill
@@ -20,13 +26,9 @@ SKILL_MAPPING = {
 for skill in SKILLS_DB.keys():
     SKILL_MAPPING[skill.lower()] = skill
 
-# Build PhraseMatcher using lower-case patterns.
-matcher = PhraseMatcher(nlp.vocab, attr="LOWER")
-patterns = [nlp.make_doc(alias.lower()) for aliases in SKILLS_DB.values() for alias in aliases]
-matcher.add("SKILLS", None, *patterns)
-
 
 # ===================== JOB DESCRIPTION PARSER =====================
+@metrics.timed("parse_job_description")
 def parse_job_description(job_text: str) -> dict:
     """
     Parse a job description to extract required skills, years of experience,
@@ -44,14 +46,13 @@ def parse_job_description(job_text: str) -> dict:
 
     # Convert job text to lower-case for uniform processing.
     job_text_lower = job_text.lower()
-    doc = nlp(job_text_lower)
+    # One Doc serves every matcher below; NER is never used, so it is not run.
+    doc = make_doc(job_text_lower, "lemmas", "noun_chunks")
     skills_found = set()
 
-    # 1. Phrase-based matching using PhraseMatcher.
-    matches = matcher(doc)
-    for match_id, start, end in matches:
-        span = doc[start:end]
-        canonical = SKILL_MAPPING.get(span.text)
+    # 1. Phrase-based matching using the compiled skill index.
+    for variation in get_skill_index().find(doc):
+        canonical = SKILL_MAPPING.get(variation)
         if canonical:
             skills_found.add(canonical)
 
@@ -95,6 +96,146 @@ def parse_job_description(job_text: str) -> dict:
     return parsed_job
 
 
+# ===================== COMPILED JOB PROFILE =====================
+# Compiled profiles kept in memory, keyed by a hash of the job text.
+PROFILE_CACHE_SIZE = 256
+_profile_cache: "OrderedDict[str, JobProfile]" = OrderedDict()
+_profile_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class JobProfile:
+    """
+    A job description compiled once for scoring many resumes.
+
+    Holds everything analyze_match and compare_skills would otherwise rebuild
+    per resume: the lowercase skill set, the degree level and the experience
+    requirement. Profiles are immutable and hashable; two profiles compare
+    equal when they were compiled from the same text.
+    """
+    digest: str
+    skills: FrozenSet[str]
+    degree: Optional[str]
+    degree_level: Optional[int]
+    min_years: Optional[float]
+    job_data: Dict[str, Any] = field(compare=False, hash=False, repr=False)
+    # The skills as a SKILL_VOCABULARY bitset.
+    skill_mask: int = field(default=0, compare=False, hash=False, repr=False)
+    # TF-IDF vector of the skills, built only when RELEVANCE_WEIGHT is set.
+    relevance_vector: Optional[SparseVector] = field(default=None, compare=False, hash=False, repr=False)
+
+    @classmethod
+    def from_job_data(cls, job_data: Dict[str, Any], digest: Optional[str] = None) -> "JobProfile":
+        """
+        Compile a profile from parse_job_description output.
+
+        :param job_data: Parsed job data.
+        :param digest: Identity of the profile (defaults to a hash of job_data).
+        :return: The compiled profile.
+        """
+        if digest is None:
+            digest = hashlib.sha256(json.dumps(job_data, sort_keys=True).encode("utf-8")).hexdigest()
+        degree = job_data.get("education", "")
+        years = re.match(r'\d+(?:\.\d+)?', job_data.get("years_experience") or "")
+        skills = frozenset(s.lower() for s in job_data.get("required_skills", []))
+        return cls(
+            digest=digest,
+            skills=skills,
+            degree=degree,
+            degree_level=DEGREE_LEVELS.get(degree),
+            min_years=float(years.group()) if years else None,
+            job_data=job_data,
+            skill_mask=SKILL_VOCABULARY.mask(skills),
+            relevance_vector=get_relevance_model().vector(skills) if RELEVANCE_WEIGHT else None,
+        )
+
+    def __reduce__(self):
+        # Bitset ids are per process, so a profile sent to a worker is compiled there,
+        # once per process: later copies with the same digest come from the profile cache.
+        return _restore_job_profile, (self.digest, self.job_data)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The parsed job data, as returned by parse_job_description (a fresh copy)."""
+        return dict(self.job_data, required_skills=list(self.job_data.get("required_skills", [])))
+
+    def compare_skills(self, resume_skills: List[str]) -> Dict[str, Any]:
+        """compare_skills against this job's required skills."""
+        return self.compare_mask(SKILL_VOCABULARY.mask(resume_skills))
+
+    def compare_mask(self, resume_mask: int) -> Dict[str, Any]:
+        """compare_skills for resume skills given as a SKILL_VOCABULARY bitset."""
+        return compare_skill_masks(resume_mask, self.skill_mask)
+
+    def match(self, resume_data: Dict[str, Any]) -> Dict[str, Any]:
+        """analyze_match against this job; returns the same dictionary."""
+        return self.match_mask(SKILL_VOCABULARY.mask(resume_data.get("skills", [])),
+                               resume_data.get("education", {}).get("degree", ""))
+
+    def match_mask(self, resume_mask: int, resume_degree: Optional[str]) -> Dict[str, Any]:
+        """analyze_match for resume skills given as a SKILL_VOCABULARY bitset."""
+        return match_skill_masks(resume_mask, resume_degree, self.skill_mask, self.degree, self.degree_level,
+                                 self.relevance(resume_mask))
+
+    def relevance(self, resume_mask: int) -> Optional[float]:
+        """TF-IDF relevance (0-1) of resume skills given as a bitset, or None when RELEVANCE_WEIGHT is 0."""
+        if self.relevance_vector is None:
+            return None
+        return relevance_score(SKILL_VOCABULARY.decode(resume_mask), self.relevance_vector)
+
+
+def job_digest(job_text: str) -> str:
+    """Cache key of a job description: the SHA-256 of its text."""
+    return hashlib.sha256(job_text.encode("utf-8")).hexdigest()
+
+
+def cached_job_profile(digest: str) -> Optional[JobProfile]:
+    """
+    Look up a compiled profile by job_digest, counting the hit or miss.
+
+    :param digest: job_digest of the job description.
+    :return: The cached profile, or None.
+    """
+    with _profile_lock:
+        profile = _profile_cache.get(digest)
+        if profile is not None:
+            _profile_cache.move_to_end(digest)
+    metrics.CACHE_REQUESTS.inc("job_profile", "miss" if profile is None else "hit")
+    return profile
+
+
+def cache_job_profile(profile: JobProfile) -> None:
+    """Keep a compiled profile for later compile_job_profile calls, evicting the oldest past PROFILE_CACHE_SIZE."""
+    with _profile_lock:
+        _profile_cache[profile.digest] = profile
+        while len(_profile_cache) > PROFILE_CACHE_SIZE:
+            _profile_cache.popitem(last=False)
+
+
+def _restore_job_profile(digest: str, job_data: Dict[str, Any]) -> JobProfile:
+    """Unpickle a JobProfile, reusing this process's compiled copy of the same digest."""
+    with _profile_lock:
+        profile = _profile_cache.get(digest)
+    if profile is None:
+        profile = JobProfile.from_job_data(job_data, digest)
+        cache_job_profile(profile)
+    return profile
+
+
+def compile_job_profile(job_text: str) -> JobProfile:
+    """
+    Parse a job description into a JobProfile, reusing a cached one for text seen before.
+
+    :param job_text: The job description text.
+    :return: The compiled profile.
+    """
+    digest = job_digest(job_text)
+    profile = cached_job_profile(digest)
+    if profile is None:
+        profile = JobProfile.from_job_data(parse_job_description(job_text), digest)
+        cache_job_profile(profile)
+    return profile
+
+
 # ===================== FLASK ROUTE FOR JOB DESCRIPTION =====================
 @app.route('/upload_job_description', methods=['POST'])
 def upload_job_description():
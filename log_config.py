@@ -0,0 +1,155 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import threading
+from typing import Dict, Optional
+
+# ===================== LOGGING CONFIGURATION =====================
+# Root log level.
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+# Per-module overrides, e.g. "app=DEBUG,pdf_extract=DEBUG", to debug one stage on demand.
+LOG_LEVELS = os.environ.get("LOG_LEVELS", "")
+# Share of DEBUG records kept (0-1); everything above DEBUG is always kept.
+DEBUG_SAMPLE_RATE = float(os.environ.get("LOG_DEBUG_SAMPLE_RATE", 1.0))
+# Set LOG_RESUME_CONTENT=1 to log (redacted) excerpts of resume text in DEBUG records;
+# by default only their size is logged.
+LOG_RESUME_CONTENT = os.environ.get("LOG_RESUME_CONTENT", "0") == "1"
+# Records waiting for the writer thread; further records are dropped (and counted) rather than block a request.
+QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", 10000))
+LOG_FORMAT = "%(asctime)s %(levelname)s [%(process)d] %(name)s: %(message)s"
+
+# E-mail addresses and phone numbers are masked in every record before it is written.
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+_PHONE = re.compile(r"(?<!\w)\+?\d[\d\s().-]{7,}\d(?!\w)")
+
+_configured = False
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional["DroppingQueueHandler"] = None
+_lock = threading.Lock()
+
+
+# ===================== REDACTION =====================
+def redact(text: str) -> str:
+    """Mask e-mail addresses and phone numbers."""
+    return _PHONE.sub(_mask_phone, _EMAIL.sub("[email]", text))
+
+
+def _mask_phone(match: "re.Match[str]") -> str:
+    # Date ranges such as "2019 - 2021" look alike but have too few digits.
+    return "[phone]" if sum(c.isdigit() for c in match.group()) >= 9 else match.group()
+
+
+def describe_text(text: str, limit: int = 200) -> str:
+    """
+    Summarize resume text for a log record without leaking its content.
+
+    :param text: Resume or section text.
+    :param limit: Characters of excerpt kept when LOG_RESUME_CONTENT is on.
+    :return: Its size, plus a redacted excerpt when LOG_RESUME_CONTENT is on.
+    """
+    summary = f"<{len(text)} chars, {text.count(chr(10)) + 1} lines>"
+    if LOG_RESUME_CONTENT:
+        excerpt = redact(text[:limit]).replace("\n", " | ")
+        summary += f" {excerpt!r}"
+    return summary
+
+
+class RedactingFilter(logging.Filter):
+    """Applies redact() to the formatted message. Runs in the writer thread, off the request path."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        message = record.getMessage()
+        redacted = redact(message)
+        if redacted != message:
+            record.msg, record.args = redacted, None
+        return True
+
+
+class DebugSamplingFilter(logging.Filter):
+    """Keeps a random share of DEBUG records; other levels always pass."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > logging.DEBUG or self.rate >= 1 or random.random() < self.rate
+
+
+# ===================== ASYNC HANDLER =====================
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the writer thread; when its queue is full, drops them instead of blocking."""
+
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]"):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _start_listener() -> None:
+    """Start the writer thread for this process (threads do not survive a fork)."""
+    global _listener
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(logging.Formatter(LOG_FORMAT))
+    stream.addFilter(RedactingFilter())
+    _queue_handler.queue = queue.Queue(QUEUE_SIZE)
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, stream, respect_handler_level=True)
+    _listener.start()
+
+
+def _stop_listener() -> None:
+    """Flush pending records (at exit)."""
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+    if _queue_handler is not None and _queue_handler.dropped:
+        sys.stderr.write(f"log_config: dropped {_queue_handler.dropped} log records (queue full)\n")
+
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    """Parse "module=LEVEL,..." into {logger name: level}."""
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging(level: Optional[str] = None) -> None:
+    """
+    Route all logging through one buffered, redacting handler.
+
+    Records are queued by the calling thread and written by a background
+    thread, so a slow stderr or log shipper never stalls a request. Does
+    nothing if the root logger already has handlers (e.g. set up by the host
+    application) or if this was already called.
+
+    :param level: Root level (defaults to LOG_LEVEL).
+    """
+    global _configured, _queue_handler
+    with _lock:
+        root = logging.getLogger()
+        if _configured or root.handlers:
+            return
+        _configured = True
+        root.setLevel(level or LOG_LEVEL)
+        for name, module_level in parse_levels(LOG_LEVELS).items():
+            logging.getLogger(name).setLevel(module_level)
+
+        _queue_handler = DroppingQueueHandler(queue.Queue(QUEUE_SIZE))
+        _queue_handler.addFilter(DebugSamplingFilter(DEBUG_SAMPLE_RATE))
+        root.addHandler(_queue_handler)
+        _start_listener()
+        atexit.register(_stop_listener)
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=_start_listener)
@@ -0,0 +1,379 @@
+import bisect
+import functools
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# ===================== METRICS CONFIGURATION =====================
+# Set METRICS_ENABLED=0 to turn every timer and counter into a no-op.
+ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+# With several gunicorn workers, each process writes its metrics here and
+# /metrics reports the sum (empty = report this process only).
+METRICS_DIR = os.environ.get("METRICS_DIR") or None
+# Seconds between snapshots a process writes to METRICS_DIR.
+DUMP_INTERVAL = 5.0
+
+# Latency buckets in seconds: spaCy and PDF stages run from ~0.1 ms to seconds.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+LabelValues = Tuple[str, ...]
+
+
+# ===================== METRIC TYPES =====================
+class Counter:
+    """A monotonically increasing count per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        if not ENABLED:
+            return
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+        _record_capture("inc", self.name, label_values, amount)
+
+    def snapshot(self) -> Dict[LabelValues, Any]:
+        with self._lock:
+            return dict(self._values)
+
+    def merge(self, label_values: LabelValues, value: Any) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + value
+
+    def samples(self, values: Dict[LabelValues, Any]) -> Iterator[str]:
+        for label_values, value in sorted(values.items()):
+            yield f"{self.name}_total{_format_labels(self.labels, label_values)} {_format_value(value)}"
+
+
+class Histogram:
+    """Observations counted into fixed buckets per label combination, plus their sum."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # Per label combination: [count per bucket (last one is +Inf)..., sum].
+        self._values: Dict[LabelValues, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        if not ENABLED:
+            return
+        self._add(label_values, value)
+        _record_capture("observe", self.name, label_values, value)
+
+    def _add(self, label_values: LabelValues, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(label_values)
+            if row is None:
+                row = self._values[label_values] = [0.0] * (len(self.buckets) + 2)
+            row[index] += 1
+            row[-1] += value
+
+    def snapshot(self) -> Dict[LabelValues, Any]:
+        with self._lock:
+            return {key: list(row) for key, row in self._values.items()}
+
+    def merge(self, label_values: LabelValues, value: Any) -> None:
+        if not isinstance(value, list):
+            self._add(label_values, value)
+            return
+        with self._lock:
+            row = self._values.setdefault(label_values, [0.0] * (len(self.buckets) + 2))
+            for position, amount in enumerate(value):
+                row[position] += amount
+
+    def samples(self, values: Dict[LabelValues, Any]) -> Iterator[str]:
+        for label_values, row in sorted(values.items()):
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), row):
+                cumulative += count
+                labels = _format_labels(self.labels + ("le",), label_values + (_format_bound(bound),))
+                yield f"{self.name}_bucket{labels} {_format_value(cumulative)}"
+            labels = _format_labels(self.labels, label_values)
+            yield f"{self.name}_sum{labels} {row[-1]!r}"
+            yield f"{self.name}_count{labels} {_format_value(cumulative)}"
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = (f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + ",".join(pairs) + "}"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+# ===================== REGISTRY =====================
+STAGE_SECONDS = Histogram("resume_stage_duration_seconds",
+                          "Time spent in each analysis stage.", ["stage"])
+PDF_PAGE_SECONDS = Histogram("pdf_page_duration_seconds",
+                             "Time to extract one PDF page, by extractor.", ["extractor"])
+REQUEST_SECONDS = Histogram("http_request_duration_seconds",
+                            "HTTP request latency by endpoint.", ["endpoint", "status"])
+BATCH_SIZE = Histogram("batch_size_resumes", "Resumes per recruiter batch.", buckets=BATCH_SIZE_BUCKETS)
+CACHE_REQUESTS = Counter("cache_requests", "Cache lookups by cache and result.", ["cache", "result"])
+ERRORS = Counter("analysis_errors", "Resumes or requests that failed, by stage.", ["stage"])
+REJECTIONS = Counter("admission_rejections", "Requests and files turned away by admission control, by reason.",
+                     ["reason"])
+VOCAB_STRINGS = Counter("nlp_vocab_strings_added", "Strings added to the spaCy vocabulary by analyzed text.")
+VOCAB_RESETS = Counter("nlp_vocab_resets", "Times the spaCy model was reloaded to drop a grown vocabulary.")
+WORKER_RECYCLES = Counter("worker_recycles", "Worker processes replaced to give memory back, by reason.", ["reason"])
+
+REGISTRY: Dict[str, Any] = {metric.name: metric for metric in (
+    STAGE_SECONDS, PDF_PAGE_SECONDS, REQUEST_SECONDS, BATCH_SIZE, CACHE_REQUESTS, ERRORS, REJECTIONS,
+    VOCAB_STRINGS, VOCAB_RESETS, WORKER_RECYCLES,
+)}
+
+
+# ===================== TIMERS & TRACES =====================
+# Per-thread state: the trace of the current request (if one was asked for)
+# and the samples captured inside a batch worker process.
+_local = threading.local()
+
+
+class _NullTimer:
+    """Returned by timer() when there is nothing to record."""
+
+    def __enter__(self) -> "_NullTimer":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        return None
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _StageTimer:
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self) -> "_StageTimer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        record_stage(self.stage, time.perf_counter() - self.started)
+
+
+def timer(stage: str) -> Any:
+    """
+    Context manager timing one stage into STAGE_SECONDS (and the active trace, if any).
+
+    :param stage: Stage label, e.g. "parse_pdf".
+    :return: A context manager; a shared no-op one when metrics are disabled and no trace is active.
+    """
+    if not ENABLED and getattr(_local, "trace", None) is None:
+        return _NULL_TIMER
+    return _StageTimer(stage)
+
+
+def timed(stage: str) -> Callable:
+    """Decorator form of timer()."""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not ENABLED and getattr(_local, "trace", None) is None:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record_stage(stage, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    """Record a stage duration measured elsewhere."""
+    STAGE_SECONDS.observe(seconds, stage)
+    trace = getattr(_local, "trace", None)
+    if trace is not None:
+        trace.append({"stage": stage, "ms": round(seconds * 1000, 3)})
+
+
+def start_trace() -> List[Dict[str, Any]]:
+    """
+    Start collecting every stage timed in this thread, for a per-request trace.
+
+    :return: The list of {"stage", "ms"} entries, filled in as stages complete.
+    """
+    _local.trace = []
+    return _local.trace
+
+
+def stop_trace() -> Optional[List[Dict[str, Any]]]:
+    """Stop the trace of this thread and return it (None if none was started)."""
+    trace = getattr(_local, "trace", None)
+    _local.trace = None
+    return trace
+
+
+# ===================== WORKER PROCESSES =====================
+# Batch workers run in other processes; what they record is shipped back with
+# each result and merged into the parent's registry.
+def _record_capture(op: str, name: str, label_values: LabelValues, value: float) -> None:
+    captured = getattr(_local, "captured", None)
+    if captured is not None:
+        captured.append((op, name, label_values, value))
+
+
+@contextmanager
+def capture() -> Iterator[List[Tuple[str, str, LabelValues, float]]]:
+    """Collect everything recorded in this thread, so a worker process can send it to its parent."""
+    previous = getattr(_local, "captured", None)
+    _local.captured = []
+    try:
+        yield _local.captured
+    finally:
+        _local.captured = previous
+
+
+def merge(captured: Optional[Sequence[Tuple[str, str, Sequence[str], float]]]) -> None:
+    """
+    Add samples captured in a worker process to this process's metrics.
+
+    :param captured: Output of capture(); None is ignored.
+    """
+    if not captured:
+        return
+    trace = getattr(_local, "trace", None)
+    for op, name, label_values, value in captured:
+        metric = REGISTRY.get(name)
+        if metric is None:
+            continue
+        metric.merge(tuple(label_values), value)
+        if trace is not None and metric is STAGE_SECONDS:
+            trace.append({"stage": label_values[0], "ms": round(value * 1000, 3)})
+
+
+# ===================== EXPORT =====================
+_dump_lock = threading.Lock()
+_last_dump = 0.0
+
+
+def _reset_after_fork() -> None:
+    # A forked process starts from zero; otherwise the parent's counts would be
+    # reported twice once both write snapshots to METRICS_DIR.
+    global _last_dump
+    for metric in REGISTRY.values():
+        metric._lock = threading.Lock()
+        metric._values = {}
+    _last_dump = 0.0
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def snapshot() -> Dict[str, Dict[LabelValues, Any]]:
+    """Raw values of every metric in this process."""
+    return {name: metric.snapshot() for name, metric in REGISTRY.items()}
+
+
+def dump(directory: Optional[str] = None, force: bool = False) -> None:
+    """
+    Write this process's metrics to METRICS_DIR, at most every DUMP_INTERVAL seconds.
+
+    :param directory: Target directory (defaults to METRICS_DIR; nothing is written without one).
+    :param force: Write even if the last snapshot is recent.
+    """
+    global _last_dump
+    directory = directory or METRICS_DIR
+    if not ENABLED or not directory:
+        return
+    with _dump_lock:
+        if not force and time.monotonic() - _last_dump < DUMP_INTERVAL:
+            return
+        _last_dump = time.monotonic()
+    data = {name: [[list(labels), value] for labels, value in values.items()]
+            for name, values in snapshot().items()}
+    os.makedirs(directory, exist_ok=True)
+    filepath = os.path.join(directory, f"metrics-{os.getpid()}.json")
+    temporary = f"{filepath}.{threading.get_ident()}.tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(temporary, filepath)
+
+
+def clear_snapshots(directory: Optional[str] = None) -> None:
+    """Delete the snapshots in METRICS_DIR (call once before starting the workers)."""
+    directory = directory or METRICS_DIR
+    if not directory:
+        return
+    for filepath in glob.glob(os.path.join(directory, "metrics-*.json")):
+        try:
+            os.remove(filepath)
+        except OSError:
+            pass
+
+
+def _combined(directory: str) -> Dict[str, Dict[LabelValues, Any]]:
+    """Sum the snapshots every process wrote to directory."""
+    dump(directory, force=True)
+    totals: Dict[str, Dict[LabelValues, Any]] = {name: {} for name in REGISTRY}
+    for filepath in glob.glob(os.path.join(directory, "metrics-*.json")):
+        try:
+            with open(filepath, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for name, entries in data.items():
+            if name not in totals:
+                continue
+            for labels, value in entries:
+                key = tuple(labels)
+                current = totals[name].get(key)
+                if current is None:
+                    totals[name][key] = value
+                elif isinstance(value, list):
+                    totals[name][key] = [a + b for a, b in zip(current, value)]
+                else:
+                    totals[name][key] = current + value
+    return totals
+
+
+def render() -> str:
+    """
+    Every metric in the Prometheus text exposition format.
+
+    :return: Exposition text, summed over all processes when METRICS_DIR is set.
+    """
+    values = _combined(METRICS_DIR) if METRICS_DIR else snapshot()
+    lines = []
+    for name, metric in REGISTRY.items():
+        exported = f"{name}_total" if metric.kind == "counter" else name
+        lines.append(f"# HELP {exported} {metric.help}")
+        lines.append(f"# TYPE {exported} {metric.kind}")
+        lines.extend(metric.samples(values.get(name, {})))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,205 @@
+import gc
+import logging
+import os
+import threading
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+
+import metrics
+from worker_memory import release_free_memory
+
+if TYPE_CHECKING:
+    from spacy.language import Language
+    from spacy.tokens import Doc
+
+logger = logging.getLogger(__name__)
+
+# ===================== SHARED NLP PIPELINE =====================
+# The spaCy model is loaded lazily, once per process, on first use. Pages that
+# never analyze text (e.g. "/") never pay for it. Call preload() before forking
+# workers so they share the loaded model copy-on-write.
+MODEL_NAME = os.environ.get("SPACY_MODEL", "en_core_web_sm")
+# Strings analyzed text (names, emails, URLs...) may add to the model's vocabulary
+# before the model is reloaded with a fresh one (0 = never). spaCy never forgets a
+# string, so without this a long-running worker grows with every resume it reads.
+VOCAB_RESET_STRINGS = int(os.environ.get("NLP_VOCAB_RESET_STRINGS", 100000))
+
+_nlp: Optional["Language"] = None
+_lock = threading.Lock()
+# Vocabulary size when the model was loaded, and when its growth was last counted.
+_base_strings = 0
+_counted_strings = 0
+# Whether the model was inherited from the parent this process was forked from (see share_model()).
+_model_shared = False
+
+# Pipeline components each analysis stage depends on, in the model's naming.
+# Stages mapped to an empty tuple only need the tokenizer (e.g. skill matching).
+STAGE_COMPONENTS: Dict[str, Tuple[str, ...]] = {
+    "tokens": (),
+    "lemmas": ("tok2vec", "tagger", "attribute_ruler", "lemmatizer"),
+    # The English noun_chunks iterator reads coarse POS tags as well as the parse.
+    "noun_chunks": ("tok2vec", "tagger", "parser", "attribute_ruler"),
+}
+
+
+def get_nlp() -> "Language":
+    """
+    Return the shared spaCy model, loading it on first use.
+
+    :return: The loaded pipeline.
+    """
+    if _nlp is None:
+        with _lock:
+            if _nlp is None:
+                _set_model(_load_model())
+    return _nlp
+
+
+def _load_model() -> "Language":
+    import spacy
+    return spacy.load(MODEL_NAME)
+
+
+def _set_model(nlp: "Language") -> None:
+    global _nlp, _base_strings, _counted_strings, _model_shared
+    _base_strings = _counted_strings = len(nlp.vocab.strings)
+    _model_shared = False
+    _nlp = nlp
+
+
+def is_loaded() -> bool:
+    """Whether this process has already loaded the model."""
+    return _nlp is not None
+
+
+def preload() -> None:
+    """
+    Load the model and build the skill index now instead of on first request.
+
+    Meant for a pre-fork server (gunicorn ``preload_app``) or a pool parent:
+    children forked afterwards inherit both without loading them again.
+    """
+    from skill_matcher import get_skill_index
+    get_nlp()
+    get_skill_index()
+
+
+def components_for(stages: Iterable[str]) -> List[str]:
+    """
+    Resolve the pipeline components needed by a set of analysis stages.
+
+    :param stages: Stage names from STAGE_COMPONENTS.
+    :return: Component names in pipeline order.
+    """
+    wanted = set()
+    for stage in stages:
+        if stage not in STAGE_COMPONENTS:
+            raise ValueError(f"Unknown analysis stage: {stage}")
+        wanted.update(STAGE_COMPONENTS[stage])
+    return [name for name in get_nlp().pipe_names if name in wanted]
+
+
+def make_doc(text: str, *stages: str) -> "Doc":
+    """
+    Tokenize text once and run only the components the given stages need.
+
+    The components are applied directly instead of toggling them with
+    ``nlp.select_pipes`` so concurrent requests never see a half-disabled model.
+
+    :param text: Text to process.
+    :param stages: Analysis stages the returned Doc must support.
+    :return: A Doc annotated for the requested stages.
+    """
+    nlp = _current_nlp()
+    doc = nlp.make_doc(text)
+    wanted = components_for(stages)
+    for name, component in nlp.pipeline:
+        if name in wanted:
+            doc = component(doc)
+    return doc
+
+
+# ===================== VOCABULARY GROWTH =====================
+def vocab_growth() -> int:
+    """Strings added to the vocabulary since the model was (re)loaded; 0 before it is loaded."""
+    nlp = _nlp
+    return len(nlp.vocab.strings) - _base_strings if nlp is not None else 0
+
+
+def reset_vocab(if_grown: bool = False) -> bool:
+    """
+    Reload the model, dropping every string analyzed text added to its vocabulary.
+
+    A StringStore cannot shrink, so the whole pipeline is replaced. Docs made
+    before keep the old pipeline alive until they are released; new docs use
+    the fresh one. The skill index matches on token text rather than
+    vocabulary ids, so it stays valid. In a forked worker the reloaded model
+    is no longer shared with the parent (about one model's worth of memory),
+    which is why processes marked with share_model() are recycled instead.
+
+    :param if_grown: Only reload if the vocabulary is past VOCAB_RESET_STRINGS,
+                     and without waiting for a reload running in another thread.
+    :return: Whether the model was reloaded.
+    """
+    if not _lock.acquire(blocking=not if_grown):
+        return False
+    try:
+        growth = vocab_growth()
+        if _nlp is None or (if_grown and growth <= VOCAB_RESET_STRINGS):
+            return False
+        _set_model(_load_model())
+    finally:
+        _lock.release()
+    # Free the old pipeline now (spaCy objects hold reference cycles) and give its
+    # pages back; otherwise the allocator keeps them and the process does not shrink.
+    gc.collect()
+    release_free_memory()
+    metrics.VOCAB_RESETS.inc()
+    logger.info("Reloaded spaCy model in process %s to drop %d vocabulary strings", os.getpid(), growth)
+    return True
+
+
+def share_model() -> None:
+    """
+    Mark the loaded model as shared copy-on-write with the parent this process
+    was forked from (e.g. a preloaded gunicorn master); a no-op before it is loaded.
+
+    Past VOCAB_RESET_STRINGS the model is then kept, and vocab_recycle_due()
+    tells the server to replace the process with a fresh fork: reloading in
+    place would swap the shared pages for a private model and push the worker
+    toward WORKER_MAX_MEMORY_MB.
+    """
+    global _model_shared
+    _model_shared = _nlp is not None
+
+
+def vocab_recycle_due() -> bool:
+    """Whether a process marked with share_model() has outgrown VOCAB_RESET_STRINGS and should be replaced."""
+    return _model_shared and bool(VOCAB_RESET_STRINGS) and vocab_growth() > VOCAB_RESET_STRINGS
+
+
+def _current_nlp() -> "Language":
+    """
+    get_nlp(), after counting the strings earlier Docs added to the vocabulary
+    and resetting it if they took it past VOCAB_RESET_STRINGS (unless the model
+    is shared with a parent process, see share_model()).
+    """
+    global _counted_strings
+    nlp = get_nlp()
+    size = len(nlp.vocab.strings)
+    added = size - _counted_strings
+    if added > 0:
+        _counted_strings = size
+        metrics.VOCAB_STRINGS.inc(amount=added)
+    if VOCAB_RESET_STRINGS and size - _base_strings > VOCAB_RESET_STRINGS and not _model_shared:
+        # Drop this reference first, so the old pipeline can be freed by the reset.
+        del nlp
+        reset_vocab(if_grown=True)
+        return get_nlp()
+    return nlp
+
+
+def __getattr__(name: str) -> Any:
+    # Keep ``nlp_engine.nlp`` working without loading the model at import time.
+    if name == "nlp":
+        return get_nlp()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,377 @@
+import argparse
+import csv
+import glob
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import sqlite3
+import sys
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from batch import DEFAULT_RESUME_TIMEOUT, DEFAULT_WORKERS, ResumeTimeout, analyze_source, resume_time_limit
+from job import JobProfile, compile_job_profile
+from log_config import configure_logging
+from nlp_engine import preload
+from skill_matcher import SKILL_VOCABULARY
+
+logger = logging.getLogger(__name__)
+
+# ===================== OFFLINE SCORING CONFIGURATION =====================
+# Resumes handed to a worker at a time; the checkpoint is committed after each chunk.
+DEFAULT_CHUNK_SIZE = 50
+# Chunks in flight per worker; bounds memory however many files are queued.
+CHUNKS_PER_WORKER = 4
+# Seconds between progress reports.
+PROGRESS_INTERVAL = 10.0
+# Columns of every output format, in order.
+FIELDS = ["job", "rank", "file", "final_match", "skill_match", "composite_score", "education_match",
+          "match_percentage", "matched_skills", "missing_skills", "total_skills", "error"]
+FORMATS = {".jsonl": "jsonl", ".csv": "csv", ".parquet": "parquet"}
+
+# Compiled job profiles of a worker process (set by _init_worker).
+_jobs: List[JobProfile] = []
+
+
+# ===================== INPUT DISCOVERY =====================
+def iter_resume_paths(inputs: Iterable[str]) -> Iterator[str]:
+    """
+    Every PDF named by the inputs, each once.
+
+    :param inputs: Directories (searched recursively), glob patterns or file paths.
+    :return: Iterator of paths, sorted within each input.
+    """
+    seen = set()
+    for spec in inputs:
+        if os.path.isdir(spec):
+            paths = []
+            for root, _, names in os.walk(spec):
+                paths.extend(os.path.join(root, name) for name in names if name.lower().endswith(".pdf"))
+        else:
+            paths = glob.glob(spec, recursive=True) or ([spec] if os.path.exists(spec) else [])
+        for path in sorted(paths):
+            if path not in seen:
+                seen.add(path)
+                yield path
+
+
+# ===================== SCORING =====================
+def score_file(path: str, jobs: Sequence[JobProfile]) -> List[Dict[str, Any]]:
+    """
+    Analyze one PDF once and score it against every job.
+
+    :param path: PDF path.
+    :param jobs: Compiled job profiles.
+    :return: One output row per job, in job order (without job and rank).
+    """
+    analysis = analyze_source(path)[1]
+    if "error" in analysis:
+        return [error_row(path, analysis["error"]) for _ in jobs]
+    resume_mask = SKILL_VOCABULARY.mask(analysis["skills"])
+    degree = analysis.get("education", {}).get("degree", "")
+    rows = []
+    for job in jobs:
+        match_result = job.match_mask(resume_mask, degree)
+        skill_comparison = job.compare_mask(resume_mask)
+        rows.append({
+            "file": path,
+            "final_match": _percent(match_result["final_match"]),
+            "skill_match": _percent(match_result["skill_match"]),
+            "composite_score": _percent(match_result["composite_score"]),
+            "education_match": match_result["education_match"],
+            "match_percentage": _percent(skill_comparison["match_percentage"]),
+            "matched_skills": skill_comparison["matched_skills"],
+            "missing_skills": match_result["missing_skills"],
+            "total_skills": match_result["resume_summary"]["total_skills"],
+            "error": None,
+        })
+    return rows
+
+
+def error_row(path: str, error: str) -> Dict[str, Any]:
+    """Output row for a resume that could not be scored (ranked last)."""
+    return {"file": path, "final_match": 0.0, "skill_match": None, "composite_score": None,
+            "education_match": None, "match_percentage": None, "matched_skills": [],
+            "missing_skills": [], "total_skills": 0, "error": error}
+
+
+def _percent(value: str) -> float:
+    return float(value.rstrip("%"))
+
+
+def score_chunk(paths: Sequence[str], timeout: Optional[float] = None,
+                jobs: Optional[Sequence[JobProfile]] = None) -> List[Tuple[str, List[Dict[str, Any]]]]:
+    """
+    score_file for several PDFs, giving each at most `timeout` seconds.
+
+    :param paths: PDF paths.
+    :param timeout: Per-resume time budget in seconds (None or 0 for no limit).
+    :param jobs: Compiled job profiles (defaults to the worker's, see _init_worker).
+    :return: (path, rows) pairs.
+    """
+    jobs = _jobs if jobs is None else jobs
+    scored = []
+    for path in paths:
+        try:
+            with resume_time_limit(timeout):
+                rows = score_file(path, jobs)
+        except ResumeTimeout:
+            rows = [error_row(path, f"Timed out after {timeout:g}s") for _ in jobs]
+        except Exception as e:
+            rows = [error_row(path, f"Failed to process resume: {str(e)}") for _ in jobs]
+        scored.append((path, rows))
+    return scored
+
+
+def _init_worker(job_data: List[Dict[str, Any]]) -> None:
+    """Compile the jobs in this pool process and leave Ctrl+C to the parent."""
+    global _jobs
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    preload()
+    _jobs = [JobProfile.from_job_data(data) for data in job_data]
+
+
+def _chunks(paths: Iterable[str], size: int) -> Iterator[List[str]]:
+    chunk = []
+    for path in paths:
+        chunk.append(path)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# ===================== CHECKPOINT =====================
+class Checkpoint:
+    """
+    SQLite file holding every row scored so far.
+
+    Rows of one resume are committed together, so an interrupted run resumes
+    with the first resume that has none. Ranking is done by SQLite when the
+    output is written, so a run never holds all of its results in memory.
+    """
+
+    def __init__(self, path: str, job_names: Sequence[str], job_digests: Sequence[str]):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            "CREATE TABLE IF NOT EXISTS jobs (job INTEGER PRIMARY KEY, name TEXT NOT NULL, digest TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS scores ("
+            " file TEXT NOT NULL, job INTEGER NOT NULL, final_match REAL NOT NULL, row TEXT NOT NULL,"
+            " PRIMARY KEY (file, job));"
+            "CREATE INDEX IF NOT EXISTS scores_rank ON scores (job, final_match DESC, file);"
+        )
+        stored = self.conn.execute("SELECT digest FROM jobs ORDER BY job").fetchall()
+        if stored and [row[0] for row in stored] != list(job_digests):
+            raise ValueError(f"{path} was written for other job descriptions; use --restart to discard it")
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO jobs (job, name, digest) VALUES (?, ?, ?)",
+                                  [(number, name, digest) for number, (name, digest)
+                                   in enumerate(zip(job_names, job_digests))])
+        self.job_names = list(job_names)
+
+    def done(self) -> Set[str]:
+        """Paths of every resume already scored."""
+        return {row[0] for row in self.conn.execute("SELECT DISTINCT file FROM scores")}
+
+    def record(self, scored: Sequence[Tuple[str, List[Dict[str, Any]]]]) -> None:
+        """Store the rows of several resumes in one transaction."""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO scores (file, job, final_match, row) VALUES (?, ?, ?, ?)",
+                [(path, number, row["final_match"], json.dumps(row))
+                 for path, rows in scored for number, row in enumerate(rows)]
+            )
+
+    def ranked(self, top: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Output rows, job by job, best first.
+
+        :param top: Rows per job (None for all).
+        :return: Iterator of rows with job and rank filled in.
+        """
+        for number, name in enumerate(self.job_names):
+            cursor = self.conn.execute(
+                "SELECT row FROM scores WHERE job = ? ORDER BY final_match DESC, file LIMIT ?",
+                (number, -1 if top is None else top)
+            )
+            for rank, (row,) in enumerate(cursor, start=1):
+                yield dict(json.loads(row), job=name, rank=rank)
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+# ===================== OUTPUT =====================
+def write_results(rows: Iterable[Dict[str, Any]], path: str, output_format: str) -> int:
+    """
+    Write ranked rows as JSON Lines, CSV or Parquet.
+
+    :param rows: Output rows.
+    :param path: Output file ('-' for stdout, JSONL and CSV only).
+    :param output_format: "jsonl", "csv" or "parquet".
+    :return: Number of rows written.
+    """
+    if output_format == "parquet":
+        return _write_parquet(rows, path)
+    out = sys.stdout if path == "-" else open(path, "w", encoding="utf-8", newline="")
+    count = 0
+    try:
+        if output_format == "csv":
+            writer = csv.DictWriter(out, FIELDS)
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(dict(row, matched_skills="; ".join(row["matched_skills"]),
+                                     missing_skills="; ".join(row["missing_skills"])))
+                count += 1
+        else:
+            for row in rows:
+                out.write(json.dumps({field: row[field] for field in FIELDS}) + "\n")
+                count += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return count
+
+
+def _write_parquet(rows: Iterable[Dict[str, Any]], path: str, batch_size: int = 10000) -> int:
+    # Optional dependency, only needed for Parquet output.
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("job", pa.string()), ("rank", pa.int64()), ("file", pa.string()), ("final_match", pa.float64()),
+        ("skill_match", pa.float64()), ("composite_score", pa.float64()), ("education_match", pa.string()),
+        ("match_percentage", pa.float64()), ("matched_skills", pa.list_(pa.string())),
+        ("missing_skills", pa.list_(pa.string())), ("total_skills", pa.int64()), ("error", pa.string()),
+    ])
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for batch in _chunks(rows, batch_size):
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            count += len(batch)
+    return count
+
+
+# ===================== PIPELINE =====================
+def run(paths: Sequence[str], jobs: Sequence[JobProfile], checkpoint: Checkpoint,
+        workers: int = DEFAULT_WORKERS, timeout: Optional[float] = DEFAULT_RESUME_TIMEOUT,
+        chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict[str, Any]:
+    """
+    Score every resume not in the checkpoint yet against every job.
+
+    :param paths: PDF paths.
+    :param jobs: Compiled job profiles.
+    :param checkpoint: Where scored rows are committed as they arrive.
+    :param workers: Worker processes (1 scores in this process).
+    :param timeout: Per-resume time budget in seconds.
+    :param chunk_size: Resumes per worker task.
+    :return: Counts of resumes skipped (already done), scored and failed, and the time taken.
+    """
+    done = checkpoint.done()
+    todo = [path for path in paths if path not in done]
+    stats = {"skipped": len(paths) - len(todo), "scored": 0, "failed": 0}
+    logger.info("%d resumes, %d already scored, %d to go against %d jobs",
+                len(paths), stats["skipped"], len(todo), len(jobs))
+    started = last_report = time.monotonic()
+
+    def record(scored: List[Tuple[str, List[Dict[str, Any]]]]) -> None:
+        nonlocal last_report
+        checkpoint.record(scored)
+        stats["scored"] += len(scored)
+        stats["failed"] += sum(1 for _, rows in scored if rows and rows[0]["error"])
+        now = time.monotonic()
+        if now - last_report >= PROGRESS_INTERVAL or stats["scored"] == len(todo):
+            last_report = now
+            rate = stats["scored"] / max(now - started, 1e-9)
+            eta = (len(todo) - stats["scored"]) / rate if rate else 0
+            logger.info("%d/%d resumes scored (%d failed), %.1f/s, ETA %.0fs",
+                        stats["scored"], len(todo), stats["failed"], rate, eta)
+
+    chunks = _chunks(todo, chunk_size)
+    if workers <= 1 or len(todo) <= chunk_size:
+        for chunk in chunks:
+            record(score_chunk(chunk, timeout, jobs))
+    else:
+        # Load the model before forking so every worker shares it copy-on-write.
+        preload()
+        window = workers * CHUNKS_PER_WORKER
+        with multiprocessing.Pool(workers, initializer=_init_worker,
+                                  initargs=([job.job_data for job in jobs],)) as pool:
+            in_flight = []
+            for chunk in chunks:
+                in_flight.append(pool.apply_async(score_chunk, (chunk, timeout)))
+                if len(in_flight) >= window:
+                    record(in_flight.pop(0).get())
+            for result in in_flight:
+                record(result.get())
+    stats["seconds"] = round(time.monotonic() - started, 3)
+    return stats
+
+
+# ===================== CLI =====================
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Score a directory of resume PDFs against job descriptions and write ranked results.")
+    parser.add_argument("inputs", nargs="+", help="Directories (searched recursively), globs or PDF files.")
+    parser.add_argument("-j", "--job", action="append", required=True, metavar="FILE",
+                        help="Text file with a job description (repeat for several jobs).")
+    parser.add_argument("-o", "--output", required=True,
+                        help="Output file: .jsonl, .csv or .parquet (or '-' for JSONL on stdout).")
+    parser.add_argument("--format", choices=sorted(set(FORMATS.values())),
+                        help="Output format (defaults to the output file's extension).")
+    parser.add_argument("--checkpoint", help="Checkpoint database (default: OUTPUT.checkpoint.sqlite3).")
+    parser.add_argument("--restart", action="store_true", help="Discard the checkpoint and score everything again.")
+    parser.add_argument("--top", type=int, help="Only write the best N resumes per job.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Worker processes.")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_RESUME_TIMEOUT, help="Per-resume timeout (s).")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Resumes per worker task.")
+    args = parser.parse_args(argv)
+
+    output_format = args.format or FORMATS.get(os.path.splitext(args.output)[1].lower(), "jsonl")
+    if output_format == "parquet" and args.output == "-":
+        parser.error("Parquet output needs a file name")
+    if output_format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            parser.error("Parquet output needs pyarrow (pip install pyarrow)")
+
+    configure_logging()
+    jobs = []
+    for job_file in args.job:
+        with open(job_file, encoding="utf-8") as f:
+            jobs.append(compile_job_profile(f.read()))
+    job_names = [os.path.splitext(os.path.basename(job_file))[0] for job_file in args.job]
+
+    checkpoint_path = args.checkpoint or (
+        ("offline_scores" if args.output == "-" else args.output) + ".checkpoint.sqlite3")
+    if args.restart:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(checkpoint_path + suffix):
+                os.remove(checkpoint_path + suffix)
+    try:
+        checkpoint = Checkpoint(checkpoint_path, job_names, [job.digest for job in jobs])
+    except ValueError as e:
+        parser.error(str(e))
+
+    try:
+        paths = list(iter_resume_paths(args.inputs))
+        stats = run(paths, jobs, checkpoint, args.workers, args.timeout, args.chunk_size)
+        written = write_results(checkpoint.ranked(args.top), args.output, output_format)
+    finally:
+        checkpoint.close()
+    logger.info("Scored %d resumes (%d failed, %d from the checkpoint) in %.1fs; wrote %d rows to %s",
+                stats["scored"], stats["failed"], stats["skipped"], stats["seconds"], written, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
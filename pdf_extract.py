@@ -0,0 +1,187 @@
+import io
+import logging
+import os
+import sys
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import fitz
+from pdfminer.high_level import extract_pages
+from pdfminer.layout import LTTextContainer
+from PyPDF2 import PdfReader
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever a change here alters the extracted text (invalidates cached text).
+EXTRACTION_VERSION = "2"
+
+# ===================== EXTRACTION LIMITS =====================
+# Pages read from one document (0 = no limit); resumes rarely need more than a few.
+MAX_PAGES = int(os.environ.get("PDF_MAX_PAGES", 20))
+# Characters kept from one document (0 = no limit); extraction stops once reached.
+MAX_CHARS = int(os.environ.get("PDF_MAX_CHARS", 100000))
+# Seconds each extractor may spend on one document before the next one takes over.
+EXTRACTOR_TIMEOUT = float(os.environ.get("PDF_EXTRACTOR_TIMEOUT", 10))
+
+# A file path or the raw bytes of a PDF.
+PdfSource = Union[str, bytes]
+
+
+class PdfExtractionError(Exception):
+    """Raised when no extractor could read a single page of the document."""
+
+
+# ===================== PAGE STREAMS =====================
+# Each extractor streams (text, recoverable) per page starting at a given page
+# number, lazily, so the chain can stop reading or hand over to another
+# extractor at any page. `recoverable` flags a blank page that may still hold
+# text another extractor could read.
+def _as_file(source: PdfSource):
+    return io.BytesIO(source) if isinstance(source, bytes) else source
+
+
+def _pymupdf_pages(source: PdfSource, start: int) -> Iterator[Tuple[str, bool]]:
+    if isinstance(source, bytes):
+        doc = fitz.open(stream=source, filetype="pdf")
+    else:
+        doc = fitz.open(source)
+    with doc:
+        for number in range(start, doc.page_count):
+            page = doc[number]
+            text = page.get_text()
+            # A blank page without fonts is empty or scanned: no text extractor can help.
+            yield text, not text.strip() and bool(page.get_fonts())
+
+
+def _pdfminer_pages(source: PdfSource, start: int) -> Iterator[Tuple[str, bool]]:
+    for layout in extract_pages(_as_file(source), page_numbers=range(start, sys.maxsize)):
+        text = "".join(element.get_text() for element in layout if isinstance(element, LTTextContainer))
+        yield text, not text.strip()
+
+
+def _pypdf2_pages(source: PdfSource, start: int) -> Iterator[Tuple[str, bool]]:
+    reader = PdfReader(_as_file(source))
+    for number in range(start, len(reader.pages)):
+        text = reader.pages[number].extract_text() or ""
+        yield text, not text.strip()
+
+
+# Extractors in order of preference: fastest and most faithful first.
+EXTRACTORS: List[Tuple[str, Callable[[PdfSource, int], Iterator[Tuple[str, bool]]]]] = [
+    ("pymupdf", _pymupdf_pages),
+    ("pdfminer", _pdfminer_pages),
+    ("pypdf2", _pypdf2_pages),
+]
+
+
+# ===================== STREAMING EXTRACTION =====================
+def iter_pdf_pages(source: PdfSource, max_pages: int = MAX_PAGES, max_chars: int = MAX_CHARS,
+                   timeout: float = EXTRACTOR_TIMEOUT) -> Iterator[str]:
+    """
+    Yield the text of a PDF page by page, stopping early at the page or character limit.
+
+    Pages are read with PyMuPDF. A page that comes back blank although it uses
+    fonts (text PyMuPDF could not decode) is retried with the later extractors
+    on that page only; empty and scanned pages are passed through as they are.
+    If an extractor fails or uses up its time budget, the remaining pages are
+    streamed by the next one, so no page is decoded twice by the same
+    extractor. Budgets are checked between pages; a single page stuck inside a
+    C extension is bounded by the batch worker's per-resume timeout instead.
+
+    :param source: File path or PDF bytes.
+    :param max_pages: Maximum pages to read (0 = no limit).
+    :param max_chars: Maximum characters to yield in total (0 = no limit).
+    :param timeout: Seconds each extractor may spend on this document.
+    :return: Iterator of page texts.
+    :raises PdfExtractionError: If every extractor failed before producing a page.
+    """
+    budgets: Dict[str, float] = {name: timeout for name, _ in EXTRACTORS}
+    errors: List[str] = []
+    number = 0
+    chars = 0
+    for position, (name, pages) in enumerate(EXTRACTORS):
+        fallbacks = EXTRACTORS[position + 1:]
+        stream = pages(source, number)
+        try:
+            while not max_pages or number < max_pages:
+                started = time.monotonic()
+                try:
+                    text, recoverable = next(stream)
+                except StopIteration:
+                    return
+                finally:
+                    elapsed = time.monotonic() - started
+                    budgets[name] -= elapsed
+                    metrics.PDF_PAGE_SECONDS.observe(elapsed, name)
+
+                if recoverable:
+                    text = _fallback_page(source, number, text, fallbacks, budgets)
+
+                if max_chars and chars + len(text) >= max_chars:
+                    logger.info("Stopping PDF extraction at page %d: %d character limit", number + 1, max_chars)
+                    yield text[:max_chars - chars]
+                    return
+                chars += len(text)
+                yield text
+                number += 1
+
+                if timeout and budgets[name] <= 0:
+                    logger.warning("%s exceeded its %gs budget at page %d; switching extractor", name, timeout, number)
+                    break
+            else:
+                logger.info("Stopping PDF extraction after the %d page limit", max_pages)
+                return
+        except Exception as e:
+            logger.warning("%s failed at page %d: %s", name, number + 1, e)
+            errors.append(f"{name}: {e}")
+        finally:
+            stream.close()
+
+    if number == 0 and errors:
+        raise PdfExtractionError("; ".join(errors))
+
+
+def _fallback_page(source: PdfSource, number: int, text: str,
+                   fallbacks: Sequence[Tuple[str, Callable[[PdfSource, int], Iterator[Tuple[str, bool]]]]],
+                   budgets: Dict[str, float]) -> str:
+    """Retry one blank page with the remaining extractors; keep the blank text if none does better."""
+    for name, pages in fallbacks:
+        if budgets[name] <= 0:
+            continue
+        started = time.monotonic()
+        stream = pages(source, number)
+        try:
+            candidate, _ = next(stream, ("", False))
+        except Exception as e:
+            logger.debug("%s could not read page %d: %s", name, number + 1, e)
+            candidate = ""
+        finally:
+            stream.close()
+            elapsed = time.monotonic() - started
+            budgets[name] -= elapsed
+            metrics.PDF_PAGE_SECONDS.observe(elapsed, name)
+        if candidate.strip():
+            return candidate
+    return text
+
+
+# ===================== PDF TEXT EXTRACTION =====================
+@metrics.timed("parse_pdf")
+def parse_pdf(source: PdfSource, max_pages: Optional[int] = None, max_chars: Optional[int] = None) -> str:
+    """
+    Extract text from a PDF with the streaming extractor chain.
+
+    :param source: File path or PDF bytes.
+    :param max_pages: Page limit (defaults to MAX_PAGES).
+    :param max_chars: Character limit (defaults to MAX_CHARS).
+    :return: The extracted text, or a string starting with "Error:" if nothing could be read.
+    """
+    max_pages = MAX_PAGES if max_pages is None else max_pages
+    max_chars = MAX_CHARS if max_chars is None else max_chars
+    try:
+        return "".join(iter_pdf_pages(source, max_pages, max_chars)).strip()
+    except PdfExtractionError as e:
+        metrics.ERRORS.inc("parse_pdf")
+        return f"Error: Failed to extract text - {str(e)}"
@@ -0,0 +1,262 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import threading
+from typing import Dict, Iterable, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# ===================== RELEVANCE CONFIGURATION =====================
+# Token frequencies the IDF weights are derived from (shipped with the repository).
+TOKEN_DIST_PATH = os.environ.get("RELEVANCE_TOKEN_DIST",
+                                  os.path.join(os.path.dirname(os.path.abspath(__file__)), "token_dist.json"))
+# Skill names whose token hashes are kept; the taxonomy is far smaller, so this only bounds odd inputs.
+TERM_CACHE_SIZE = 4096
+
+# Lowercase word tokens, keeping the "+" and "#" of names like C++ and C#.
+_TOKEN = re.compile(r"[a-z0-9][a-z0-9+#]*")
+
+
+class SparseVector(NamedTuple):
+    """An L2-normalized TF-IDF vector: token hashes (sorted, unique) and their weights."""
+    ids: np.ndarray
+    values: np.ndarray
+
+
+class SparseMatrix(NamedTuple):
+    """TF-IDF vectors of several documents in CSR layout (row i is data[indptr[i]:indptr[i + 1]])."""
+    indptr: np.ndarray
+    indices: np.ndarray
+    data: np.ndarray
+
+
+def token_hash(token: str) -> int:
+    """Stable 64-bit id of a token (the same in every process, unlike hash())."""
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+# ===================== TF-IDF MODEL =====================
+class RelevanceModel:
+    """
+    IDF weights over skill-name tokens, from a token -> frequency distribution.
+
+    Tokens are identified by a 64-bit hash, so the model is two sorted NumPy
+    arrays (hashes and IDF values) instead of a dictionary of Python strings,
+    and a token that is not in the distribution needs no id of its own: it is
+    weighted as the rarest token. The IDF of a token with frequency df is
+    log((1 + N) / (1 + df)) + 1, where N is the highest frequency, so the most
+    common token ("certify") weighs 1 and an unknown one log(1 + N) + 1.
+
+    Documents (a resume's skills, a job's required skills) become sparse
+    TF-IDF vectors; their cosine similarity rewards sharing rare skills
+    ("kubernetes") more than sharing common ones ("communication").
+    """
+
+    def __init__(self, token_dist: Dict[str, int]):
+        """
+        :param token_dist: Token -> frequency.
+        """
+        hashes = np.fromiter((token_hash(token) for token in token_dist), dtype=np.uint64, count=len(token_dist))
+        counts = np.fromiter(token_dist.values(), dtype=np.float64, count=len(token_dist))
+        order = np.argsort(hashes)
+        self.hashes = hashes[order]
+        if len(self.hashes) > 1 and not np.all(self.hashes[1:] != self.hashes[:-1]):
+            raise ValueError("Token hash collision in the token distribution")
+        top = counts.max() if len(counts) else 0.0
+        self.idf = (np.log((1 + top) / (1 + counts[order])) + 1).astype(np.float32)
+        self.unknown_idf = math.log(1 + top) + 1
+        self._terms: Dict[str, Tuple[Tuple[int, float], ...]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str = TOKEN_DIST_PATH) -> "RelevanceModel":
+        """
+        Build the model from a JSON token distribution.
+
+        :param path: JSON file mapping token to frequency.
+        :return: The model.
+        """
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def idf_of(self, token_id: int) -> Optional[float]:
+        """IDF of a token hash, or None if the token is not in the distribution."""
+        position = int(np.searchsorted(self.hashes, np.uint64(token_id)))
+        if position < len(self.hashes) and self.hashes[position] == token_id:
+            return float(self.idf[position])
+        return None
+
+    def term_weights(self, term: str) -> Tuple[Tuple[int, float], ...]:
+        """
+        (token hash, IDF) of each token of one skill name.
+
+        A plural token missing from the distribution falls back to its singular
+        ("skills" -> "skill"). Results are cached per name, so scoring a resume
+        costs a few dictionary lookups per skill.
+
+        :param term: Skill name, any case.
+        :return: One pair per token (repeats kept).
+        """
+        pairs = self._terms.get(term)
+        if pairs is not None:
+            return pairs
+        values = []
+        for token in _TOKEN.findall(term.lower()):
+            token_id = token_hash(token)
+            idf = self.idf_of(token_id)
+            if idf is None and token.endswith("s"):
+                singular_id = token_hash(token[:-1])
+                singular_idf = self.idf_of(singular_id)
+                if singular_idf is not None:
+                    token_id, idf = singular_id, singular_idf
+            values.append((token_id, self.unknown_idf if idf is None else idf))
+        pairs = tuple(values)
+        with self._lock:
+            if len(self._terms) >= TERM_CACHE_SIZE:
+                self._terms.clear()
+            self._terms[term] = pairs
+        return pairs
+
+    def weights(self, terms: Iterable[str]) -> Dict[int, float]:
+        """
+        Unnormalized TF-IDF weights of a document given as skill names.
+
+        :param terms: Skill names; each name's tokens are counted once per name.
+        :return: Token hash -> term frequency x IDF.
+        """
+        weights: Dict[int, float] = {}
+        for term in terms:
+            for token_id, idf in self.term_weights(term):
+                weights[token_id] = weights.get(token_id, 0.0) + idf
+        return weights
+
+    def vector(self, terms: Iterable[str]) -> SparseVector:
+        """
+        TF-IDF vector of a document given as skill names.
+
+        :param terms: Skill names; each name's tokens are counted once per name.
+        :return: The L2-normalized vector (empty if the names have no tokens).
+        """
+        weights = self.weights(terms)
+        ids = np.fromiter(sorted(weights), dtype=np.uint64, count=len(weights))
+        values = np.fromiter((weights[token_id] for token_id in ids.tolist()), dtype=np.float64, count=len(weights))
+        norm = np.sqrt(np.dot(values, values))
+        return SparseVector(ids, values / norm if norm else values)
+
+    def matrix(self, documents: Sequence[Iterable[str]]) -> SparseMatrix:
+        """
+        TF-IDF vectors of many documents, stacked as a CSR matrix.
+
+        :param documents: One list of skill names per document.
+        :return: The matrix, one row per document.
+        """
+        vectors = [self.vector(terms) for terms in documents]
+        indptr = np.zeros(len(vectors) + 1, dtype=np.int64)
+        np.cumsum([len(v.ids) for v in vectors], out=indptr[1:])
+        if not vectors:
+            return SparseMatrix(indptr, np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.float64))
+        return SparseMatrix(indptr, np.concatenate([v.ids for v in vectors]),
+                            np.concatenate([v.values for v in vectors]))
+
+    def similarity(self, terms: Iterable[str], vector: SparseVector) -> float:
+        """
+        Cosine similarity of a document given as skill names with a vector.
+
+        Same value as the cosine of self.vector(terms) and vector, without building
+        the document's arrays: the per-resume path when one job is scored against
+        resumes one at a time.
+
+        :param terms: Skill names of the document.
+        :param vector: Normalized vector (e.g. a job's).
+        :return: Similarity from 0 to 1.
+        """
+        weights = self.weights(terms)
+        norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+        if not norm or not len(vector.ids):
+            return 0.0
+        other = dict(zip(vector.ids.tolist(), vector.values.tolist()))
+        dot = sum(weight * other.get(token_id, 0.0) for token_id, weight in weights.items())
+        return min(dot / norm, 1.0)
+
+
+# ===================== SIMILARITY =====================
+def cosine_batch(matrix: SparseMatrix, vector: SparseVector) -> np.ndarray:
+    """
+    Cosine similarity of every row of a CSR matrix with one vector (a sparse matrix-vector product).
+
+    :param matrix: Normalized document vectors.
+    :param vector: Normalized query vector (e.g. a job).
+    :return: One similarity per row.
+    """
+    rows = len(matrix.indptr) - 1
+    if not len(vector.ids) or not len(matrix.indices):
+        return np.zeros(rows)
+    positions = np.minimum(np.searchsorted(vector.ids, matrix.indices), len(vector.ids) - 1)
+    products = np.where(vector.ids[positions] == matrix.indices, matrix.data * vector.values[positions], 0.0)
+    row_of = np.repeat(np.arange(rows), np.diff(matrix.indptr))
+    return np.minimum(np.bincount(row_of, weights=products, minlength=rows), 1.0)
+
+
+# ===================== SHARED MODEL =====================
+_model: Optional[RelevanceModel] = None
+_model_lock = threading.Lock()
+
+
+def get_relevance_model() -> RelevanceModel:
+    """
+    Return the shared model, loading token_dist.json on first use.
+
+    :return: The model used by analyze_match and the compiled jobs.
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _model = RelevanceModel.load()
+                logger.info("Loaded %d token weights from %s", len(_model.hashes), TOKEN_DIST_PATH)
+    return _model
+
+
+def relevance_score(resume_skills: Iterable[str], job_vector: SparseVector) -> float:
+    """
+    Relevance of a resume to a job: the cosine similarity of their TF-IDF vectors.
+
+    Like the skill match, it is 1 when the job lists no skills.
+
+    :param resume_skills: Skill names found on the resume.
+    :param job_vector: Vector of the job's required skills.
+    :return: Relevance from 0 to 1.
+    """
+    return get_relevance_model().similarity(resume_skills, job_vector) if len(job_vector.ids) else 1.0
+
+
+def skill_relevance(resume_skills: Iterable[str], job_skills: Iterable[str]) -> float:
+    """
+    relevance_score of a resume's skills and a job's required skills.
+
+    :param resume_skills: Skill names found on the resume.
+    :param job_skills: Skill names the job requires.
+    :return: Relevance from 0 to 1.
+    """
+    return relevance_score(resume_skills, get_relevance_model().vector(job_skills))
+
+
+def relevance_matrix(resumes: Sequence[Iterable[str]], jobs: Sequence[SparseVector]) -> np.ndarray:
+    """
+    relevance_score of every resume with every job, one sparse product per job.
+
+    :param resumes: Skill names of each resume.
+    :param jobs: Job vectors (RelevanceModel.vector of their required skills).
+    :return: N x M array.
+    """
+    matrix = get_relevance_model().matrix(resumes)
+    scores = np.ones((len(resumes), len(jobs)))
+    for column, job_vector in enumerate(jobs):
+        if len(job_vector.ids):
+            scores[:, column] = cosine_batch(matrix, job_vector)
+    return scores
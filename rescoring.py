@@ -0,0 +1,253 @@
+import argparse
+import logging
+import os
+import time
+from typing import TYPE_CHECKING, Any, Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+from analysis_cache import CACHE, AnalysisCache, fingerprint
+from data_base import SKILLS_DB
+from job import JobProfile
+from log_config import configure_logging
+from nlp_engine import make_doc
+from resume_analysis import analysis_from_artifacts
+from skill_matcher import SkillIndex, build_skill_index, doc_tokens, get_skill_index
+
+if TYPE_CHECKING:
+    from task_queue import TaskQueue
+
+logger = logging.getLogger(__name__)
+
+# ===================== RESCORING CONFIGURATION =====================
+# Keep per-resume artifacts (tokens, matched skill variations, parsed sections) in the
+# analysis cache so taxonomy edits are applied without re-parsing; set RESCORING_ARTIFACTS=0 to skip.
+STORE_ARTIFACTS = os.environ.get("RESCORING_ARTIFACTS", "1") != "0"
+# Identity of the SKILLS_DB this process matches against.
+TAXONOMY_FINGERPRINT = fingerprint(SKILLS_DB)
+
+_taxonomy_stored = False
+
+
+# ===================== ARTIFACT STORAGE =====================
+def store_artifacts(digest: str, artifacts: Dict[str, Any], cache: AnalysisCache = CACHE) -> None:
+    """
+    Keep the artifacts of one analyzed resume, tagged with the taxonomy they were matched against.
+
+    :param digest: Content digest of the resume.
+    :param artifacts: Output of extract_artifacts.
+    :param cache: Cache to store them in.
+    """
+    global _taxonomy_stored
+    if not STORE_ARTIFACTS:
+        return
+    if not _taxonomy_stored:
+        # The snapshot is what a later refresh diffs the edited taxonomy against.
+        cache.put("taxonomy", TAXONOMY_FINGERPRINT, SKILLS_DB)
+        _taxonomy_stored = True
+    cache.put("artifacts", digest, dict(artifacts, taxonomy=TAXONOMY_FINGERPRINT))
+
+
+# ===================== TAXONOMY DIFF =====================
+class TaxonomyDiff(NamedTuple):
+    """Lowercase skill variations that differ between two versions of SKILLS_DB."""
+    added: FrozenSet[str]
+    removed: FrozenSet[str]
+    # Variations in both versions whose canonical skill changed.
+    remapped: FrozenSet[str]
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.remapped)
+
+
+def variation_mapping(skills_db: Dict[str, List[str]]) -> Dict[str, str]:
+    """Lowercase variation -> canonical skill, built like resume_analysis.SKILL_MAPPING."""
+    return {
+        variation.lower(): canonical
+        for canonical, variations in skills_db.items()
+        for variation in variations
+    }
+
+
+def diff_taxonomies(old_db: Dict[str, List[str]], new_db: Dict[str, List[str]]) -> TaxonomyDiff:
+    """
+    Variations added, removed or mapped to another skill between two taxonomies.
+
+    :param old_db: Taxonomy the stored artifacts were matched against.
+    :param new_db: Current taxonomy.
+    :return: The differences.
+    """
+    old, new = variation_mapping(old_db), variation_mapping(new_db)
+    return TaxonomyDiff(
+        added=frozenset(new.keys() - old.keys()),
+        removed=frozenset(old.keys() - new.keys()),
+        remapped=frozenset(v for v in old.keys() & new.keys() if old[v] != new[v]),
+    )
+
+
+class _Plan(NamedTuple):
+    # None means the old taxonomy is unknown and every stored token list is matched again.
+    diff: Optional[TaxonomyDiff]
+    index: SkillIndex
+
+
+def _plan_for(old_fingerprint: Optional[str], cache: AnalysisCache) -> _Plan:
+    """How to bring artifacts matched against one old taxonomy up to date."""
+    old_db = cache.get("taxonomy", old_fingerprint) if old_fingerprint else None
+    if old_db is None:
+        logger.info("Taxonomy %s is not stored; re-matching its resumes in full", old_fingerprint)
+        return _Plan(None, get_skill_index())
+    diff = diff_taxonomies(old_db, SKILLS_DB)
+    logger.info("Taxonomy %s -> %s: %d variations added, %d removed, %d remapped",
+                old_fingerprint, TAXONOMY_FINGERPRINT, len(diff.added), len(diff.removed), len(diff.remapped))
+    # Only the added variations have to be looked for in the stored tokens.
+    index = build_skill_index({"added": sorted(diff.added)}) if diff.added else SkillIndex([], str.split)
+    return _Plan(diff, index)
+
+
+def rematch_artifacts(artifacts: Dict[str, Any], plan: _Plan) -> Tuple[Dict[str, Any], bool]:
+    """
+    Update the matched variations of stored artifacts for the current taxonomy.
+
+    :param artifacts: Stored artifacts.
+    :param plan: Diff and index for the taxonomy they were matched against.
+    :return: (updated artifacts, whether the resume's skills may have changed).
+    """
+    updated = dict(artifacts, taxonomy=TAXONOMY_FINGERPRINT)
+    affected = plan.diff is None
+    for variations_key, tokens_key in (("variations", "tokens"), ("section_variations", "section_tokens")):
+        old = set(artifacts[variations_key])
+        if plan.diff is None:
+            new = {variation for _, _, variation in plan.index.iter_matches(artifacts[tokens_key])}
+        else:
+            new = old - plan.diff.removed
+            if plan.diff.added:
+                new.update(variation for _, _, variation in plan.index.iter_matches(artifacts[tokens_key]))
+            affected = affected or new != old or bool(old & plan.diff.remapped)
+        updated[variations_key] = sorted(new)
+    return updated, affected
+
+
+def refresh_artifacts(cache: AnalysisCache = CACHE) -> Dict[str, Any]:
+    """
+    Rebuild the cached analyses of every stored resume for the current SKILLS_DB.
+
+    Resumes matched against an older taxonomy are re-matched on their stored
+    tokens, looking only for the variations that were added; resumes the diff
+    cannot affect are re-tagged without any matching. No PDF is read, and only
+    near-duplicates (stored without full-text tokens) are tokenized, from their
+    cached text.
+
+    :param cache: Cache holding the artifacts.
+    :return: Counts of resumes seen, re-matched, affected, unchanged and skipped (near-duplicates
+             whose text is no longer cached), and the time taken.
+    """
+    started = time.perf_counter()
+    stats = {"resumes": 0, "rematched": 0, "affected": 0, "unchanged": 0, "full_rematch": 0, "skipped": 0}
+    plans: Dict[Optional[str], _Plan] = {}
+    for digest, artifacts in cache.iter_entries("artifacts"):
+        stats["resumes"] += 1
+        old_fingerprint = artifacts.get("taxonomy")
+        if old_fingerprint == TAXONOMY_FINGERPRINT:
+            # Already current; only make sure its analysis is cached under the current version.
+            if cache.get("analysis", digest) is None:
+                cache.put("analysis", digest, analysis_from_artifacts(artifacts))
+            stats["unchanged"] += 1
+            continue
+        if "tokens" not in artifacts:
+            # Artifacts diffed from a near-duplicate (see dedup.reuse_near_duplicate) keep no full-text tokens.
+            text = cache.get("text", digest)
+            if text is None:
+                stats["skipped"] += 1
+                continue
+            artifacts = dict(artifacts, tokens=doc_tokens(make_doc(text.lower())))
+        if old_fingerprint not in plans:
+            plans[old_fingerprint] = _plan_for(old_fingerprint, cache)
+        plan = plans[old_fingerprint]
+        artifacts, affected = rematch_artifacts(artifacts, plan)
+        stats["rematched"] += 1
+        stats["full_rematch"] += plan.diff is None
+        stats["affected" if affected else "unchanged"] += 1
+        cache.put("artifacts", digest, artifacts)
+        cache.put("analysis", digest, analysis_from_artifacts(artifacts))
+    if stats["rematched"]:
+        cache.put("taxonomy", TAXONOMY_FINGERPRINT, SKILLS_DB)
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    return stats
+
+
+# ===================== WEIGHT RESCORING =====================
+def rescore_result(result: Dict[str, Any], job: JobProfile) -> Optional[Dict[str, Any]]:
+    """
+    Recompute the scores of one stored result with the current weights.
+
+    Only the analyze_match arithmetic runs again; the stored analysis is reused.
+
+    :param result: A /compare-multiple result entry.
+    :param job: The job it was scored against.
+    :return: The updated entry, or None if its scores did not change (or it is an error entry).
+    """
+    analysis = result.get("analysis")
+    if analysis is None:
+        return None
+    match_result = job.match(analysis)
+    if match_result == result.get("match_result"):
+        return None
+    return dict(result, match_result=match_result)
+
+
+def rescore_job(task_queue: "TaskQueue", job_id: str) -> Optional[int]:
+    """
+    Bring the stored results of a finished queue job up to date with the current weights.
+
+    :param task_queue: Queue holding the job.
+    :param job_id: Id of the job.
+    :return: Number of results whose scores changed, or None if the job does not exist.
+    """
+    status = task_queue.status(job_id, include_results=False)
+    if status is None:
+        return None
+    job = JobProfile.from_job_data(status["job_data"], status["job_digest"])
+    return task_queue.rewrite_results(job_id, lambda result: rescore_result(result, job))
+
+
+# ===================== CLI =====================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Re-score stored resumes after the skills taxonomy or the score weights change.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("taxonomy", help="Re-match stored artifacts against the current SKILLS_DB, "
+                                           "re-index them in the candidate index and re-score stored results.")
+    weights_parser = subparsers.add_parser("weights", help="Re-score finished queue jobs and stored results with "
+                                                           "the current SCORE_SKILL_BOOST, "
+                                                           "SCORE_COMPOSITE_THRESHOLD and SCORE_RELEVANCE_WEIGHT.")
+    weights_parser.add_argument("job_ids", nargs="*", help="Jobs to re-score (default: every finished job).")
+    weights_parser.add_argument("--queue", help="Queue database path (default: TASK_QUEUE_PATH).")
+    args = parser.parse_args()
+
+    configure_logging()
+    if args.command == "taxonomy":
+        from candidate_index import CANDIDATE_INDEX
+
+        from storage import RESULT_STORE
+
+        stats = refresh_artifacts()
+        print(f"{stats['resumes']} resumes: {stats['rematched']} re-matched ({stats['full_rematch']} in full), "
+              f"{stats['affected']} affected, {stats['unchanged']} unchanged, {stats['skipped']} skipped "
+              f"in {stats['seconds']}s")
+        print(f"Indexed {CANDIDATE_INDEX.sync_from_cache()} resumes")
+        print(f"{RESULT_STORE.rescore_matches()} stored match results re-scored")
+    else:
+        from storage import RESULT_STORE
+        from task_queue import TaskQueue
+
+        task_queue = TaskQueue(args.queue) if args.queue else TaskQueue()
+        started = time.perf_counter()
+        job_digests = []
+        for job_id in args.job_ids or task_queue.finished_jobs():
+            changed = rescore_job(task_queue, job_id)
+            print(f"{job_id}: " + ("not found" if changed is None else f"{changed} results re-scored"))
+            if changed is not None:
+                job_digests.append(task_queue.status(job_id, include_results=False)["job_digest"])
+        # Without job ids, every job in the result store (including /compare-multiple batches).
+        changed = RESULT_STORE.rescore_matches(job_digests if args.job_ids else None)
+        print(f"{changed} stored match results re-scored")
+        print(f"Done in {time.perf_counter() - started:.3f}s")
@@ -1,18 +1,20 @@
+import os
 import re
-import logging
 from collections import defaultdict
-from typing import List, Dict, Any, Set
+from difflib import SequenceMatcher
+from typing import TYPE_CHECKING, AbstractSet, Iterable, List, Dict, Any, NamedTuple, Optional, Set, Tuple, Union
 
-import spacy
-from spacy.matcher import PhraseMatcher
+import metrics
 from data_base import SKILLS_DB
+from nlp_engine import make_doc
+from relevance import skill_relevance
+from skill_matcher import SKILL_VOCABULARY, doc_tokens, get_skill_index, popcount
 
-# Configure logging (for production, configure appropriately)
-logging.basicConfig(level=logging.INFO)
+if TYPE_CHECKING:
+    from spacy.tokens import Doc
 
 # ===================== INITIAL SETUP =====================
-# Load the spaCy model once.
-nlp = spacy.load("en_core_web_sm")
+# The spaCy model is shared with job.py through nlp_engine and loaded on first use.
 
 # Build a mapping of all skill variations (lowercase) to their canonical name.
 SKILL_MAPPING: Dict[str, str] = {
@@ -21,10 +23,8 @@ SKILL_MAPPING: Dict[str, str] = {
     for variation in variations
 }
 
-# Create PhraseMatcher patterns for skills.
-SKILL_PATTERNS = [nlp.make_doc(variation) for variants in SKILLS_DB.values() for variation in variants]
-SKILL_MATCHER = PhraseMatcher(nlp.vocab, attr="LOWER")
-SKILL_MATCHER.add("SKILL", SKILL_PATTERNS)
+# Bump whenever a change here alters analyze_resume output (invalidates cached analyses).
+ANALYSIS_VERSION = "2"
 
 # ===================== DEGREE & EDUCATION CONSTANTS =====================
 # Degree hierarchy: lower index means a higher qualification.
@@ -32,6 +32,8 @@ DEGREE_HIERARCHY: List[str] = [
     "PhD", "Doctorate", "MD", "JD", "Master", "MBA", "MSc", "MA",
     "BSc", "BA", "BEng", "Bachelor", "Associate", "Diploma", "Certificate"
 ]
+# Position of each degree in the hierarchy, for constant-time level lookups.
+DEGREE_LEVELS: Dict[str, int] = {degree: level for level, degree in enumerate(DEGREE_HIERARCHY)}
 # Compile a regex pattern to match any degree from the hierarchy (case-insensitive).
 DEGREE_PATTERN = re.compile(r'(?i)\b(?:' + '|'.join(DEGREE_HIERARCHY) + r')\b')
 
@@ -42,9 +44,12 @@ DEGREE_MAPPING: Dict[str, str] = {
     'phd': 'PhD', 'doctorate': 'PhD', 'beng': 'Bachelor', 'meng': 'Master'
 }
 
-# Skill boost factor and composite threshold.
-SKILL_BOOST = 1.1  # 10% boost (previous comment said 30%; please adjust if needed)
-COMPOSITE_THRESHOLD = 80.0
+# Skill boost factor and composite threshold; SCORE_SKILL_BOOST and SCORE_COMPOSITE_THRESHOLD override them
+# (queued job results and the result store are brought up to date with `python rescoring.py weights`).
+SKILL_BOOST = float(os.environ.get("SCORE_SKILL_BOOST", 1.1))  # 10% boost (previous comment said 30%; please adjust if needed)
+COMPOSITE_THRESHOLD = float(os.environ.get("SCORE_COMPOSITE_THRESHOLD", 80.0))
+# Share of the composite score given to the TF-IDF relevance of the skills (relevance.py); 0 leaves it out.
+RELEVANCE_WEIGHT = float(os.environ.get("SCORE_RELEVANCE_WEIGHT", 0.0))
 
 
 # ===================== JOB SKILLS EXTRACTION =====================
@@ -55,23 +60,15 @@ def extract_job_skills(job_text: str) -> List[str]:
     :param job_text: The job description text.
     :return: A list of detected skill names.
     """
-    job_skills: Set[str] = set()
-    # Lowercase the job text for case-insensitive matching.
-    doc = nlp(job_text.lower())
+    job_text_lower = job_text.lower()
+    # Lowercase the job text for case-insensitive matching (tokenizer only).
+    doc = make_doc(job_text_lower)
 
-    # Match skills token-by-token using the mapping.
-    for token in doc:
-        if token.text in SKILL_MAPPING:
-            job_skills.add(SKILL_MAPPING[token.text])
-
-    # Check for multi-word skills (e.g., "machine learning")
-    for skill, variations in SKILLS_DB.items():
-        for variation in variations:
-            if variation.lower() in job_text.lower():
-                job_skills.add(skill)
+    # Single pass over the tokens matches single- and multi-word skills (e.g., "machine learning").
+    job_skills: Set[str] = {SKILL_MAPPING[variation] for variation in get_skill_index().find(doc)}
 
     # --- AUTOMATIC ENGLISH REQUIREMENT ---
-    if "english" in job_text.lower():
+    if "english" in job_text_lower:
         job_skills.add("English")
 
     return list(job_skills)
@@ -86,18 +83,127 @@ def compare_skills(resume_skills: List[str], job_skills: List[str]) -> Dict[str,
     :param job_skills: List of required job skills.
     :return: Dictionary with match percentage, matched skills, and missing skills.
     """
-    resume_set = {skill.lower() for skill in resume_skills}
-    job_set = {skill.lower() for skill in job_skills}
-    match_percentage = (len(resume_set & job_set) / len(job_set)) * 100 if job_set else 0
+    return compare_skill_masks(SKILL_VOCABULARY.mask(resume_skills), SKILL_VOCABULARY.mask(job_skills))
+
+
+def compare_skill_sets(resume_set: AbstractSet[str], job_set: AbstractSet[str]) -> Dict[str, Any]:
+    """
+    compare_skills on skill sets that are already lowercased.
+
+    :param resume_set: Lowercase resume skills.
+    :param job_set: Lowercase required job skills.
+    :return: Dictionary with match percentage, matched skills, and missing skills.
+    """
+    return compare_skill_masks(SKILL_VOCABULARY.mask(resume_set), SKILL_VOCABULARY.mask(job_set))
+
+
+def compare_skill_masks(resume_mask: int, job_mask: int) -> Dict[str, Any]:
+    """
+    compare_skills on skill bitsets from SKILL_VOCABULARY; names are decoded only for the result.
+
+    :param resume_mask: Resume skills.
+    :param job_mask: Required job skills.
+    :return: Dictionary with match percentage, matched skills, and missing skills.
+    """
+    matched = resume_mask & job_mask
+    job_size = popcount(job_mask)
+    match_percentage = (popcount(matched) / job_size) * 100 if job_size else 0
 
     return {
         "match_percentage": f"{match_percentage:.1f}%",
-        "matched_skills": sorted(resume_set & job_set),
-        "missing_skills": sorted(job_set - resume_set)
+        "matched_skills": SKILL_VOCABULARY.decode(matched),
+        "missing_skills": SKILL_VOCABULARY.decode(job_mask & ~resume_mask)
     }
 
 
 # ===================== SECTION EXTRACTION =====================
+# Headers that open a section, grouped by the section they open. A line is a
+# header if it starts with one of them (case-insensitively) and is shorter
+# than MAX_HEADER_LENGTH; the first header in this order wins.
+EXPERIENCE_HEADERS: List[str] = [
+    'experience', 'work experience', 'employment', 'professional experience',
+    'career', 'work history', 'professional background'
+]
+PROJECT_HEADERS: List[str] = [
+    'projects', 'personal projects', 'extracurricular', 'highlights',
+    'notable work', 'achievements', 'projects_highlights'
+]
+OTHER_HEADERS: List[str] = [
+    'education', 'skills', 'projects', 'summary', 'academic', 'roles',
+    'technical expertise', 'core competencies'
+]
+MAX_HEADER_LENGTH = 50
+
+# Header -> section name ("Experience", "projects_highlights" or the title-cased header).
+SECTION_NAMES: Dict[str, str] = {}
+for _header in EXPERIENCE_HEADERS + PROJECT_HEADERS + OTHER_HEADERS:
+    if _header in EXPERIENCE_HEADERS:
+        SECTION_NAMES.setdefault(_header, "Experience")
+    elif _header in PROJECT_HEADERS:
+        SECTION_NAMES.setdefault(_header, "projects_highlights")
+    else:
+        SECTION_NAMES.setdefault(_header, _header.title())
+
+# One pattern finds every candidate header line in a single scan of the text.
+# Alternatives keep the list order, so the first matching header wins as above.
+HEADER_LINE_PATTERN = re.compile(
+    r'^[^\S\n]*(' + '|'.join(re.escape(h) for h in EXPERIENCE_HEADERS + PROJECT_HEADERS + OTHER_HEADERS) + r')[^\n]*',
+    re.IGNORECASE | re.MULTILINE
+)
+
+
+class Section(NamedTuple):
+    """A resume section: its name, header line and the character span of its body."""
+    name: str
+    header: str
+    start: int
+    end: int
+
+
+def segment_resume(text: str) -> List[Section]:
+    """
+    Split resume text into sections in one pass.
+
+    Text before the first header belongs to no section. A section may occur
+    more than once (e.g. two "Projects" headers).
+
+    :param text: Full resume text.
+    :return: Sections in order of appearance; text[section.start:section.end] is the body.
+    """
+    sections = []
+    name = header = None
+    start = 0
+    for match in HEADER_LINE_PATTERN.finditer(text):
+        line = match.group(0).strip()
+        if len(line) >= MAX_HEADER_LENGTH:
+            continue
+        if name is not None:
+            sections.append(Section(name, header, start, match.start()))
+        name = SECTION_NAMES[match.group(1).lower()]
+        header = line
+        start = min(match.end() + 1, len(text))
+    if name is not None:
+        sections.append(Section(name, header, start, len(text)))
+    return sections
+
+
+def section_lines(text: str, sections: List[Section]) -> Dict[str, List[str]]:
+    """
+    The non-blank lines of each section, grouped by section name.
+
+    :param text: Text the sections were segmented from.
+    :param sections: Output of segment_resume.
+    :return: Dictionary with section names as keys and lists of lines (right-stripped) as values.
+    """
+    lines: Dict[str, List[str]] = defaultdict(list)
+    for section in sections:
+        body = [line.rstrip() for line in text[section.start:section.end].split('\n') if line.strip()]
+        # Sections without content are left out, as if the header had not been there.
+        if body:
+            lines[section.name].extend(body)
+    return dict(lines)
+
+
 def extract_sections(text: str) -> Dict[str, List[str]]:
     """
     Extract sections from resume text based on common headers.
@@ -106,44 +212,7 @@ def extract_sections(text: str) -> Dict[str, List[str]]:
     :param text: Full resume text.
     :return: Dictionary with section names as keys and list of section lines as values.
     """
-    experience_headers = [
-        'experience', 'work experience', 'employment', 'professional experience',
-        'career', 'work history', 'professional background'
-    ]
-    other_headers = [
-        'education', 'skills', 'projects', 'summary', 'academic', 'roles',
-        'technical expertise', 'core competencies'
-    ]
-    project_headers = [
-        'projects', 'personal projects', 'extracurricular', 'highlights',
-        'notable work', 'achievements', 'projects_highlights'
-    ]
-    all_headers = experience_headers + project_headers + other_headers
-
-    sections = defaultdict(list)
-    current_section = None
-
-    for line in text.split('\n'):
-        clean_line = line.strip()
-        lower_line = clean_line.lower()
-        header_found = False
-
-        # Check if the line starts with any header (and is short enough to be a header)
-        for header in all_headers:
-            if lower_line.startswith(header) and len(clean_line) < 50:
-                if header in experience_headers:
-                    current_section = "Experience"
-                elif header in project_headers:
-                    current_section = "projects_highlights"
-                else:
-                    current_section = header.title()
-                header_found = True
-                break
-
-        # If not a header and within a section, add the line to that section.
-        if not header_found and current_section and clean_line:
-            sections[current_section].append(line.rstrip())  # Preserve original formatting.
-    return dict(sections)
+    return section_lines(text, segment_resume(text))
 
 
 # ===================== EDUCATION MATCHING IMPROVEMENTS =====================
@@ -183,6 +252,10 @@ def parse_education(education_lines: List[str]) -> Dict[str, Any]:
     return education
 
 
+# A new experience entry starts with a period such as "JAN 2020" or "2019".
+EXPERIENCE_START_PATTERN = re.compile(r'^[A-Z]{3,} \d{4}|^\d{4}')
+
+
 def parse_experience(experience_lines: List[str]) -> List[str]:
     """
     Extract experience entries exactly as formatted in the resume.
@@ -193,12 +266,8 @@ def parse_experience(experience_lines: List[str]) -> List[str]:
     experiences = []
     current_entry = []
 
-    # Compile regex patterns outside the loop for slight efficiency gain.
-    pattern1 = re.compile(r'^[A-Z]{3,} \d{4}.*$')
-    pattern2 = re.compile(r'^\d{4}')
-
     for line in experience_lines:
-        if pattern1.match(line) or pattern2.match(line):  # Detect job start periods
+        if EXPERIENCE_START_PATTERN.match(line):  # Detect job start periods
             if current_entry:
                 experiences.append("\n".join(current_entry).strip())  # Store previous entry
             current_entry = [line]  # Start new job entry
@@ -212,23 +281,27 @@ def parse_experience(experience_lines: List[str]) -> List[str]:
 
 
 # ===================== SKILL EXTRACTION FROM RESUME =====================
-def extract_skills(text: str) -> List[str]:
+def extract_skills(text: Union[str, "Doc"]) -> List[str]:
     """
-    Extract skills from the resume using a single PhraseMatcher.
+    Extract skills from the resume using the compiled skill index.
 
-    :param text: Resume text.
+    :param text: Resume text, or a Doc already tokenized from the lowercased text.
     :return: Sorted list of detected skills.
     """
-    doc = nlp(text.lower())
-    skills: Set[str] = set()
+    # Matching only needs tokens, so the tagger, parser and NER are skipped.
+    doc = make_doc(text.lower()) if isinstance(text, str) else text
 
-    # Use the prebuilt global SKILL_MATCHER.
-    matches = SKILL_MATCHER(doc)
-    for _, start, end in matches:
-        skill_text = doc[start:end].text.lower()
-        # Look up the canonical skill or fallback to title-cased text.
-        skills.add(SKILL_MAPPING.get(skill_text, skill_text.title()))
-    return sorted(skills, key=lambda x: x.lower())
+    # Use the shared compiled skill index.
+    return canonical_skills(get_skill_index().find(doc))
+
+
+# Headers of a skill list, in order of preference; the list runs to the next blank line.
+SKILL_LIST_HEADER_PATTERN = re.compile(
+    r'(?:(?P<skills>(?:technical|key|core)\s*skills)|(?P<competencies>competencies)|(?P<expertise>expertise))'
+    r'(?=:?\s*\n)',
+    re.IGNORECASE
+)
+SKILL_LIST_BODY_PATTERN = re.compile(r':?\s*\n(.*?)(?=\n\s*\n|$)', re.DOTALL)
 
 
 def extract_skill_section(text: str) -> List[str]:
@@ -238,19 +311,25 @@ def extract_skill_section(text: str) -> List[str]:
     :param text: Resume text.
     :return: List of skill lines.
     """
-    patterns = [
-        r'(?i)(?:technical|key|core)\s*skills:?\s*\n(.*?)(?=\n\s*\n|$)',
-        r'(?i)competencies:?\s*\n(.*?)(?=\n\s*\n|$)',
-        r'(?i)expertise:?\s*\n(.*?)(?=\n\s*\n|$)'
-    ]
-    for pattern in patterns:
-        match = re.search(pattern, text, re.DOTALL)
-        if match:
-            return [line.strip() for line in match.group(1).split('\n') if line.strip()]
+    # One scan finds the first header of each kind; the preferred kind wins wherever it is.
+    first: Dict[str, int] = {}
+    for match in SKILL_LIST_HEADER_PATTERN.finditer(text):
+        first.setdefault(match.lastgroup, match.end())
+    for kind in ("skills", "competencies", "expertise"):
+        if kind in first:
+            body = SKILL_LIST_BODY_PATTERN.match(text, first[kind]).group(1)
+            return [line.strip() for line in body.split('\n') if line.strip()]
     return []
 
 
 # ===================== PROJECTS EXTRACTION =====================
+# Project starters: a dated range ("2021 - 2022"), a bullet, or a build verb.
+PROJECT_START_PATTERN = re.compile(r'^(.*\d{4}.*?[-–].*|•|\u2022)')
+PROJECT_VERB_PATTERN = re.compile(r'\b(developed|created|built)\b')
+BULLET_LINE_PATTERN = re.compile(r'^\s*[-•*]')
+BULLET_SPLIT_PATTERN = re.compile(r'\n\s*[\u2022•*-]\s*')
+
+
 def parse_projects_highlights(project_lines: List[str]) -> List[str]:
     """
     Parse the projects/highlights section using multiple detection strategies.
@@ -263,17 +342,18 @@ def parse_projects_highlights(project_lines: List[str]) -> List[str]:
     in_project = False
 
     for line in project_lines:
-        # Detect project starters based on dates, bullet points, or key phrases.
-        if (re.match(r'^(.*\d{4}.*?[-–].*|•|\u2022)', line) or
-                'project' in line.lower() or
-                re.search(r'\b(developed|created|built)\b', line.lower())):
+        # Detect project starters based on dates, bullet points, or key phrases (cheapest test first).
+        lower_line = line.lower()
+        if ('project' in lower_line or
+                PROJECT_START_PATTERN.match(line) or
+                PROJECT_VERB_PATTERN.search(lower_line)):
             if current_project:
                 projects.append("\n".join(current_project).strip())
             current_project = [line]
             in_project = True
         elif in_project:
             # Handle continuation lines that are bullet points or further description.
-            if re.match(r'^\s*[-•*]', line):
+            if BULLET_LINE_PATTERN.match(line):
                 current_project.append(line.strip())
             else:
                 current_project[-1] += " " + line.strip()
@@ -283,13 +363,14 @@ def parse_projects_highlights(project_lines: List[str]) -> List[str]:
 
     # Fallback: If no projects detected, split by bullet points.
     if not projects:
-        bullet_points = re.split(r'\n\s*[\u2022•*-]\s*', '\n'.join(project_lines))
+        bullet_points = BULLET_SPLIT_PATTERN.split('\n'.join(project_lines))
         projects = [bp.strip() for bp in bullet_points if bp.strip()]
 
     return projects
 
 
 # ===================== MAIN ANALYSIS FUNCTION =====================
+@metrics.timed("analyze_resume")
 def analyze_resume(text: str) -> Dict[str, Any]:
     """
     Analyze the resume text and extract structured information.
@@ -297,20 +378,128 @@ def analyze_resume(text: str) -> Dict[str, Any]:
     :param text: The complete resume text.
     :return: Dictionary containing education, experience, skills, and projects/highlights.
     """
-    sections = extract_sections(text)
+    return analysis_from_artifacts(extract_artifacts(text))
+
+
+def extract_artifacts(text: str) -> Dict[str, Any]:
+    """
+    Everything analyze_resume derives from the text, kept so the analysis can be
+    rebuilt without the text: the lowercase tokens skills are matched on, the
+    skill variations found in them, and the parsed sections.
+
+    :param text: The complete resume text.
+    :return: Dictionary with tokens, section_tokens, variations, section_variations,
+             education, experience and projects_highlights.
+    """
+    # Tokenize the full text once; matching only needs the token texts.
+    with metrics.timer("tokenize"):
+        tokens = doc_tokens(make_doc(text.lower()))
+
+    # Match skills both in a dedicated 'Skills' section (if exists) and in the full text.
+    with metrics.timer("extract_skills"):
+        variations = sorted({variation for _, _, variation in get_skill_index().iter_matches(tokens)})
+
+    return dict(_section_artifacts(text), tokens=tokens, variations=variations)
 
-    # Extract skills both from a dedicated 'Skills' section (if exists) and the full text.
-    section_skills = extract_skills(' '.join(sections.get('Skills', [])))
-    full_text_skills = extract_skills(text)
 
-    experience_section = sections.get('Experience', [])
-    experience_data = parse_experience(experience_section) if experience_section else []
+def diff_artifacts(old_text: str, old_artifacts: Dict[str, Any], text: str) -> Dict[str, Any]:
+    """
+    Artifacts of a resume derived from those of a near-duplicate of it.
+
+    Sections are parsed again (cheap), but only the lines that differ between
+    the two texts are tokenized and matched: skills found in added lines are
+    added, and skills found in removed lines are kept only if an unchanged
+    line still contains them. A skill split across the boundary of a changed
+    line may be missed.
+
+    :param old_text: Text of the near-duplicate.
+    :param old_artifacts: Its artifacts (see extract_artifacts), matched against the current taxonomy.
+    :param text: The complete text of the new resume.
+    :return: Artifacts without the full-text tokens, enough for analysis_from_artifacts.
+    """
+    old_lines, lines = old_text.lower().split("\n"), text.lower().split("\n")
+    added: List[str] = []
+    removed: List[str] = []
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, old_lines, lines, autojunk=False).get_opcodes():
+        if tag != "equal":
+            removed.extend(old_lines[i1:i2])
+            added.extend(lines[j1:j2])
+
+    def matched(chunk: List[str]) -> Set[str]:
+        if not chunk:
+            return set()
+        tokens = doc_tokens(make_doc("\n".join(chunk)))
+        return {variation for _, _, variation in get_skill_index().iter_matches(tokens)}
+
+    with metrics.timer("extract_skills"):
+        added_variations = matched(added)
+        variations = set(old_artifacts['variations']) | added_variations
+        for variation in matched(removed) - added_variations:
+            # Still present if a line of the new text mentions it and matching that line confirms it.
+            if variation not in matched([line for line in lines if variation in line]):
+                variations.discard(variation)
+
+    return dict(_section_artifacts(text), variations=sorted(variations))
+
+
+def _section_artifacts(text: str) -> Dict[str, Any]:
+    """The artifacts taken from the sections of a resume: Skills-section tokens and matches, and the parsed sections."""
+    with metrics.timer("extract_sections"):
+        sections = extract_sections(text)
+    with metrics.timer("tokenize"):
+        section_tokens = doc_tokens(make_doc(' '.join(sections.get('Skills', [])).lower()))
+
+    with metrics.timer("extract_skills"):
+        section_variations = sorted({variation for _, _, variation in get_skill_index().iter_matches(section_tokens)})
+
+    with metrics.timer("parse_experience"):
+        experience_section = sections.get('Experience', [])
+        experience_data = parse_experience(experience_section) if experience_section else []
+
+    with metrics.timer("parse_education"):
+        education = parse_education(sections.get('Education', []))
+
+    with metrics.timer("parse_projects_highlights"):
+        projects = parse_projects_highlights(sections.get('projects_highlights', []))
 
     return {
-        'education': parse_education(sections.get('Education', [])),
+        'section_tokens': section_tokens,
+        'section_variations': section_variations,
+        'education': education,
         'experience': experience_data,
+        'projects_highlights': projects
+    }
+
+
+def canonical_skills(variations: Iterable[str], mapping: Optional[Dict[str, str]] = None) -> List[str]:
+    """
+    Canonical skill names for matched variations, as extract_skills reports them.
+
+    :param variations: Lowercase skill variations.
+    :param mapping: Variation to canonical name (defaults to SKILL_MAPPING).
+    :return: Sorted list of skills.
+    """
+    mapping = SKILL_MAPPING if mapping is None else mapping
+    # Look up the canonical skill or fallback to title-cased text.
+    skills = {mapping.get(variation, variation.title()) for variation in variations}
+    return sorted(skills, key=lambda x: x.lower())
+
+
+def analysis_from_artifacts(artifacts: Dict[str, Any], mapping: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    The analyze_resume result for stored artifacts (see extract_artifacts).
+
+    :param artifacts: Output of extract_artifacts.
+    :param mapping: Variation to canonical name (defaults to SKILL_MAPPING).
+    :return: Dictionary containing education, experience, skills, and projects/highlights.
+    """
+    section_skills = canonical_skills(artifacts['section_variations'], mapping)
+    full_text_skills = canonical_skills(artifacts['variations'], mapping)
+    return {
+        'education': artifacts['education'],
+        'experience': artifacts['experience'],
         'skills': list(set(section_skills + full_text_skills)),
-        'projects_highlights': parse_projects_highlights(sections.get('projects_highlights', []))
+        'projects_highlights': artifacts['projects_highlights']
     }
 
 
@@ -323,40 +512,105 @@ def analyze_match(resume_data: Dict[str, Any], job_data: Dict[str, Any]) -> Dict
     :param job_data: Job data including required_skills and education requirements.
     :return: Dictionary with matching scores and details.
     """
-    # Skill matching: use lowercase sets for consistency.
-    resume_skills = {s.lower() for s in resume_data.get("skills", [])}
-    job_skills = {s.lower() for s in job_data.get("required_skills", [])}
-    skill_match = (len(resume_skills & job_skills) / len(job_skills) * 100) if job_skills else 100
-    boosted_skill = min(skill_match * SKILL_BOOST, 100)
-
-    # Education matching: if no requirement, consider it met.
-    resume_degree = resume_data.get("education", {}).get("degree", "")
+    # Skill matching: skills are compared case-insensitively, as bitsets.
+    resume_mask = SKILL_VOCABULARY.mask(resume_data.get("skills", []))
+    job_mask = SKILL_VOCABULARY.mask(job_data.get("required_skills", []))
     job_degree = job_data.get("education", "")
+    relevance = None
+    if RELEVANCE_WEIGHT:
+        relevance = skill_relevance(resume_data.get("skills", []), job_data.get("required_skills", []))
+
+    return match_skill_masks(
+        resume_mask, resume_data.get("education", {}).get("degree", ""),
+        job_mask, job_degree, DEGREE_LEVELS.get(job_degree), relevance
+    )
+
+
+def match_skill_sets(resume_skills: AbstractSet[str], resume_degree: Optional[str],
+                     job_skills: AbstractSet[str], job_degree: Optional[str],
+                     job_level: Optional[int]) -> Dict[str, Any]:
+    """
+    analyze_match on precomputed inputs, so a compiled job can be scored
+    against many resumes without rebuilding its skill set each time.
+
+    :param resume_skills: Lowercase resume skills.
+    :param resume_degree: Highest degree found on the resume.
+    :param job_skills: Lowercase required job skills.
+    :param job_degree: Required degree (empty or None if there is no requirement).
+    :param job_level: DEGREE_LEVELS entry for job_degree (None if it is not in the hierarchy).
+    :return: Dictionary with matching scores and details.
+    """
+    return match_skill_masks(SKILL_VOCABULARY.mask(resume_skills), resume_degree,
+                             SKILL_VOCABULARY.mask(job_skills), job_degree, job_level)
 
+
+@metrics.timed("analyze_match")
+def match_skill_masks(resume_mask: int, resume_degree: Optional[str],
+                      job_mask: int, job_degree: Optional[str],
+                      job_level: Optional[int], relevance: Optional[float] = None) -> Dict[str, Any]:
+    """
+    match_skill_sets on skill bitsets from SKILL_VOCABULARY: the skill match
+    is a popcount, and names are decoded only for missing_skills.
+
+    :param resume_mask: Resume skills.
+    :param resume_degree: Highest degree found on the resume.
+    :param job_mask: Required job skills.
+    :param job_degree: Required degree (empty or None if there is no requirement).
+    :param job_level: DEGREE_LEVELS entry for job_degree (None if it is not in the hierarchy).
+    :param relevance: TF-IDF relevance of the skills (0-1), when RELEVANCE_WEIGHT is set.
+    :return: Dictionary with matching scores and details.
+    """
+    job_size = popcount(job_mask)
+    skill_match = (popcount(resume_mask & job_mask) / job_size * 100) if job_size else 100
+
+    # Education matching: if no requirement, consider it met.
     if not job_degree:
         edu_score = 100
         education_match = "Met (No requirement)"
     else:
-        try:
-            job_level = DEGREE_HIERARCHY.index(job_degree)
-            resume_level = DEGREE_HIERARCHY.index(resume_degree)
-            edu_score = 100 if resume_level <= job_level else 0
-        except ValueError:
+        resume_level = DEGREE_LEVELS.get(resume_degree)
+        if job_level is None or resume_level is None:
             edu_score = 0  # Unknown degree found
+        else:
+            edu_score = 100 if resume_level <= job_level else 0
         education_match = "Met" if edu_score == 100 else "Not met"
 
-    # Composite score combining skills and education.
-    composite = (0.8 * boosted_skill) + (0.2 * edu_score)
-    final_match = 100 if composite >= COMPOSITE_THRESHOLD else (composite / COMPOSITE_THRESHOLD) * 100
+    boosted_skill, composite, final_match = combine_scores(skill_match, edu_score, relevance)
 
-    return {
+    result = {
         "skill_match": f"{boosted_skill:.1f}%",
         "education_match": education_match,
         "composite_score": f"{composite:.1f}%",
         "final_match": f"{final_match:.1f}%",
-        "missing_skills": sorted(job_skills - resume_skills),
-        "resume_summary": {"total_skills": len(resume_skills)}
+        "missing_skills": SKILL_VOCABULARY.decode(job_mask & ~resume_mask),
+        "resume_summary": {"total_skills": popcount(resume_mask)}
     }
+    if relevance is not None:
+        result["relevance"] = f"{relevance * 100:.1f}%"
+    return result
+
+
+def combine_scores(skill_match: float, edu_score: float,
+                   relevance: Optional[float] = None) -> Tuple[float, float, float]:
+    """
+    Combine a skill match and an education score into the reported scores.
+
+    Non-decreasing in every input, which lets the candidate index bound the
+    score of a resume from the skills it could still match.
+
+    :param skill_match: Percentage of required skills found on the resume.
+    :param edu_score: 100 if the education requirement is met, else 0.
+    :param relevance: TF-IDF relevance (0-1); only used when RELEVANCE_WEIGHT is set.
+    :return: (boosted skill score, composite score, final match).
+    """
+    boosted_skill = min(skill_match * SKILL_BOOST, 100)
+
+    # Composite score combining skills and education.
+    composite = (0.8 * boosted_skill) + (0.2 * edu_score)
+    if RELEVANCE_WEIGHT and relevance is not None:
+        composite = (1 - RELEVANCE_WEIGHT) * composite + RELEVANCE_WEIGHT * relevance * 100
+    final_match = 100 if composite >= COMPOSITE_THRESHOLD else (composite / COMPOSITE_THRESHOLD) * 100
+    return boosted_skill, composite, final_match
 
 
 # ===================== EXAMPLE USAGE =====================
@@ -0,0 +1,276 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from data_base import SKILLS_DB
+from nlp_engine import MODEL_NAME, get_nlp
+
+if TYPE_CHECKING:
+    from spacy.tokens import Doc
+
+logger = logging.getLogger(__name__)
+
+# Directory for the saved index (next to this module, so the web server and the CLIs
+# share it whatever their working directory); set SKILL_INDEX_CACHE to an empty string to disable.
+INDEX_CACHE_DIR = os.environ.get("SKILL_INDEX_CACHE",
+                                 os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache"))
+# Bump whenever SkillIndex's internal layout changes (invalidates saved indexes).
+INDEX_FORMAT_VERSION = "2"
+
+
+# ===================== COMPILED SKILL INDEX =====================
+class SkillIndex:
+    """
+    Token trie over every skill variation, built once and matched in one pass.
+
+    Variations are tokenized with the same tokenizer as the documents, so a
+    match always starts and ends on token boundaries (no "go" inside "good").
+    Matching walks the trie from each token, which is linear in the document
+    length for a bounded pattern length, independent of how many variations
+    the taxonomy holds.
+    """
+
+    # Key under which a trie node stores the variation that ends there.
+    _END = ""
+
+    def __init__(self, variations: Iterable[str], tokenize: Callable[[str], Sequence[str]]):
+        """
+        :param variations: Skill variations to index (matched case-insensitively).
+        :param tokenize: Splits a variation into token texts.
+        """
+        self._root: Dict[str, dict] = {}
+        self.size = 0
+        self.max_length = 0
+        for variation in variations:
+            tokens = [t.lower() for t in tokenize(variation.lower())]
+            if not tokens:
+                continue
+            node = self._root
+            for token in tokens:
+                node = node.setdefault(token, {})
+            if self._END not in node:
+                self.size += 1
+            node[self._END] = variation.lower()
+            self.max_length = max(self.max_length, len(tokens))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable form of the index (the trie is nested dicts of strings)."""
+        return {"root": self._root, "size": self.size, "max_length": self.max_length}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SkillIndex":
+        """
+        Rebuild an index saved with to_dict, without tokenizing anything.
+
+        :param data: to_dict output.
+        :return: The index.
+        """
+        index = cls((), lambda text: [])
+        index._root = data["root"]
+        index.size = data["size"]
+        index.max_length = data["max_length"]
+        return index
+
+    def iter_matches(self, tokens: Sequence[str]) -> Iterator[Tuple[int, int, str]]:
+        """
+        Find every occurrence of an indexed variation, including overlapping ones.
+
+        :param tokens: Lowercase token texts of the document.
+        :return: Iterator of (start, end, variation) with token offsets.
+        """
+        root = self._root
+        end_key = self._END
+        for start, token in enumerate(tokens):
+            node = root.get(token)
+            position = start
+            while node is not None:
+                position += 1
+                variation = node.get(end_key)
+                if variation is not None:
+                    yield start, position, variation
+                if position == len(tokens):
+                    break
+                node = node.get(tokens[position])
+
+    def find(self, doc: "Doc") -> Set[str]:
+        """
+        Variations that occur in a Doc (compared on the lowercase token text).
+
+        :param doc: Tokenized document.
+        :return: Set of matched variations.
+        """
+        return {variation for _, _, variation in self.iter_matches(doc_tokens(doc))}
+
+
+def doc_tokens(doc: "Doc") -> List[str]:
+    """Lowercase token texts of a Doc, the unit the index matches on."""
+    return [token.lower_ for token in doc]
+
+
+def build_skill_index(skills_db: Optional[Dict[str, List[str]]] = None) -> SkillIndex:
+    """
+    Build a SkillIndex over every variation in a skills taxonomy.
+
+    :param skills_db: Mapping of canonical skill to variations (defaults to SKILLS_DB).
+    :return: The compiled index.
+    """
+    skills_db = SKILLS_DB if skills_db is None else skills_db
+    tokenizer = get_nlp().tokenizer
+    variations = (variation for variants in skills_db.values() for variation in variants)
+    return SkillIndex(variations, lambda text: [token.text for token in tokenizer(text)])
+
+
+# ===================== SKILL VOCABULARY =====================
+class SkillVocabulary:
+    """
+    Dense integer ids for lowercase skill names.
+
+    Canonical SKILLS_DB skills get fixed ids in taxonomy order; names outside
+    the taxonomy (e.g. "english" or title-cased fallbacks) are appended the
+    first time they are seen, so ids are stable within one vocabulary.
+
+    A set of skills can be held as a bitset (a Python int with bit `id` set
+    for each skill), so intersections and counts are single integer
+    operations. Ids and masks are only meaningful within one vocabulary in
+    one process; names are what crosses process and JSON boundaries.
+    """
+
+    def __init__(self, skills_db: Optional[Dict[str, List[str]]] = None):
+        skills_db = SKILLS_DB if skills_db is None else skills_db
+        self.names: List[str] = []
+        self.ids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        for skill in skills_db:
+            self.add(skill)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def add(self, name: str) -> int:
+        """
+        Id of a skill name, assigning a new one if needed.
+
+        :param name: Skill name (compared case-insensitively).
+        :return: Its integer id.
+        """
+        key = name.lower()
+        skill_id = self.ids.get(key)
+        if skill_id is None:
+            with self._lock:
+                skill_id = self.ids.get(key)
+                if skill_id is None:
+                    skill_id = len(self.names)
+                    self.names.append(key)
+                    self.ids[key] = skill_id
+        return skill_id
+
+    def encode(self, names: Iterable[str]) -> List[int]:
+        """Ids of several skill names (assigning new ids as needed)."""
+        return [self.add(name) for name in names]
+
+    def mask(self, names: Iterable[str]) -> int:
+        """
+        Bitset of several skill names (assigning new ids as needed).
+
+        :param names: Skill names (compared case-insensitively).
+        :return: Int with the bit of every skill's id set.
+        """
+        ids = self.ids
+        mask = 0
+        for name in names:
+            skill_id = ids.get(name.lower())
+            mask |= 1 << (self.add(name) if skill_id is None else skill_id)
+        return mask
+
+    def decode(self, mask: int) -> List[str]:
+        """
+        Lowercase skill names in a bitset, sorted by name.
+
+        :param mask: Bitset from mask().
+        :return: The names.
+        """
+        names = self.names
+        decoded = []
+        while mask:
+            low = mask & -mask
+            decoded.append(names[low.bit_length() - 1])
+            mask ^= low
+        return sorted(decoded)
+
+
+# Number of skills in a bitset (int.bit_count needs Python 3.10).
+popcount: Callable[[int], int] = getattr(int, "bit_count", None) or (lambda mask: bin(mask).count("1"))
+
+# Vocabulary shared by job profiles, batch scoring and the candidate index in this process.
+SKILL_VOCABULARY = SkillVocabulary()
+
+
+def _index_cache_path(skills_db: Dict[str, List[str]]) -> Optional[str]:
+    """File path for an index, keyed by everything that shapes the trie."""
+    if not INDEX_CACHE_DIR:
+        return None
+    key = json.dumps([INDEX_FORMAT_VERSION, MODEL_NAME, skills_db], sort_keys=True)
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(INDEX_CACHE_DIR, f"skill_index-{digest}.json")
+
+
+def load_or_build_skill_index(skills_db: Optional[Dict[str, List[str]]] = None) -> SkillIndex:
+    """
+    Load a previously built index from disk, or build it and save it.
+
+    The file is plain JSON (nothing in it is executed on load), keyed by the
+    taxonomy, the model name and the index format, so editing SKILLS_DB simply
+    produces a new file. Disk errors fall back to building in memory.
+
+    :param skills_db: Mapping of canonical skill to variations (defaults to SKILLS_DB).
+    :return: The compiled index.
+    """
+    skills_db = SKILLS_DB if skills_db is None else skills_db
+    path = _index_cache_path(skills_db)
+    if path and os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return SkillIndex.from_dict(json.load(f))
+        except Exception as e:
+            logger.warning("Ignoring unreadable skill index cache %s: %s", path, e)
+
+    index = build_skill_index(skills_db)
+    if path:
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temporary name first so concurrent workers never read a partial file.
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(index.to_dict(), f, separators=(",", ":"))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Could not cache skill index at %s: %s", path, e)
+    return index
+
+
+_skill_index: Optional[SkillIndex] = None
+_lock = threading.Lock()
+
+
+def get_skill_index() -> SkillIndex:
+    """
+    Return the shared index over SKILLS_DB, loading or building it on first use.
+
+    :return: The index shared by resume_analysis and job.
+    """
+    global _skill_index
+    if _skill_index is None:
+        with _lock:
+            if _skill_index is None:
+                _skill_index = load_or_build_skill_index()
+    return _skill_index
+
+
+def __getattr__(name: str) -> Any:
+    # Keep ``skill_matcher.SKILL_INDEX`` working without building it at import time.
+    if name == "SKILL_INDEX":
+        return get_skill_index()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,420 @@
+import heapq
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Type
+
+from analysis_cache import CACHE
+from batch import final_match_value
+from job import JobProfile
+from relevance import relevance_matrix
+from resume_analysis import DEGREE_LEVELS, RELEVANCE_WEIGHT, combine_scores
+
+logger = logging.getLogger(__name__)
+
+# ===================== STORAGE CONFIGURATION =====================
+# SQLite file holding analyzed resumes, parsed jobs and match results; set
+# RESULT_STORE_PATH to an empty string to keep nothing.
+DEFAULT_STORE_PATH = os.environ.get("RESULT_STORE_PATH", os.path.join("instance", "results.sqlite3"))
+# Idle connections kept per process for request threads.
+DEFAULT_POOL_SIZE = int(os.environ.get("RESULT_STORE_POOL_SIZE", 8))
+# Number of results returned when the caller does not ask for a specific count.
+DEFAULT_LIMIT = 20
+# Results saved per transaction by callers that stream them (streaming batches, queued jobs).
+STORE_BATCH_SIZE = 100
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS resumes ("
+    " digest TEXT PRIMARY KEY, filename TEXT, degree TEXT NOT NULL, total_skills INTEGER NOT NULL,"
+    " analysis TEXT NOT NULL, analysis_version TEXT NOT NULL, added REAL NOT NULL);"
+    "CREATE INDEX IF NOT EXISTS resumes_degree ON resumes (degree);"
+    "CREATE TABLE IF NOT EXISTS resume_skills ("
+    " skill TEXT NOT NULL, digest TEXT NOT NULL, PRIMARY KEY (skill, digest)) WITHOUT ROWID;"
+    "CREATE INDEX IF NOT EXISTS resume_skills_digest ON resume_skills (digest);"
+    "CREATE TABLE IF NOT EXISTS jobs ("
+    " digest TEXT PRIMARY KEY, job_data TEXT NOT NULL, degree TEXT NOT NULL, added REAL NOT NULL);"
+    "CREATE TABLE IF NOT EXISTS matches ("
+    " job TEXT NOT NULL, resume TEXT NOT NULL, filename TEXT, final_match REAL NOT NULL,"
+    " result TEXT NOT NULL, scored REAL NOT NULL, PRIMARY KEY (job, resume));"
+    "CREATE INDEX IF NOT EXISTS matches_rank ON matches (job, final_match DESC);"
+    "CREATE INDEX IF NOT EXISTS matches_score ON matches (final_match);"
+)
+
+
+# ===================== CONNECTION POOL =====================
+class ConnectionPool:
+    """
+    Connections shared by the request threads of one process.
+
+    A thread borrows a connection for one unit of work and returns it, so a
+    worker with many threads keeps at most `size` idle connections instead of
+    one per thread that ever ran. Connections are never reused across a fork.
+    """
+
+    def __init__(self, connect: Callable[[], Any], size: int = DEFAULT_POOL_SIZE):
+        """
+        :param connect: Opens a new DB-API connection (any driver using '?' placeholders).
+        :param size: Idle connections kept for reuse.
+        """
+        self._connect = connect
+        self.size = size
+        self._idle: "queue.LifoQueue[Any]" = queue.LifoQueue()
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """Borrow a connection; it is returned to the pool (or closed if the pool is full) afterwards."""
+        with self._lock:
+            if self._pid != os.getpid():
+                # Inherited from the parent: drop them without closing the parent's handles.
+                self._idle = queue.LifoQueue()
+                self._pid = os.getpid()
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+        finally:
+            if self._pid == os.getpid() and self._idle.qsize() < self.size:
+                self._idle.put(conn)
+            else:
+                conn.close()
+
+
+def sqlite_connector(path: str) -> Callable[[], sqlite3.Connection]:
+    """Connection factory for a SQLite file in WAL mode, creating the schema on first use."""
+    def connect() -> sqlite3.Connection:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # check_same_thread=False: pooled connections move between threads (never concurrently).
+        conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        return conn
+    return connect
+
+
+# ===================== RESULT STORE =====================
+class ResultStore:
+    """
+    Persistent record of analyzed resumes, parsed jobs and match results.
+
+    Resumes are keyed by content digest and indexed by skill and degree, and
+    match results by job and final score, so past batches can be queried and
+    a stored pool ranked against a new job without uploading anything again.
+    Every save is one transaction with executemany, however many rows it has.
+
+    Resumes analyzed under an older analysis version (see analysis_cache) are
+    kept but left out of find_resumes and rank_stored until they are stored
+    again with a current analysis.
+    """
+
+    def __init__(self, path: Optional[str] = DEFAULT_STORE_PATH, pool_size: int = DEFAULT_POOL_SIZE,
+                 connect: Optional[Callable[[], Any]] = None, error: Optional[Type[Exception]] = None):
+        """
+        :param path: SQLite file, or None/empty to disable the store (saves are dropped, queries return nothing).
+        :param pool_size: Idle connections kept per process.
+        :param connect: Connection factory replacing the SQLite default (e.g. for another DB-API driver).
+        :param error: The driver's DB-API Error class, which store_results logs instead of raising
+                      (defaults to sqlite3.Error, or to any exception with a custom factory).
+        """
+        self.path = path or None
+        if connect is None and self.path:
+            connect = sqlite_connector(self.path)
+            error = error or sqlite3.Error
+        self.error = error or Exception
+        self.pool = ConnectionPool(connect, pool_size) if connect is not None else None
+
+    @property
+    def enabled(self) -> bool:
+        return self.pool is not None
+
+    @contextmanager
+    def _transaction(self) -> Iterator[Any]:
+        with self.pool.connection() as conn:
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+    # ---------- writes ----------
+    def save_resumes(self, entries: Sequence[Tuple[str, Dict[str, Any], Optional[str]]]) -> None:
+        """
+        Store analyzed resumes (entries with an "error" key are skipped).
+
+        :param entries: (digest, analyze_resume output, filename) triples.
+        """
+        if not self.enabled:
+            return
+        with self._transaction() as conn:
+            self._save_resumes(conn, entries)
+
+    def save_job(self, job: JobProfile) -> None:
+        """Store a parsed job description under its digest."""
+        if not self.enabled:
+            return
+        with self._transaction() as conn:
+            self._save_job(conn, job)
+
+    def save_matches(self, job: JobProfile, results: Sequence[Dict[str, Any]]) -> int:
+        """
+        Store the job, the resumes and their match results of one comparison or batch.
+
+        :param job: Compiled job profile the results were scored against.
+        :param results: Result entries with digest, filename, analysis, skill_comparison and
+            match_result (error entries and entries without a digest are skipped).
+        :return: Number of match results stored.
+        """
+        if not self.enabled:
+            return 0
+        scored = [result for result in results
+                  if result.get("digest") and "match_result" in result and "analysis" in result]
+        now = time.time()
+        with self._transaction() as conn:
+            self._save_job(conn, job)
+            self._save_resumes(conn, [(r["digest"], r["analysis"], r.get("filename")) for r in scored])
+            conn.executemany(
+                "INSERT OR REPLACE INTO matches (job, resume, filename, final_match, result, scored)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                [(job.digest, r["digest"], r.get("filename"), final_match_value(r),
+                  json.dumps({key: r[key] for key in ("skill_comparison", "match_result") if key in r}), now)
+                 for r in scored]
+            )
+        return len(scored)
+
+    def _save_job(self, conn: Any, job: JobProfile) -> None:
+        conn.execute(
+            "INSERT OR REPLACE INTO jobs (digest, job_data, degree, added) VALUES (?, ?, ?, ?)",
+            (job.digest, json.dumps(job.job_data), job.degree or "", time.time())
+        )
+
+    def _save_resumes(self, conn: Any, entries: Sequence[Tuple[str, Dict[str, Any], Optional[str]]]) -> None:
+        entries = [(digest, analysis, filename) for digest, analysis, filename in entries if "error" not in analysis]
+        if not entries:
+            return
+        now = time.time()
+        version = CACHE.versions["analysis"]
+        conn.executemany(
+            "INSERT OR REPLACE INTO resumes (digest, filename, degree, total_skills, analysis, analysis_version, added)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(digest, filename, analysis.get("education", {}).get("degree", "") or "",
+              len({s.lower() for s in analysis.get("skills", [])}), json.dumps(analysis), version, now)
+             for digest, analysis, filename in entries]
+        )
+        conn.executemany("DELETE FROM resume_skills WHERE digest = ?", [(digest,) for digest, _, _ in entries])
+        conn.executemany(
+            "INSERT OR IGNORE INTO resume_skills (skill, digest) VALUES (?, ?)",
+            [(skill.lower(), digest) for digest, analysis, _ in entries for skill in analysis.get("skills", [])]
+        )
+
+    def rescore_matches(self, job_digests: Optional[Sequence[str]] = None) -> int:
+        """
+        Bring stored match results up to date with the current weights and SKILLS_DB.
+
+        Each result is recomputed from its resume's current analysis: the cached one
+        when the stored row is from an older analysis version (e.g. after
+        `python rescoring.py taxonomy`; the row is updated as well), else the stored
+        one. Only the match arithmetic runs again.
+
+        :param job_digests: Jobs to re-score (default: every stored job).
+        :return: Number of match results whose scores changed.
+        """
+        if not self.enabled:
+            return 0
+        version = CACHE.versions["analysis"]
+        with self.pool.connection() as conn:
+            if job_digests is None:
+                job_digests = [row[0] for row in conn.execute("SELECT digest FROM jobs")]
+        analyses: Dict[str, Dict[str, Any]] = {}
+        changed = 0
+        for digest in job_digests:
+            with self._transaction() as conn:
+                row = conn.execute("SELECT job_data FROM jobs WHERE digest = ?", (digest,)).fetchone()
+                if row is None:
+                    continue
+                job = JobProfile.from_job_data(json.loads(row[0]), digest)
+                refreshed = []
+                updates = []
+                for resume, result, analysis, analysis_version, filename in conn.execute(
+                        "SELECT m.resume, m.result, r.analysis, r.analysis_version, r.filename FROM matches m"
+                        " JOIN resumes r ON r.digest = m.resume WHERE m.job = ?", (digest,)).fetchall():
+                    if resume not in analyses:
+                        cached = CACHE.get("analysis", resume) if analysis_version != version else None
+                        if cached is not None:
+                            refreshed.append((resume, cached, filename))
+                        analyses[resume] = cached if cached is not None else json.loads(analysis)
+                    analysis = analyses[resume]
+                    entry = {"skill_comparison": job.compare_skills(analysis.get("skills", [])),
+                             "match_result": job.match(analysis)}
+                    payload = json.dumps(entry)
+                    if payload != result:
+                        updates.append((final_match_value(entry), payload, digest, resume))
+                self._save_resumes(conn, refreshed)
+                conn.executemany("UPDATE matches SET final_match = ?, result = ? WHERE job = ? AND resume = ?",
+                                 updates)
+            changed += len(updates)
+        return changed
+
+    # ---------- queries ----------
+    def get_resume(self, digest: str) -> Optional[Dict[str, Any]]:
+        """Stored analyze_resume output of a resume, or None."""
+        if not self.enabled:
+            return None
+        with self.pool.connection() as conn:
+            row = conn.execute("SELECT analysis FROM resumes WHERE digest = ?", (digest,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_job(self, digest: str) -> Optional[Dict[str, Any]]:
+        """Stored parse_job_description output of a job, or None."""
+        if not self.enabled:
+            return None
+        with self.pool.connection() as conn:
+            row = conn.execute("SELECT job_data FROM jobs WHERE digest = ?", (digest,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def job_matches(self, job_digest: str, limit: int = DEFAULT_LIMIT,
+                    min_score: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Stored match results of one job, best first.
+
+        :param job_digest: JobProfile digest the results were stored under.
+        :param limit: Maximum number of results.
+        :param min_score: Only results with at least this final match (percent).
+        :return: Result entries with filename, digest, skill_comparison and match_result.
+        """
+        if not self.enabled:
+            return []
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT resume, filename, result FROM matches WHERE job = ? AND final_match >= ?"
+                " ORDER BY final_match DESC, scored LIMIT ?",
+                (job_digest, -1.0 if min_score is None else min_score, limit)
+            ).fetchall()
+        return [dict(json.loads(result), digest=digest, filename=filename) for digest, filename, result in rows]
+
+    def find_resumes(self, skills: Sequence[str] = (), degree: Optional[str] = None,
+                     limit: int = DEFAULT_LIMIT) -> List[Dict[str, Any]]:
+        """
+        Stored resumes that have every given skill and, optionally, a degree.
+
+        :param skills: Required skills (case-insensitive).
+        :param degree: Required degree, or a minimum one if it is in DEGREE_HIERARCHY (e.g. "Master" also
+            matches "PhD").
+        :param limit: Maximum number of resumes, most skilled first.
+        :return: Entries with digest, filename, degree and total_skills.
+        """
+        if not self.enabled:
+            return []
+        skills = sorted({skill.lower() for skill in skills})
+        query = "SELECT r.digest, r.filename, r.degree, r.total_skills FROM resumes r"
+        params: List[Any] = []
+        if skills:
+            query += (" JOIN (SELECT digest FROM resume_skills WHERE skill IN (%s)"
+                      " GROUP BY digest HAVING COUNT(*) = ?) s ON s.digest = r.digest"
+                      % ", ".join("?" * len(skills)))
+            params += skills + [len(skills)]
+        query += " WHERE r.analysis_version = ?"
+        params.append(CACHE.versions["analysis"])
+        if degree:
+            level = DEGREE_LEVELS.get(degree)
+            accepted = [d for d, l in DEGREE_LEVELS.items() if l <= level] if level is not None else [degree]
+            query += " AND r.degree IN (%s)" % ", ".join("?" * len(accepted))
+            params += accepted
+        query += " ORDER BY r.total_skills DESC, r.added LIMIT ?"
+        params.append(limit)
+        with self.pool.connection() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [{"digest": digest, "filename": filename, "degree": resume_degree, "total_skills": total}
+                for digest, filename, resume_degree, total in rows]
+
+    def rank_stored(self, job: JobProfile, limit: int = DEFAULT_LIMIT) -> List[Dict[str, Any]]:
+        """
+        Rank every stored resume against a job, as /compare-multiple would.
+
+        Matched-skill counts come from one indexed aggregate query; only the
+        `limit` best resumes are loaded and scored in full.
+
+        :param job: Compiled job profile.
+        :param limit: Number of resumes to return.
+        :return: Result entries with filename, digest, skill_comparison and match_result, best first.
+        """
+        if not self.enabled or limit <= 0:
+            return []
+        skills = sorted(job.skills)
+        relevance: Dict[str, float] = {}
+
+        def final_score(row: Tuple[str, str, int]) -> float:
+            # Same arithmetic as match_skill_masks, from the matched-skill count.
+            digest, degree, matched = row
+            skill_match = matched / len(skills) * 100 if skills else 100
+            level = DEGREE_LEVELS.get(degree)
+            edu_met = not job.degree or (job.degree_level is not None and level is not None
+                                         and level <= job.degree_level)
+            return combine_scores(skill_match, 100 if edu_met else 0, relevance.get(digest))[2]
+
+        version = CACHE.versions["analysis"]
+        with self.pool.connection() as conn:
+            if skills:
+                rows = conn.execute(
+                    "SELECT r.digest, r.degree, COUNT(s.skill) FROM resumes r LEFT JOIN resume_skills s"
+                    " ON s.digest = r.digest AND s.skill IN (%s) WHERE r.analysis_version = ?"
+                    " GROUP BY r.digest" % ", ".join("?" * len(skills)),
+                    skills + [version]
+                ).fetchall()
+            else:
+                rows = conn.execute("SELECT digest, degree, 0 FROM resumes WHERE analysis_version = ?",
+                                    (version,)).fetchall()
+            if RELEVANCE_WEIGHT:
+                # Relevance needs every resume's skills: one scan of resume_skills, one sparse product.
+                resume_skills: Dict[str, List[str]] = {digest: [] for digest, _, _ in rows}
+                for digest, skill in conn.execute(
+                        "SELECT s.digest, s.skill FROM resume_skills s JOIN resumes r ON r.digest = s.digest"
+                        " WHERE r.analysis_version = ?", (version,)):
+                    resume_skills[digest].append(skill)
+                digests = [digest for digest, _, _ in rows]
+                scores = relevance_matrix([resume_skills[digest] for digest in digests], [job.relevance_vector])
+                relevance.update(zip(digests, scores[:, 0].tolist()))
+            best = heapq.nlargest(limit, rows, key=final_score)
+            results = []
+            for digest, _, _ in best:
+                filename, analysis = conn.execute(
+                    "SELECT filename, analysis FROM resumes WHERE digest = ?", (digest,)).fetchone()
+                analysis = json.loads(analysis)
+                results.append({
+                    "filename": filename,
+                    "digest": digest,
+                    "skill_comparison": job.compare_skills(analysis.get("skills", [])),
+                    "match_result": job.match(analysis),
+                })
+        return results
+
+    def stats(self) -> Dict[str, int]:
+        """Row counts of the stored resumes, jobs and match results."""
+        if not self.enabled:
+            return {"resumes": 0, "jobs": 0, "matches": 0}
+        with self.pool.connection() as conn:
+            return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                    for table in ("resumes", "jobs", "matches")}
+
+
+# ===================== DEFAULT STORE =====================
+RESULT_STORE = ResultStore()
+
+
+def store_results(job: JobProfile, results: Sequence[Dict[str, Any]]) -> None:
+    """Save match results to the default store; failures are logged, never raised."""
+    try:
+        RESULT_STORE.save_matches(job, results)
+    except RESULT_STORE.error as e:
+        logger.warning("Could not store %d results for job %s: %s", len(results), job.digest, e)
@@ -0,0 +1,486 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from batch import iter_batch, rank_results, DEFAULT_WORKERS, DEFAULT_RESUME_TIMEOUT
+from job import JobProfile
+from log_config import configure_logging
+from storage import STORE_BATCH_SIZE, store_results
+
+logger = logging.getLogger(__name__)
+
+# ===================== QUEUE CONFIGURATION =====================
+# SQLite file holding queued jobs; it survives restarts of the web tier and workers.
+DEFAULT_QUEUE_PATH = os.environ.get("TASK_QUEUE_PATH", os.path.join("instance", "task_queue.sqlite3"))
+# Maximum number of jobs being processed at the same time across all workers.
+DEFAULT_CONCURRENCY = int(os.environ.get("TASK_QUEUE_CONCURRENCY", 2))
+# Backpressure: refuse new jobs once this many resumes are waiting to be scored.
+DEFAULT_MAX_PENDING_RESUMES = int(os.environ.get("TASK_QUEUE_MAX_PENDING", 5000))
+# A running job whose worker has not reported for this long is handed to another worker.
+LEASE_SECONDS = float(os.environ.get("TASK_QUEUE_LEASE_SECONDS", 300))
+# Idle workers poll for new jobs this often.
+POLL_SECONDS = 1.0
+# Start method of the pools created by a drainer thread inside a web process. Forking a
+# process that runs other threads can copy locks they hold, so these pools start
+# from a clean server process instead (and load the model themselves).
+THREAD_POOL_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+QUEUED, RUNNING, DONE, CANCELLED = "queued", "running", "done", "cancelled"
+FINISHED_STATES = (DONE, CANCELLED)
+
+
+class LeaseLost(Exception):
+    """Raised to a worker whose job was handed to another worker after its lease expired."""
+
+    def __init__(self, job_id: str):
+        super().__init__(f"Lease on job {job_id} was taken over by another worker")
+        self.job_id = job_id
+
+
+class QueueFull(Exception):
+    """Raised by submit() when accepting the job would exceed the backlog limit."""
+
+    def __init__(self, pending: int, limit: int):
+        super().__init__(f"Queue is full ({pending} resumes pending, limit {limit})")
+        self.pending = pending
+        self.limit = limit
+
+
+# ===================== PERSISTENT QUEUE =====================
+class TaskQueue:
+    """
+    SQLite-backed queue of resume batches.
+
+    A job is one job description plus the saved resumes to score against it.
+    Each resume is stored as an item, and its result is written as soon as it
+    is scored, so a job interrupted by a crash resumes where it stopped.
+    """
+
+    def __init__(self, path: str = DEFAULT_QUEUE_PATH, concurrency: int = DEFAULT_CONCURRENCY,
+                 max_pending: int = DEFAULT_MAX_PENDING_RESUMES):
+        self.path = path
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self._local = threading.local()
+        self._worker_lock = None
+        self._worker_lock_pid = None
+
+    # ---------- in-server drainer ----------
+    def acquire_worker_lock(self) -> bool:
+        """
+        Try to become the one web process that drains this queue from a thread.
+
+        Takes an exclusive lock on "<queue path>.worker.lock", held until the
+        process exits, so a server with many workers runs a single drainer and
+        another worker takes over when the holder is replaced.
+
+        :return: True if this process holds the lock.
+        """
+        if self._worker_lock is not None and self._worker_lock_pid == os.getpid():
+            return True
+        if fcntl is None:
+            return True
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        lock = open(self.path + ".worker.lock", "a")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            return False
+        self._worker_lock, self._worker_lock_pid = lock, os.getpid()
+        return True
+
+    # ---------- connection handling ----------
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread and process (connections must not cross a fork)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # isolation_level=None: transactions are opened explicitly with BEGIN IMMEDIATE.
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, status TEXT NOT NULL, job_data TEXT NOT NULL,"
+            " total INTEGER NOT NULL, completed INTEGER NOT NULL DEFAULT 0,"
+            " created REAL NOT NULL, started REAL, finished REAL, heartbeat REAL, digest TEXT, lease TEXT);"
+            "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);"
+            "CREATE TABLE IF NOT EXISTS items ("
+            " job_id TEXT NOT NULL, seq INTEGER NOT NULL, filename TEXT NOT NULL,"
+            " filepath TEXT, result TEXT, PRIMARY KEY (job_id, seq));"
+        )
+        # Queues created before jobs kept their digest and lease token.
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for column in ("digest", "lease"):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} TEXT")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    # ---------- web tier ----------
+    def submit(self, job: JobProfile, files: Sequence[Tuple[str, str]],
+               failed: Sequence[Dict[str, Any]] = ()) -> str:
+        """
+        Queue a batch of saved resumes for scoring.
+
+        :param job: Compiled job profile; its digest keys the results in the result store,
+                    as for the synchronous endpoints.
+        :param files: (original filename, saved filepath) pairs to score.
+        :param failed: Result entries for uploads that could not be saved.
+        :return: The new job id.
+        :raises QueueFull: If the backlog is already at its limit.
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            pending = conn.execute(
+                "SELECT COUNT(*) FROM items JOIN jobs ON jobs.id = items.job_id"
+                " WHERE items.result IS NULL AND jobs.status IN (?, ?)", (QUEUED, RUNNING)
+            ).fetchone()[0]
+            if pending + len(files) > self.max_pending:
+                raise QueueFull(pending, self.max_pending)
+
+            conn.execute(
+                "INSERT INTO jobs (id, status, job_data, digest, total, completed, created)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, json.dumps(job.to_dict()), job.digest, len(files) + len(failed), len(failed), now)
+            )
+            items = [(job_id, seq, filename, filepath, None) for seq, (filename, filepath) in enumerate(files)]
+            items += [(job_id, len(files) + seq, entry["filename"], None, json.dumps(entry))
+                      for seq, entry in enumerate(failed)]
+            conn.executemany("INSERT INTO items (job_id, seq, filename, filepath, result) VALUES (?, ?, ?, ?, ?)", items)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return job_id
+
+    def status(self, job_id: str, include_results: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Progress of a job, with the results scored so far ranked by 'final_match'.
+
+        :param job_id: Id returned by submit().
+        :param include_results: Whether to load and rank the result entries.
+        :return: Status dictionary, or None if the job does not exist.
+        """
+        conn = self._connection()
+        job = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if job is None:
+            return None
+        status = {
+            "job_id": job["id"],
+            "status": job["status"],
+            "progress": {"completed": job["completed"], "total": job["total"]},
+            "created": job["created"],
+            "started": job["started"],
+            "finished": job["finished"],
+            "job_data": json.loads(job["job_data"]),
+        }
+        # Key of the job's match results in the result store (jobs queued before
+        # the digest was stored fall back to a hash of their job data).
+        status["job_digest"] = job["digest"] or JobProfile.from_job_data(status["job_data"]).digest
+        if include_results:
+            rows = conn.execute(
+                "SELECT result FROM items WHERE job_id = ? AND result IS NOT NULL ORDER BY seq", (job_id,)
+            ).fetchall()
+            status["results"] = rank_results([json.loads(row["result"]) for row in rows])
+        return status
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """
+        Cancel a queued or running job. A running job stops after its current resume.
+
+        :param job_id: Id returned by submit().
+        :return: The job's status after the call, or None if it does not exist.
+        """
+        conn = self._connection()
+        was_queued = conn.execute(
+            "UPDATE jobs SET status = ?, finished = ? WHERE id = ? AND status = ?",
+            (CANCELLED, time.time(), job_id, QUEUED)
+        ).rowcount
+        conn.execute(
+            "UPDATE jobs SET status = ?, finished = ? WHERE id = ? AND status = ?",
+            (CANCELLED, time.time(), job_id, RUNNING)
+        )
+        if was_queued:
+            # No worker holds this job, so its saved resumes can go now.
+            self.discard_files(job_id)
+        row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row["status"] if row else None
+
+    def discard_files(self, job_id: str) -> None:
+        """Delete the saved resumes of a job's items that will not be scored."""
+        for _, _, filepath in self.pending_items(job_id):
+            remove_file(filepath)
+
+    # ---------- worker side ----------
+    def claim(self) -> Optional[Tuple[str, str]]:
+        """
+        Take the oldest queued job (or one whose worker stopped reporting), if
+        fewer than `concurrency` jobs are currently running.
+
+        Each claim gets a new lease token; a worker whose job was claimed again
+        after its lease expired gets LeaseLost from record() and finish().
+
+        :return: (job id, lease token), or None if there is nothing to do.
+        """
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            running = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = ? AND heartbeat >= ?", (RUNNING, now - LEASE_SECONDS)
+            ).fetchone()[0]
+            row = None
+            if running < self.concurrency:
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE status = ? OR (status = ? AND heartbeat < ?)"
+                    " ORDER BY created LIMIT 1", (QUEUED, RUNNING, now - LEASE_SECONDS)
+                ).fetchone()
+            if row is not None:
+                lease = uuid.uuid4().hex
+                conn.execute(
+                    "UPDATE jobs SET status = ?, started = COALESCE(started, ?), heartbeat = ?, lease = ? WHERE id = ?",
+                    (RUNNING, now, now, lease, row["id"])
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return (row["id"], lease) if row else None
+
+    def pending_items(self, job_id: str) -> List[Tuple[int, str, str]]:
+        """Items of a job that still need scoring, as (seq, filename, filepath)."""
+        rows = self._connection().execute(
+            "SELECT seq, filename, filepath FROM items WHERE job_id = ? AND result IS NULL ORDER BY seq", (job_id,)
+        ).fetchall()
+        return [(row["seq"], row["filename"], row["filepath"]) for row in rows]
+
+    def record(self, job_id: str, seq: int, result: Dict[str, Any], lease: str) -> bool:
+        """
+        Store one scored resume and renew the job's lease.
+
+        :param lease: Token returned by claim().
+        :return: False if the job was cancelled meanwhile, so the worker can stop.
+        :raises LeaseLost: If another worker holds the job now (nothing is stored).
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._check_lease(conn, job_id, lease)
+            updated = conn.execute(
+                "UPDATE items SET result = ? WHERE job_id = ? AND seq = ? AND result IS NULL",
+                (json.dumps(result), job_id, seq)
+            ).rowcount
+            conn.execute(
+                "UPDATE jobs SET completed = completed + ?, heartbeat = ? WHERE id = ?",
+                (updated, time.time(), job_id)
+            )
+            status = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()["status"]
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return status == RUNNING
+
+    def finished_jobs(self) -> List[str]:
+        """Ids of every done or cancelled job, oldest first."""
+        rows = self._connection().execute(
+            "SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created", FINISHED_STATES
+        ).fetchall()
+        return [row["id"] for row in rows]
+
+    def rewrite_results(self, job_id: str, update: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]) -> int:
+        """
+        Replace the stored results of a job, e.g. to re-score them with new weights.
+
+        :param job_id: Id returned by submit().
+        :param update: Called with each stored result; returns its replacement, or None to keep it.
+        :return: Number of results replaced.
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT seq, result FROM items WHERE job_id = ? AND result IS NOT NULL", (job_id,)
+            ).fetchall()
+            changes = []
+            for row in rows:
+                result = update(json.loads(row["result"]))
+                if result is not None:
+                    changes.append((json.dumps(result), job_id, row["seq"]))
+            conn.executemany("UPDATE items SET result = ? WHERE job_id = ? AND seq = ?", changes)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return len(changes)
+
+    def finish(self, job_id: str, lease: str) -> None:
+        """
+        Mark a running job as done.
+
+        :param lease: Token returned by claim().
+        :raises LeaseLost: If another worker holds the job now.
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._check_lease(conn, job_id, lease)
+            conn.execute(
+                "UPDATE jobs SET status = ?, finished = ? WHERE id = ? AND status = ?",
+                (DONE, time.time(), job_id, RUNNING)
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _check_lease(conn: sqlite3.Connection, job_id: str, lease: str) -> None:
+        row = conn.execute("SELECT lease FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None or row["lease"] != lease:
+            raise LeaseLost(job_id)
+
+
+# ===================== WORKERS =====================
+def process_job(task_queue: TaskQueue, job_id: str, lease: str, workers: Optional[int] = None,
+                timeout: Optional[float] = None, context: Optional[Any] = None) -> None:
+    """
+    Score every pending resume of a claimed job, stopping early if it is cancelled
+    or handed to another worker (its saved resumes are then left to that worker).
+
+    :param task_queue: Queue the job was claimed from.
+    :param job_id: Claimed job id.
+    :param lease: Lease token from the claim.
+    :param workers: Worker processes for the batch (see batch.iter_batch).
+    :param timeout: Per-resume time budget in seconds.
+    :param context: multiprocessing context of the worker pool (see batch.iter_batch).
+    """
+    status = task_queue.status(job_id, include_results=False)
+    items = task_queue.pending_items(job_id)
+    # iter_batch reports filenames only, so tag each with its item number.
+    files = [(str(seq), filepath) for seq, _, filepath in items]
+    names = {str(seq): filename for seq, filename, _ in items}
+    paths = {str(seq): filepath for seq, _, filepath in items}
+
+    job = JobProfile.from_job_data(status["job_data"], status["job_digest"])
+    results = iter_batch(files, job, workers, timeout, context)
+    unsaved = []
+    try:
+        for result in results:
+            seq = result["filename"]
+            result["filename"] = names[seq]
+            try:
+                recorded = task_queue.record(job_id, int(seq), result, lease)
+            except LeaseLost:
+                logger.warning("Job %s was handed to another worker; stopping", job_id)
+                return
+            # The resume is only kept on disk until it has been scored.
+            remove_file(paths[seq])
+            unsaved.append(result)
+            if len(unsaved) >= STORE_BATCH_SIZE:
+                store_results(job, unsaved)
+                unsaved = []
+            if not recorded:
+                logger.info("Job %s was cancelled; stopping", job_id)
+                task_queue.discard_files(job_id)
+                return
+    finally:
+        # Closing the generator tears down the worker pool straight away.
+        results.close()
+        store_results(job, unsaved)
+    try:
+        task_queue.finish(job_id, lease)
+    except LeaseLost:
+        logger.warning("Job %s was handed to another worker before it finished", job_id)
+
+
+def remove_file(filepath: Optional[str]) -> None:
+    """Delete a saved resume, ignoring files that are already gone."""
+    if not filepath:
+        return
+    try:
+        os.remove(filepath)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning("Could not delete %s: %s", filepath, e)
+
+
+def run_worker(task_queue: TaskQueue, workers: Optional[int] = None, timeout: Optional[float] = None,
+               stop: Optional[threading.Event] = None, context: Optional[Any] = None) -> None:
+    """
+    Drain the queue until `stop` is set, polling when it is empty.
+
+    :param task_queue: Queue to drain.
+    :param workers: Worker processes per job.
+    :param timeout: Per-resume time budget in seconds.
+    :param stop: Event that ends the loop (runs forever if omitted).
+    :param context: multiprocessing context of the worker pools (defaults to fork where available).
+    """
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        try:
+            claimed = task_queue.claim()
+            if claimed is None:
+                stop.wait(POLL_SECONDS)
+                continue
+            process_job(task_queue, *claimed, workers, timeout, context)
+        except Exception:
+            logger.exception("Queue worker failed; retrying")
+            stop.wait(POLL_SECONDS)
+
+
+def start_background_worker(task_queue: TaskQueue, workers: Optional[int] = None,
+                            timeout: Optional[float] = None) -> threading.Event:
+    """
+    Drain the queue from a daemon thread of the current process.
+
+    Its worker pools use THREAD_POOL_START_METHOD rather than fork, since the
+    process runs other threads. Call task_queue.acquire_worker_lock() first to
+    keep to one such thread per server.
+
+    :return: Event that stops the thread when set.
+    """
+    stop = threading.Event()
+    context = multiprocessing.get_context(THREAD_POOL_START_METHOD)
+    thread = threading.Thread(target=run_worker, args=(task_queue, workers, timeout, stop, context),
+                              name="task-queue-worker", daemon=True)
+    thread.start()
+    return stop
+
+
+# ===================== STANDALONE WORKER =====================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drain the resume batch queue.")
+    parser.add_argument("--queue", default=DEFAULT_QUEUE_PATH, help="Queue database path.")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="Maximum jobs running at once across all workers.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Worker processes per job.")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_RESUME_TIMEOUT, help="Per-resume timeout (s).")
+    args = parser.parse_args()
+
+    configure_logging()
+    run_worker(TaskQueue(args.queue, concurrency=args.concurrency), args.workers, args.timeout)
@@ -0,0 +1,21 @@
+import os
+import sys
+import tempfile
+
+# Module-level stores are created on import; keep them in memory or in a scratch
+# directory rather than next to the code (explicit settings still win).
+_SCRATCH = tempfile.mkdtemp(prefix="resume-analysis-tests-")
+for name, value in {
+    "ANALYSIS_CACHE_PATH": "",
+    "CANDIDATE_INDEX_PATH": "",
+    "DEDUP_INDEX_PATH": "",
+    "RESULT_STORE_PATH": "",
+    "ADMISSION_BUDGET_PATH": "",
+    "SKILL_INDEX_CACHE": "",
+    "TASK_QUEUE_PATH": os.path.join(_SCRATCH, "task_queue.sqlite3"),
+    "BATCH_SLOTS_PATH": os.path.join(_SCRATCH, "batch_slots"),
+}.items():
+    os.environ.setdefault(name, value)
+
+# The application modules live at the repository root.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
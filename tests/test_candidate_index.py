@@ -0,0 +1,82 @@
+import random
+
+import pytest
+
+from candidate_index import CandidateIndex, decode_postings, encode_postings
+from data_base import SKILLS_DB
+from job import JobProfile
+
+SKILLS = list(SKILLS_DB)[:12]
+DEGREES = ["PhD", "Master", "Bachelor", "Associate", ""]
+
+
+def make_resumes(count, seed):
+    """(digest, analysis, filename) triples with random skills and degrees."""
+    rng = random.Random(seed)
+    return [
+        (f"digest-{i}", {"skills": rng.sample(SKILLS, rng.randint(0, 8)),
+                         "education": {"degree": rng.choice(DEGREES)}}, f"resume-{i}.pdf")
+        for i in range(count)
+    ]
+
+
+def make_job(skills, degree):
+    return JobProfile.from_job_data({"required_skills": skills, "years_experience": None, "education": degree})
+
+
+def brute_force(resumes, job, k):
+    """Score every resume with job.match and keep the k best (stable, so earlier resumes win ties)."""
+    scored = [(digest, job.match(analysis)["final_match"]) for digest, analysis, _ in resumes]
+    scored.sort(key=lambda entry: -float(entry[1].rstrip("%")))
+    return scored[:k]
+
+
+def ranking(index, job, k):
+    return [(entry["digest"], entry["match_result"]["final_match"]) for entry in index.search(job, k)]
+
+
+JOBS = [
+    (["Python", "SQL", "Java"], "Bachelor"),
+    (["Python"], None),
+    (SKILLS[:8], "Master"),
+    (["JavaScript", "React", "CSS", "HTML"], "PhD"),
+    ([], "Bachelor"),
+    ([], None),
+]
+
+
+@pytest.mark.parametrize("skills,degree", JOBS)
+@pytest.mark.parametrize("k", [1, 5, 20, 500])
+def test_top_k_matches_brute_force(skills, degree, k):
+    resumes = make_resumes(300, seed=len(skills) * 31 + k)
+    index = CandidateIndex(path=None)
+    index.add_many(resumes)
+    job = make_job(skills, degree)
+    assert ranking(index, job, k) == brute_force(resumes, job, k)
+
+
+def test_top_k_after_removal(tmp_path):
+    resumes = make_resumes(120, seed=7)
+    index = CandidateIndex(path=str(tmp_path / "index.sqlite3"))
+    index.add_many(resumes)
+    removed = {digest for digest, _, _ in resumes[::3]}
+    for digest in removed:
+        assert index.remove(digest)
+    kept = [entry for entry in resumes if entry[0] not in removed]
+    job = make_job(["Python", "SQL", "C++", "Go"], "Bachelor")
+    assert len(index) == len(kept)
+    assert ranking(index, job, 25) == brute_force(kept, job, 25)
+    # A second handle on the same file sees the same index.
+    assert ranking(CandidateIndex(path=str(tmp_path / "index.sqlite3")), job, 25) == brute_force(kept, job, 25)
+
+
+def test_add_is_idempotent():
+    index = CandidateIndex(path=None)
+    first = index.add("digest", {"skills": ["Python"], "education": {"degree": "Bachelor"}})
+    assert index.add("digest", {"skills": ["Java"], "education": {"degree": ""}}) == first
+    assert len(index) == 1
+
+
+@pytest.mark.parametrize("doc_ids", [[], [1], [1, 2, 3], [5, 127, 128, 129, 16511, 2 ** 40]])
+def test_postings_round_trip(doc_ids):
+    assert list(decode_postings(encode_postings(doc_ids))) == doc_ids
@@ -0,0 +1,58 @@
+import pytest
+
+from nlp_engine import make_doc
+from skill_matcher import SkillIndex, SkillVocabulary, get_skill_index
+
+VARIATIONS = ["go", "Machine Learning", "deep learning", "learning", "sql", "sql server", "c++"]
+
+
+@pytest.fixture
+def index():
+    return SkillIndex(VARIATIONS, str.split)
+
+
+def matches(index, text):
+    return sorted(index.iter_matches(text.split()))
+
+
+def test_matches_whole_tokens_only(index):
+    assert matches(index, "good golang gopher") == []
+    assert matches(index, "go is good") == [(0, 1, "go")]
+
+
+def test_multi_token_match(index):
+    assert matches(index, "applied machine learning") == [(1, 3, "machine learning"), (2, 3, "learning")]
+
+
+def test_overlapping_and_nested_matches(index):
+    assert matches(index, "deep learning") == [(0, 2, "deep learning"), (1, 2, "learning")]
+    assert matches(index, "sql server") == [(0, 1, "sql"), (0, 2, "sql server")]
+
+
+def test_partial_match_at_document_edges(index):
+    assert matches(index, "machine") == []
+    assert matches(index, "server sql") == [(1, 2, "sql")]
+    assert matches(index, "") == []
+
+
+def test_variations_are_case_insensitive(index):
+    assert index.size == len(VARIATIONS)
+    assert matches(index, "machine learning") == [(0, 2, "machine learning"), (1, 2, "learning")]
+
+
+def test_dict_round_trip(index):
+    text = "c++ and sql server with deep learning in go"
+    assert matches(SkillIndex.from_dict(index.to_dict()), text) == matches(index, text)
+
+
+def test_taxonomy_index_on_spacy_tokens():
+    found = get_skill_index().find(make_doc("experienced in go, sql server and machine learning"))
+    assert {"go", "sql", "machine learning"} <= found
+    assert "go" not in get_skill_index().find(make_doc("a good engineer who likes gophers"))
+
+
+def test_vocabulary_masks():
+    vocabulary = SkillVocabulary({"Python": ["python"], "SQL": ["sql"]})
+    mask = vocabulary.mask(["SQL", "python", "Rust"])
+    assert vocabulary.decode(mask) == ["python", "rust", "sql"]
+    assert vocabulary.mask(["rust"]) & mask == vocabulary.mask(["RUST"])
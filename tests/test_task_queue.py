@@ -0,0 +1,113 @@
+import pytest
+
+import task_queue
+from job import JobProfile
+from task_queue import CANCELLED, DONE, QUEUED, RUNNING, LeaseLost, QueueFull, TaskQueue
+
+JOB = JobProfile.from_job_data({"required_skills": ["Python", "SQL"], "years_experience": None, "education": None})
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return TaskQueue(str(tmp_path / "queue.sqlite3"), concurrency=1)
+
+
+def saved_files(tmp_path, count):
+    """(filename, filepath) pairs of placeholder resumes on disk."""
+    files = []
+    for i in range(count):
+        path = tmp_path / f"resume-{i}.pdf"
+        path.write_bytes(b"%PDF-1.4")
+        files.append((f"resume-{i}.pdf", str(path)))
+    return files
+
+
+def result(filename, final_match="50.0%"):
+    return {"filename": filename, "match_result": {"final_match": final_match}}
+
+
+def test_claim_record_finish(queue, tmp_path):
+    job_id = queue.submit(JOB, saved_files(tmp_path, 2), failed=[{"filename": "bad.pdf", "error": "unreadable"}])
+    assert queue.status(job_id)["status"] == QUEUED
+    assert queue.status(job_id)["job_digest"] == JOB.digest
+
+    claimed_id, lease = queue.claim()
+    assert claimed_id == job_id
+    assert queue.claim() is None
+    assert [seq for seq, _, _ in queue.pending_items(job_id)] == [0, 1]
+
+    assert queue.record(job_id, 0, result("resume-0.pdf", "40.0%"), lease)
+    assert queue.record(job_id, 1, result("resume-1.pdf", "90.0%"), lease)
+    queue.finish(job_id, lease)
+
+    status = queue.status(job_id)
+    assert status["status"] == DONE
+    assert status["progress"] == {"completed": 3, "total": 3}
+    assert [entry["filename"] for entry in status["results"]] == ["resume-1.pdf", "resume-0.pdf", "bad.pdf"]
+
+
+def test_concurrency_limit(queue, tmp_path):
+    first = queue.submit(JOB, saved_files(tmp_path, 1))
+    second = queue.submit(JOB, saved_files(tmp_path, 1))
+    assert queue.claim()[0] == first
+    assert queue.claim() is None
+    queue.concurrency = 2
+    assert queue.claim()[0] == second
+
+
+def test_expired_lease_is_taken_over(queue, tmp_path, monkeypatch):
+    job_id = queue.submit(JOB, saved_files(tmp_path, 2))
+    _, stale = queue.claim()
+    assert queue.record(job_id, 0, result("resume-0.pdf"), stale)
+
+    # The first worker stops reporting: its heartbeat is now past the lease.
+    monkeypatch.setattr(task_queue, "LEASE_SECONDS", -1)
+    claimed_id, lease = queue.claim()
+    assert claimed_id == job_id and lease != stale
+    monkeypatch.undo()
+
+    # The first worker is fenced off; the second one finishes the remaining item.
+    with pytest.raises(LeaseLost):
+        queue.record(job_id, 1, result("resume-1.pdf", "10.0%"), stale)
+    assert [seq for seq, _, _ in queue.pending_items(job_id)] == [1]
+    assert queue.record(job_id, 1, result("resume-1.pdf"), lease)
+    with pytest.raises(LeaseLost):
+        queue.finish(job_id, stale)
+    queue.finish(job_id, lease)
+    assert queue.status(job_id)["status"] == DONE
+
+
+def test_live_lease_is_not_taken_over(queue, tmp_path):
+    queue.submit(JOB, saved_files(tmp_path, 1))
+    queue.concurrency = 2
+    assert queue.claim() is not None
+    assert queue.claim() is None
+
+
+def test_cancel_queued_job_discards_files(queue, tmp_path):
+    files = saved_files(tmp_path, 2)
+    job_id = queue.submit(JOB, files)
+    assert queue.cancel(job_id) == CANCELLED
+    assert queue.claim() is None
+    assert not any((tmp_path / filename).exists() for filename, _ in files)
+    assert queue.cancel("no-such-job") is None
+
+
+def test_cancel_running_job_stops_worker(queue, tmp_path):
+    files = saved_files(tmp_path, 2)
+    job_id = queue.submit(JOB, files)
+    _, lease = queue.claim()
+    assert queue.status(job_id)["status"] == RUNNING
+    assert queue.cancel(job_id) == CANCELLED
+    # The worker learns about it from its next record() and keeps the result it already has.
+    assert not queue.record(job_id, 0, result("resume-0.pdf"), lease)
+    assert queue.status(job_id)["progress"]["completed"] == 1
+    # The running job's files are left to its worker.
+    assert all((tmp_path / filename).exists() for filename, _ in files)
+
+
+def test_submit_rejects_past_backlog_limit(tmp_path):
+    queue = TaskQueue(str(tmp_path / "queue.sqlite3"), max_pending=3)
+    queue.submit(JOB, saved_files(tmp_path, 2))
+    with pytest.raises(QueueFull):
+        queue.submit(JOB, saved_files(tmp_path, 2))
@@ -0,0 +1,254 @@
+import argparse
+import hashlib
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from werkzeug.utils import secure_filename
+
+from pdf_extract import PdfSource
+
+logger = logging.getLogger(__name__)
+
+# ===================== UPLOAD CONFIGURATION =====================
+# Largest resume accepted, per file.
+MAX_UPLOAD_BYTES = int(float(os.environ.get("UPLOAD_MAX_MB", 10)) * 1024 * 1024)
+# Uploads up to this size are analyzed straight from memory; larger ones spill to a temporary file.
+SPOOL_BYTES = int(float(os.environ.get("UPLOAD_SPOOL_MB", 2)) * 1024 * 1024)
+# Directory for spilled uploads (defaults to the system temporary directory).
+SPOOL_DIR = os.environ.get("UPLOAD_SPOOL_DIR") or None
+# Keep a copy of every uploaded resume for this many days (0 = keep nothing).
+RETENTION_DAYS = float(os.environ.get("UPLOAD_RETENTION_DAYS", 0))
+# Where retained copies are written, named by content digest.
+RETENTION_DIR = os.environ.get("UPLOAD_RETENTION_DIR", "uploads")
+# Retained copies older than the TTL are swept at most this often (seconds).
+SWEEP_INTERVAL = 3600
+CHUNK_SIZE = 64 * 1024
+
+# Only files written by retain_upload are ever swept.
+_RETAINED_NAME = re.compile(r"^[0-9a-f]{64}\.pdf$")
+_sweep_lock = threading.Lock()
+_last_sweep = 0.0
+
+
+class UploadTooLarge(Exception):
+    """Raised by read_upload when a file exceeds the size limit."""
+
+    def __init__(self, filename: str, limit: int):
+        super().__init__(f"{filename} is larger than the {limit / (1024 * 1024):g} MB upload limit")
+        self.limit = limit
+
+
+# ===================== IN-MEMORY UPLOADS =====================
+class Upload:
+    """
+    An uploaded resume, held in memory or, past SPOOL_BYTES, in a temporary file.
+
+    ``source`` is what the PDF extractors take (bytes or a path). Close the
+    upload (or use it as a context manager) to delete a spilled file.
+    """
+
+    def __init__(self, filename: str, digest: str, size: int,
+                 data: Optional[bytes] = None, path: Optional[str] = None):
+        self.filename = filename
+        self.digest = digest
+        self.size = size
+        self.data = data
+        self.path = path
+
+    @property
+    def source(self) -> PdfSource:
+        return self.data if self.data is not None else self.path
+
+    def save(self, folder: str) -> str:
+        """
+        Write the upload to a uniquely named file that outlives this object.
+
+        :param folder: Target directory.
+        :return: Path of the saved file.
+        """
+        os.makedirs(folder, exist_ok=True)
+        filepath = os.path.join(folder, f"{uuid.uuid4().hex}_{secure_filename(self.filename)}")
+        if self.data is not None:
+            with open(filepath, "wb") as f:
+                f.write(self.data)
+        else:
+            # The spilled file changes owner instead of being copied.
+            shutil.move(self.path, filepath)
+            self.path = None
+        return filepath
+
+    def close(self) -> None:
+        """Delete the spilled temporary file, if any, and drop the buffer."""
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            self.path = None
+        self.data = None
+
+    def __enter__(self) -> "Upload":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+def read_upload(file: Any, max_bytes: int = MAX_UPLOAD_BYTES, spool_bytes: int = SPOOL_BYTES) -> Upload:
+    """
+    Read an uploaded file from the request, hashing it on the way.
+
+    :param file: werkzeug FileStorage (anything with ``filename`` and a readable ``stream``).
+    :param max_bytes: Size limit (0 = no limit).
+    :param spool_bytes: Size above which the content goes to a temporary file instead of memory.
+    :return: The upload.
+    :raises UploadTooLarge: If the file exceeds max_bytes.
+    """
+    hasher = hashlib.sha256()
+    buffer = bytearray()
+    spill = None
+    size = 0
+    try:
+        while True:
+            chunk = file.stream.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if max_bytes and size > max_bytes:
+                raise UploadTooLarge(file.filename, max_bytes)
+            hasher.update(chunk)
+            if spill is None and size > spool_bytes:
+                spill = tempfile.NamedTemporaryFile(prefix="upload-", suffix=".pdf", dir=SPOOL_DIR, delete=False)
+                spill.write(buffer)
+                buffer = bytearray()
+            if spill is not None:
+                spill.write(chunk)
+            else:
+                buffer += chunk
+    except BaseException:
+        if spill is not None:
+            spill.close()
+            os.remove(spill.name)
+        raise
+
+    if spill is not None:
+        spill.close()
+        return Upload(file.filename, hasher.hexdigest(), size, path=spill.name)
+    return Upload(file.filename, hasher.hexdigest(), size, data=bytes(buffer))
+
+
+def read_uploads(files: Iterable[Any]) -> Tuple[List[Upload], List[Dict[str, str]]]:
+    """
+    Read every uploaded resume of a request, in memory where they fit.
+
+    :param files: werkzeug FileStorage objects.
+    :return: The uploads (retained if configured), plus error entries for files
+             that could not be read (e.g. over the size limit).
+    """
+    uploads = []
+    failed = []
+    for file in files:
+        try:
+            upload = read_upload(file)
+        except Exception as e:
+            failed.append({
+                "filename": file.filename,
+                "error": f"Failed to process resume: {str(e)}"
+            })
+            continue
+        retain_upload(upload)
+        uploads.append(upload)
+    return uploads, failed
+
+
+def close_uploads(uploads: Iterable[Upload]) -> None:
+    """Release upload buffers and delete any spilled temporary files."""
+    for upload in uploads:
+        upload.close()
+
+
+# ===================== RETENTION =====================
+def retain_upload(upload: Upload, folder: str = RETENTION_DIR, days: float = RETENTION_DAYS) -> Optional[str]:
+    """
+    Keep a copy of the original upload when retention is enabled.
+
+    Copies are named by content digest, so re-uploading a resume refreshes its
+    copy instead of adding another. Expired copies are swept along the way.
+
+    :param upload: Upload to keep.
+    :param folder: Retention directory.
+    :param days: Time to keep copies; 0 disables retention.
+    :return: Path of the retained copy, or None if retention is disabled or failed.
+    """
+    if days <= 0:
+        return None
+    filepath = os.path.join(folder, f"{upload.digest}.pdf")
+    try:
+        os.makedirs(folder, exist_ok=True)
+        if os.path.exists(filepath):
+            os.utime(filepath)
+        elif upload.data is not None:
+            with open(filepath, "wb") as f:
+                f.write(upload.data)
+        else:
+            shutil.copyfile(upload.path, filepath)
+    except OSError as e:
+        # Retention is best effort; it must never fail the analysis.
+        logger.warning("Could not retain upload %s: %s", upload.filename, e)
+        return None
+    maybe_sweep(folder, days)
+    return filepath
+
+
+def maybe_sweep(folder: str = RETENTION_DIR, days: float = RETENTION_DAYS) -> None:
+    """Run sweep_retained if the last sweep in this process was over SWEEP_INTERVAL ago."""
+    global _last_sweep
+    with _sweep_lock:
+        if time.time() - _last_sweep < SWEEP_INTERVAL:
+            return
+        _last_sweep = time.time()
+    sweep_retained(folder, days)
+
+
+def sweep_retained(folder: str = RETENTION_DIR, days: float = RETENTION_DAYS) -> int:
+    """
+    Delete retained copies not uploaded again within the retention period.
+
+    :param folder: Retention directory.
+    :param days: Retention period.
+    :return: Number of files deleted.
+    """
+    if days <= 0 or not os.path.isdir(folder):
+        return 0
+    cutoff = time.time() - days * 24 * 3600
+    removed = 0
+    for name in os.listdir(folder):
+        if not _RETAINED_NAME.match(name):
+            continue
+        filepath = os.path.join(folder, name)
+        try:
+            if os.path.getmtime(filepath) < cutoff:
+                os.remove(filepath)
+                removed += 1
+        except OSError as e:
+            logger.warning("Could not sweep %s: %s", filepath, e)
+    if removed:
+        logger.info("Swept %d expired uploads from %s", removed, folder)
+    return removed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Delete retained uploads older than the retention period.")
+    parser.add_argument("--folder", default=RETENTION_DIR, help="Retention directory.")
+    parser.add_argument("--days", type=float, default=RETENTION_DAYS, help="Retention period in days.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    print(f"Removed {sweep_retained(args.folder, args.days)} files")
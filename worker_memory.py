@@ -0,0 +1,85 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import sys
+from typing import Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# ===================== MEMORY LIMITS =====================
+# Private memory (MB) past which a long-running worker is replaced once its current work is done (0 = no limit).
+# Counted without the pages still shared with the process it was forked from, so the
+# preloaded model does not count against every worker.
+MAX_WORKER_MB = float(os.environ.get("WORKER_MAX_MEMORY_MB", 512))
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_libc = None
+
+
+def private_memory_bytes() -> int:
+    """
+    Memory this process would give back by exiting.
+
+    Reads Private_Clean + Private_Dirty from /proc/self/smaps_rollup on Linux;
+    elsewhere falls back to the resident size, then to the peak resident size.
+
+    :return: Bytes, or 0 if nothing could be read.
+    """
+    try:
+        with open("/proc/self/smaps_rollup", "r", encoding="ascii") as f:
+            private = sum(int(line.split()[1]) for line in f if line.startswith(("Private_Clean:", "Private_Dirty:")))
+        return private * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        with open("/proc/self/statm", "r", encoding="ascii") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        pass
+    if resource is None:
+        return 0
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def over_watermark(used: Optional[int] = None, limit_mb: float = MAX_WORKER_MB) -> bool:
+    """
+    Whether a worker has outgrown MAX_WORKER_MB and should be recycled.
+
+    :param used: Bytes in use (defaults to private_memory_bytes() of this process).
+    :param limit_mb: Watermark in MB (0 = never).
+    :return: True if the worker should be replaced.
+    """
+    if not limit_mb:
+        return False
+    if used is None:
+        used = private_memory_bytes()
+    if used > limit_mb * 1024 * 1024:
+        logger.info("Worker %s uses %.0f MB (limit %g MB); recycling it", os.getpid(), used / 2 ** 20, limit_mb)
+        return True
+    return False
+
+
+def release_free_memory() -> None:
+    """
+    Hand memory freed by Python and native code back to the OS (glibc only; a no-op elsewhere).
+
+    glibc keeps freed heap pages for reuse, so after dropping a large object
+    (e.g. a spaCy model) the process would stay as big as before without this.
+    """
+    global _libc
+    if _libc is None:
+        try:
+            _libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6")
+        except OSError:
+            _libc = False
+    trim = getattr(_libc, "malloc_trim", None) if _libc else None
+    if trim is not None:
+        trim(0)